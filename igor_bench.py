@@ -0,0 +1,419 @@
+# igor_bench.py
+"""
+Banc de mesure du cerveau (hors interface).
+- Modes : compare le pipeline en deux temps (classification + outil) et le mode une passe
+  sur un jeu de phrases fixe, avec le backend LLM configuré dans memory.json.
+- Corpus (--corpus) : phrases étiquetées (intention, outil, arguments attendus) passées dans
+  le vrai pipeline (quick_heuristic_check, classify_query_intent, brain_query) face à un
+  serveur LLM scripté local qui répond ce qu'un modèle parfait répondrait. Rapport :
+  latence par étape (p50/p90/p99), appels LLM par phrase, exactitude. Le rapport JSON
+  (--json) se compare à celui d'une autre version avec --baseline.
+
+Usage : python igor_bench.py [--runs N] [--modes two_pass,single_pass]
+        python igor_bench.py --corpus [--llm-latency 0.2] [--json rapport.json] [--baseline ancien.json]
+"""
+import re
+import sys
+import time
+import json
+import argparse
+import threading
+import statistics
+import subprocess
+import unicodedata
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import igor_brain
+import igor_config
+import igor_llm
+import igor_turnlog
+
+# Phrases de plus de 3 mots : ce sont elles qui déclenchent la phase 0 (fiche technique)
+BENCH_UTTERANCES = [
+    "à quelle heure je me lève demain",
+    "rappelle-moi d'acheter du pain ce soir",
+    "est-ce qu'il va faire chaud à Lyon",
+    "c'est quoi cette musique qui joue",
+    "ouvre Firefox et mets Youtube en plein écran",
+    "ferme toutes les fenêtres du terminal",
+    "ajoute une tâche au projet web",
+    "qu'est-ce que tu sais sur moi",
+    "baisse un peu le volume s'il te plaît",
+    "cherche une recette de crêpes sur internet",
+    "réveille-moi tous les jours à 7h30",
+    "explique-moi ce qu'est un trou noir",
+]
+
+MODES = {
+    "two_pass": igor_brain.two_pass_query,
+    "single_pass": igor_brain.single_pass_query,
+}
+
+
+def run_mode(mode, utterances, runs=1):
+    """Renvoie [{'text', 'intent', 'raw', 'seconds'}] pour chaque phrase (dernier passage)."""
+    query = MODES[mode]
+    # Pas de cache de classification entre deux mesures (sans vider celui de l'utilisateur)
+    igor_brain.INTENT_CACHE.enabled = False
+    results = []
+    for text in utterances:
+        timings = []
+        intent, raw = None, None
+        for _ in range(runs):
+            started = time.time()
+            intent, raw = query(text)
+            timings.append(time.time() - started)
+        results.append({"text": text, "intent": intent, "raw": raw, "seconds": statistics.median(timings)})
+        print(f"  [BENCH] {mode:<12} {results[-1]['seconds']:6.2f}s  {intent or '-':<10} {text}", flush=True)
+    return results
+
+
+def summarize(results):
+    seconds = sorted(r["seconds"] for r in results)
+    if not seconds:
+        return {}
+    p90 = seconds[min(len(seconds) - 1, int(round(0.9 * (len(seconds) - 1))))]
+    return {
+        "mean": round(statistics.mean(seconds), 3),
+        "median": round(statistics.median(seconds), 3),
+        "p90": round(p90, 3),
+        "total": round(sum(seconds), 3),
+        "failures": sum(1 for r in results if not r["raw"]),
+    }
+
+
+# === CORPUS ÉTIQUETÉ ===
+# args None : arguments libres (non vérifiés)
+BENCH_CORPUS = [
+    {"text": "ouvre firefox", "intent": "LAUNCH", "tool": "LAUNCH", "args": "firefox"},
+    {"text": "lance la calculatrice", "intent": "LAUNCH", "tool": "LAUNCH", "args": "calculatrice"},
+    {"text": "ferme la fenêtre du terminal", "intent": "CONTROL", "tool": "CLOSE_WINDOW", "args": "terminal"},
+    {"text": "mets firefox en plein écran", "intent": "CONTROL", "tool": "FULLSCREEN", "args": "firefox"},
+    {"text": "ferme firefox et ouvre le terminal", "intent": "CONTROL", "tool": "BATCH",
+     "args": [{"tool": "CLOSE_WINDOW", "args": "firefox"}, {"tool": "LAUNCH", "args": "terminal"}]},
+    {"text": "baisse le volume", "intent": "MEDIA", "tool": "VOLUME", "args": "down"},
+    {"text": "coupe le son", "intent": "MEDIA", "tool": "SET_MUTE", "args": "on"},
+    {"text": "c'est quoi cette musique qui joue", "intent": "MEDIA", "tool": "LISTEN_SYSTEM", "args": "15"},
+    {"text": "pause", "intent": "MEDIA", "tool": "MEDIA", "args": "pause"},
+    {"text": "réveille-moi à 7h", "intent": "ALARM", "tool": "ALARM", "args": "7h"},
+    {"text": "à quelle heure je me lève demain", "intent": "ALARM", "tool": "SHOW_ALARMS", "args": ""},
+    {"text": "supprime l'alarme de 8h", "intent": "ALARM", "tool": "DEL_ALARM", "args": "8h"},
+    {"text": "quelle heure est-il", "intent": "SEARCH", "tool": "TIME", "args": ""},
+    {"text": "quel temps fait-il à Lyon", "intent": "SEARCH", "tool": "WEATHER", "args": "Lyon"},
+    {"text": "cherche une recette de crêpes", "intent": "SEARCH", "tool": "SEARCH", "args": "recette de crêpes"},
+    {"text": "parle-moi de Napoléon", "intent": "KNOWLEDGE", "tool": "LEARN", "args": "Napoléon"},
+    {"text": "combien fait 12 fois 7", "intent": "KNOWLEDGE", "tool": "MATH", "args": None},
+    {"text": "note acheter du pain", "intent": "MEMORY", "tool": "NOTE", "args": "acheter du pain"},
+    {"text": "lis mes notes", "intent": "MEMORY", "tool": "READ_NOTE", "args": ""},
+    {"text": "retiens que j'aime le jazz", "intent": "MEMORY", "tool": "MEM", "args": None},
+    {"text": "prends une photo", "intent": "VISION", "tool": "VISION", "args": "webcam"},
+    {"text": "regarde mon écran", "intent": "VISION", "tool": "VISION", "args": "screen"},
+    {"text": "je m'appelle Marc", "intent": "IDENTITY", "tool": "USERNAME", "args": "Marc"},
+    {"text": "éteins-toi", "intent": "IDENTITY", "tool": "EXIT", "args": ""},
+    {"text": "crée le projet site web", "intent": "PROJECT", "tool": "PROJECT_NEW", "args": "site web"},
+    {"text": "liste les fichiers du projet", "intent": "PROJECT", "tool": "PROJECT_LIST_FILES", "args": ""},
+    {"text": "quels sont mes raccourcis", "intent": "SHORTCUT", "tool": "SHORTCUT_LIST", "args": ""},
+    {"text": "salut, comment ça va", "intent": "CHAT", "tool": "CHAT", "args": None},
+    {"text": "raconte-moi une blague", "intent": "CHAT", "tool": "CHAT", "args": None},
+]
+
+# Réponses de la fiche (phase 0) : seules ces intentions priment sur les mots-clés
+PHASE0_OVERRIDES = {"ALARM", "MEDIA", "WEATHER", "TIME", "MEMORY", "PROJECT"}
+# Ligne de la phrase à traiter : celle suivie de l'amorce de réponse (pas les exemples few-shot)
+_UTTERANCE_RE = re.compile(r'(?:User|Phrase|Demande)\s*:\s*"([^"\n]*)"\s*\n(?:JSON|Lettre|Réponse|CATÉGORIES)')
+
+
+class ScriptedLLM:
+    """
+    Serveur HTTP local au format Llama.cpp (/completion, flux SSE, n_probs, /health).
+    Retrouve la phrase du corpus dans le prompt et répond la réponse attendue, après
+    'latency' secondes + 'token_delay' par token : on mesure le pipeline, pas le modèle.
+    """
+
+    def __init__(self, corpus, latency=0.0, token_delay=0.0):
+        self.answers = {entry["text"]: entry for entry in corpus}
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/completion"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, prompt, payload):
+        """Texte que renverrait un modèle parfait pour ce prompt."""
+        matches = _UTTERANCE_RE.findall(prompt)
+        entry = self.answers.get(matches[-1]) if matches else None
+        if entry is None:
+            return '{"tool": "CHAT", "args": "..."}'
+        intent, call = entry["intent"], {"tool": entry["tool"], "args": entry["args"] or ""}
+        if entry["tool"] == "BATCH":
+            call = entry["args"]
+        if "n_probs" in payload:
+            codes = {v: k for k, v in igor_brain.INTENT_LABEL_CODES.items()}
+            return codes.get(intent, codes["CHAT"])
+        if prompt.startswith("Remplis la fiche"):
+            category = intent if intent in PHASE0_OVERRIDES else "CHAT"
+            return f"CATÉGORIES: {category}\nCOMMANDES: répondre à l'utilisateur\nNATURE: {entry['text']}"
+        if prompt.startswith("Classifie en 1 MOT"):
+            return intent
+        if '"intent"' in prompt:
+            return json.dumps({"intent": intent, "call": call}, ensure_ascii=False)
+        return json.dumps(call, ensure_ascii=False)
+
+    def _handler(self):
+        bench = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type="application/json"):
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send('{"status": "ok"}')
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with bench._lock:
+                    bench.requests += 1
+                text = bench.answer(payload.get("prompt", ""), payload)
+                time.sleep(bench.latency)
+                if "n_probs" in payload:
+                    probs = [{"tok_str": text, "prob": 0.97}, {"tok_str": "K", "prob": 0.03}]
+                    self._send(json.dumps({"content": text, "completion_probabilities": [{"probs": probs}]}))
+                    return
+                if not payload.get("stream"):
+                    time.sleep(bench.token_delay * len(text) / 4)
+                    self._send(json.dumps({"content": text}, ensure_ascii=False))
+                    return
+                # Flux SSE découpé en "tokens" de 4 caractères
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    chunks = [text[i:i + 4] for i in range(0, len(text), 4)] + [""]
+                    for i, chunk in enumerate(chunks):
+                        time.sleep(bench.token_delay)
+                        event = json.dumps({"content": chunk, "stop": i == len(chunks) - 1}, ensure_ascii=False)
+                        data = f"data: {event}\n\n".encode()
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass   # Client parti (JSON complet reçu, ou requête annulée)
+
+        return Handler
+
+
+def _norm(value):
+    if isinstance(value, list):
+        return [(_norm(v.get("tool")), _norm(v.get("args"))) for v in value if isinstance(v, dict)]
+    text = unicodedata.normalize('NFD', str(value if value is not None else "").lower())
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def percentiles(values):
+    """{'p50', 'p90', 'p99'} (rang le plus proche), en millisecondes."""
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"p50": round(pick(0.5) * 1000, 2), "p90": round(pick(0.9) * 1000, 2), "p99": round(pick(0.99) * 1000, 2)}
+
+
+def run_corpus(corpus, runs=1, server=None):
+    """Passe chaque phrase dans le pipeline réel ; une ligne de résultat par phrase (dernier passage)."""
+    igor_brain.INTENT_CACHE.enabled = False
+    igor_turnlog.RECORDING = False
+    results = []
+    for entry in corpus:
+        for _ in range(runs):
+            requests_before = server.requests if server else 0
+            started = time.time()
+            heuristic = igor_brain.quick_heuristic_check(entry["text"])
+            heuristic_s = time.time() - started
+
+            turn = igor_turnlog.begin(entry["text"])
+            started = time.time()
+            tool, args = igor_brain.brain_query(entry["text"])
+            brain_s = time.time() - started
+            record = dict(turn.record)
+            igor_turnlog.end(turn)
+
+        latency = {"heuristic": heuristic_s, "classify": record["latency"].get("classify", 0.0),
+                   "llm": record["latency"].get("llm", 0.0), "brain_query": brain_s}
+        checked_args = entry["args"] is not None
+        result = {
+            "text": entry["text"],
+            "expected": {"intent": entry["intent"], "tool": entry["tool"], "args": entry["args"]},
+            "intent": record["intent"], "source": record["source"], "tool": tool, "args": args,
+            "heuristic_tool": heuristic[0] if isinstance(heuristic, tuple) else None,
+            "intent_ok": record["intent"] == entry["intent"],
+            "tool_ok": tool == entry["tool"],
+            "args_ok": (not checked_args) or _norm(args) == _norm(entry["args"]),
+            "llm_calls": record["llm_calls"],
+            "server_requests": (server.requests - requests_before) if server else None,
+            "latency": {k: round(v, 5) for k, v in latency.items()},
+        }
+        result["heuristic_ok"] = result["heuristic_tool"] == entry["tool"] if result["heuristic_tool"] else None
+        results.append(result)
+        mark = "✓" if result["tool_ok"] and result["args_ok"] else "✗"
+        print(f"  [BENCH] {mark} {brain_s*1000:7.1f}ms  llm={result['llm_calls']}  "
+              f"{record['intent'] or '-':<9} {tool:<14} {entry['text']}", flush=True)
+    return results
+
+
+def summarize_corpus(results):
+    n = len(results)
+    heuristic_hits = [r for r in results if r["heuristic_tool"]]
+    return {
+        "utterances": n,
+        "accuracy": {
+            "intent": round(sum(r["intent_ok"] for r in results) / n, 3),
+            "tool": round(sum(r["tool_ok"] for r in results) / n, 3),
+            "tool_and_args": round(sum(r["tool_ok"] and r["args_ok"] for r in results) / n, 3),
+            "heuristic_coverage": round(len(heuristic_hits) / n, 3),
+            "heuristic_precision": round(sum(bool(r["heuristic_ok"]) for r in heuristic_hits) / len(heuristic_hits), 3)
+                                   if heuristic_hits else None,
+        },
+        "llm_calls": {
+            "mean": round(statistics.mean(r["llm_calls"] for r in results), 3),
+            "max": max(r["llm_calls"] for r in results),
+            "without_llm": round(sum(1 for r in results if not r["llm_calls"]) / n, 3),
+        },
+        "latency_ms": {stage: percentiles([r["latency"][stage] for r in results])
+                       for stage in ("heuristic", "classify", "llm", "brain_query")},
+    }
+
+
+def _version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_corpus_report(summary, baseline=None):
+    """Résumé lisible ; avec un rapport de référence, l'écart de chaque chiffre."""
+    def delta(path, value):
+        ref = baseline
+        for key in path:
+            ref = ref.get(key) if isinstance(ref, dict) else None
+        if not isinstance(ref, (int, float)) or not isinstance(value, (int, float)):
+            return ""
+        return f"  ({value - ref:+.3f})"
+
+    print("\n=== BENCH CORPUS ===")
+    for key, value in summary["accuracy"].items():
+        print(f"Exactitude {key:<20} {value}{delta(('summary', 'accuracy', key), value)}")
+    for key, value in summary["llm_calls"].items():
+        print(f"Appels LLM {key:<20} {value}{delta(('summary', 'llm_calls', key), value)}")
+    for stage, pct in summary["latency_ms"].items():
+        cells = " | ".join(f"{q} {v:.1f}ms{delta(('summary', 'latency_ms', stage, q), v)}" for q, v in pct.items())
+        print(f"Latence {stage:<12} {cells}")
+    print("====================\n")
+
+
+def corpus_main(args):
+    server = None
+    if not args.real_llm:
+        # Serveur scripté, en mémoire seulement (memory.json n'est pas réécrit)
+        server = ScriptedLLM(BENCH_CORPUS, latency=args.llm_latency, token_delay=args.token_delay).start()
+        igor_config.MEMORY.update({"llm_backend": "llamacpp", "llm_api_url": server.url, "llm_instances": []})
+    backend = igor_llm.active_backend()
+    print(f"  [BENCH] Corpus : {len(BENCH_CORPUS)} phrases, LLM {backend.get('url')}", flush=True)
+    try:
+        results = run_corpus(BENCH_CORPUS, runs=args.runs, server=server)
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "version": _version(),
+        "config": {"scripted_llm": server is not None, "llm_latency": args.llm_latency,
+                   "token_delay": args.token_delay, "runs": args.runs,
+                   "flags": {k: igor_config.MEMORY.get(k, False) for k in
+                             ("single_pass_brain", "intent_scoring", "local_intent", "llm_hedging")}},
+        "summary": summarize_corpus(results),
+        "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_corpus_report(report["summary"], baseline)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    accuracy = report["summary"]["accuracy"]["tool_and_args"]
+    if args.min_accuracy is not None and accuracy < args.min_accuracy:
+        print(f"  [BENCH] ❌ Exactitude {accuracy} sous le seuil {args.min_accuracy}", flush=True)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare les modes du cerveau (latence par phrase).")
+    parser.add_argument("--runs", type=int, default=1, help="Mesures par phrase (médiane retenue)")
+    parser.add_argument("--modes", default="two_pass,single_pass", help="Modes à comparer, séparés par des virgules")
+    parser.add_argument("--json", dest="json_path", help="Écrit aussi le rapport complet dans ce fichier")
+    parser.add_argument("--corpus", action="store_true", help="Corpus étiqueté : exactitude et latence par étape")
+    parser.add_argument("--real-llm", action="store_true", help="Corpus face au backend configuré au lieu du serveur scripté")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Serveur scripté : délai avant réponse (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Serveur scripté : délai par token (s)")
+    parser.add_argument("--baseline", help="Rapport JSON d'une autre version, pour afficher les écarts")
+    parser.add_argument("--min-accuracy", type=float, help="Corpus : code de sortie 1 si l'exactitude tool+args passe sous ce seuil")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        return corpus_main(args)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip() in MODES]
+    backend = igor_llm.active_backend()
+    print(f"  [BENCH] Backend : {backend.get('type')} {backend.get('model_name') or backend.get('url')}", flush=True)
+
+    report = {}
+    for mode in modes:
+        results = run_mode(mode, BENCH_UTTERANCES, runs=args.runs)
+        report[mode] = {"summary": summarize(results), "results": results}
+
+    print("\n=== BENCH CERVEAU ===")
+    for mode in modes:
+        s = report[mode]["summary"]
+        print(f"{mode:<12} moyenne {s['mean']:.2f}s | médiane {s['median']:.2f}s | p90 {s['p90']:.2f}s | échecs {s['failures']}")
+    if "two_pass" in report and "single_pass" in report:
+        saved = report["two_pass"]["summary"]["total"] - report["single_pass"]["summary"]["total"]
+        per_turn = saved / len(BENCH_UTTERANCES)
+        print(f"Gain une passe : {saved:.2f}s au total, {per_turn:.2f}s par commande")
+        agree = sum(1 for a, b in zip(report["two_pass"]["results"], report["single_pass"]["results"])
+                    if a["intent"] == b["intent"])
+        print(f"Intentions identiques : {agree}/{len(BENCH_UTTERANCES)}")
+    print("=====================\n")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,49 +2,69 @@
 import os
 import re
 import json
-import hashlib
 import requests
 import threading
 from functools import lru_cache
 import unicodedata
 import string
 import time
+import hashlib
+import collections
+import logging
 import subprocess
 import igor_skills as skills
 import igor_config
 import igor_globals
+import igor_llm
+import igor_intent_index
+import igor_intent_model
+import igor_intent_cache
+import igor_turnlog
 from igor_system import INSTALLED_APPS, APP_METADATA
+import igor_log
 
-def call_llm_api(prompt, n_predict=150, stop=None, temperature=0.1, grammar=None):
+log = igor_log.get_logger("brain")
+
+def call_llm_api(prompt, n_predict=150, stop=None, temperature=0.1, grammar=None, stop_on_json=False, hedge=False,
+                 prefix_key=None, json_schema=None):
+    """Appel LLM (voir _call_llm_api), compté et chronométré dans le tour en cours."""
+    started = time.time()
+    try:
+        return _call_llm_api(prompt, n_predict=n_predict, stop=stop, temperature=temperature, grammar=grammar,
+                             stop_on_json=stop_on_json, hedge=hedge, prefix_key=prefix_key, json_schema=json_schema)
+    finally:
+        turn = igor_turnlog.current()
+        if turn is not None:
+            turn.count_llm_call(time.time() - started)
+
+def _call_llm_api(prompt, n_predict=150, stop=None, temperature=0.1, grammar=None, stop_on_json=False, hedge=False,
+                  prefix_key=None, json_schema=None):
     """
     Fonction unifiée pour appeler le LLM avec gestion de fallback automatique.
     Si le premier modèle échoue, passe au suivant dans la liste configurée.
+    stop_on_json : génération en streaming, coupée dès que le JSON de réponse est complet.
+    hedge : prompt très court, requête couverte sur 2 backends si le mode 'llm_hedging' est actif.
+    prefix_key : le prompt commence par le préfixe statique de cette clé (cache KV réutilisé).
+    json_schema : équivalent Ollama de 'grammar' (sorties structurées), ignoré par Llama.cpp.
     """
     if stop is None:
         stop = ["User:", "\n\n"]
 
-    # 1. Construction de la liste des candidats (Config actuelle + Instances enregistrées)
-    candidates = []
-    
-    # A. Configuration actuelle (Prioritaire)
-    candidates.append({
-        'type': skills.MEMORY.get('llm_backend', 'llamacpp'),
-        'url': skills.MEMORY.get('llm_api_url', igor_globals.API_URL),
-        'model_name': skills.MEMORY.get('llm_model_name', 'mistral-small'),
-        'is_current': True
-    })
-
-    # B. Autres instances disponibles (Fallback)
-    instances = skills.MEMORY.get('llm_instances', [])
-    for inst in instances:
-        if inst.get('enabled', True):
-            # On évite d'ajouter le doublon de la config actuelle
-            if inst.get('url') == candidates[0]['url'] and \
-               inst.get('model_name') == candidates[0]['model_name']:
-                continue
-            inst_copy = inst.copy()
-            inst_copy['is_current'] = False
-            candidates.append(inst_copy)
+    # 1. Candidats (Config actuelle + Instances activées) triés par le routeur :
+    # latence attendue, instances en échec répété écartées (circuit ouvert)
+    candidates = igor_llm.ROUTER.candidates(n_predict)
+
+    # 1bis. Requête couverte (opt-in) : le 2e backend n'est sollicité que si le 1er tarde
+    if hedge and igor_llm.hedging_enabled() and len(candidates) >= 2:
+        try:
+            return igor_llm.generate_hedged(prompt, backends=candidates[:2], n_predict=n_predict,
+                                            temperature=temperature, stop=stop)
+        except igor_llm.LLMCancelled:
+            log.info("  [LLM] 🛑 Requête annulée (STOP).")
+            return None
+        except igor_llm.LLMError as e:
+            log.warning("  [LLM] ⚠️ Requête couverte en échec (%s), passage aux autres instances...", e)
+            candidates = candidates[2:]
 
     # 2. Boucle de tentative
     for i, candidate in enumerate(candidates):
@@ -54,7 +74,7 @@ def call_llm_api(prompt, n_predict=150, stop=None, temperature=0.1, grammar=None
         
         # Log discret sauf si switch
         if i > 0:
-            print(f"  [LLM] 🔄 Tentative fallback sur : {backend} ({model_name or 'Local'})...", flush=True)
+            log.info("  [LLM] 🔄 Tentative fallback sur : %s (%s)...", backend, model_name or 'Local')
 
         # --- DÉTECTION MODÈLE RAISONNEMENT (DEEPSEEK R1) ---
         # Si le nom contient 'r1' ou 'deepseek', on augmente massivement le budget tokens et le timeout
@@ -76,66 +96,55 @@ def call_llm_api(prompt, n_predict=150, stop=None, temperature=0.1, grammar=None
             # mais pour du JSON strict, on reste bas (0.1 ou 0.6 recommandé pour R1)
             temperature = 0.6 
 
-        if backend == 'ollama':
-            # Format API Ollama (/api/generate)
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": effective_n_predict, # Utilisation de la valeur ajustée
-                    "temperature": temperature,
-                    "stop": stop
-                }
-            }
-            
+        # Llama.cpp gère le grammar, donc pas besoin d'augmenter n_predict artificiellement
+        # sauf si on utilisait un GGUF R1 (support encore expérimental pour grammar + think)
+        if backend != 'ollama':
+            effective_n_predict = n_predict
+
+        # Timeout adaptatif : un serveur bloqué (et non refusé) ne fige plus le tour pendant 5 minutes
+        request_timeout = igor_llm.ROUTER.timeout_for(candidate, current_timeout, effective_n_predict)
+        started = time.time()
+
+        try:
+            # Client partagé : payload Ollama/Llama.cpp + connexion keep-alive réutilisée
             # Optionnel : Forcer le mode JSON pour Ollama si ce n'est PAS un modèle R1
             # (R1 gère mal le format:json natif car il veut output <think> qui n'est pas du JSON)
-            if not is_reasoning:
-                payload["format"] = "json"
+            text = igor_llm.generate(
+                prompt,
+                backend=candidate,
+                n_predict=effective_n_predict,
+                temperature=temperature,
+                stop=stop,
+                grammar=grammar if not is_reasoning else None,
+                json_mode=(json_schema or True) if not is_reasoning else False,
+                timeout=request_timeout,
+                # Pas de coupure anticipée pour R1 : le bloc <think> peut contenir des accolades
+                stop_on_json=stop_on_json and not is_reasoning,
+                prefix_key=prefix_key
+            )
 
-        else:
-            # Format API Llama.cpp Server (/completion)
-            # Llama.cpp gère le grammar, donc pas besoin d'augmenter n_predict artificiellement
-            # sauf si on utilisait un GGUF R1 (support encore expérimental pour grammar + think)
-            payload = {
-                "prompt": prompt,
-                "n_predict": n_predict, # On garde la valeur standard pour Llama.cpp pour l'instant
-                "temperature": temperature,
-                "stop": stop
-            }
-            if grammar and not is_reasoning:
-                payload["grammar"] = grammar
+            igor_llm.ROUTER.record_success(candidate, time.time() - started, effective_n_predict)
 
-        try:
-            # Utilisation de l'URL configurée (Llama.cpp ou Ollama)
-            res = requests.post(url, json=payload, timeout=current_timeout)
-            
-            if res.status_code == 200:
-                data = res.json()
-                
-                # SI SUCCESS SUR UN FALLBACK -> MISE À JOUR DE LA CONFIGURATION
-                if not candidate.get('is_current'):
-                    print(f"  [LLM] ✅ Nouveau modèle actif : {model_name or backend}", flush=True)
-                    skills.MEMORY['llm_backend'] = backend
-                    skills.MEMORY['llm_api_url'] = url
-                    if model_name:
-                        skills.MEMORY['llm_model_name'] = model_name
-                    skills.save_memory(skills.MEMORY)
-
-                # Normalisation de la réponse
-                if backend == 'ollama':
-                    return data.get('response', '').strip()
-                else:
-                    return data.get('content', '').strip()
-            else:
-                print(f"  [LLM] ⚠️ Erreur {res.status_code} sur {model_name or url}: {res.text}", flush=True)
-                # On continue vers le prochain candidat
+            # Succès sur une instance de secours : le routeur s'en souvient (en mémoire seulement),
+            # la configuration persistante reste celle choisie par l'utilisateur
+            if not candidate.get('is_current'):
+                log.info("  [LLM] ✅ Réponse via instance de secours : %s", model_name or backend)
+
+            return text
+        except igor_llm.LLMCancelled:
+            # STOP utilisateur : ni échec de l'instance, ni fallback sur la suivante
+            log.info("  [LLM] 🛑 Requête annulée (STOP).")
+            return None
+        except igor_llm.LLMError as e:
+            igor_llm.ROUTER.record_failure(candidate)
+            log.warning("  [LLM] ⚠️ Erreur sur %s: %s", model_name or url, e)
+            # On continue vers le prochain candidat
         except Exception as e:
-            print(f"  [LLM] ⚠️ Exception sur {model_name or url}: {e}", flush=True)
+            igor_llm.ROUTER.record_failure(candidate)
+            log.warning("  [LLM] ⚠️ Exception sur %s: %s", model_name or url, e)
             # On continue vers le prochain candidat
 
-    print("  [LLM] ❌ CRITIQUE : Tous les modèles ont échoué.", flush=True)
+    log.error("  [LLM] ❌ CRITIQUE : Tous les modèles ont échoué.")
     return None
     
 def check_llama_status():
@@ -154,17 +163,92 @@ def check_ollama_status():
     except:
         return False
 
+LOCAL_SERVER_BACKEND = {'type': 'llamacpp', 'url': "http://localhost:8080/completion", 'model_name': None}
+SERVER_READY_TIMEOUT = 300.0   # Chargement d'un gros GGUF sur disque lent
+SERVER_POLL_INTERVAL = 0.5
+
+def wait_for_server_ready(proc=None, timeout=SERVER_READY_TIMEOUT):
+    """
+    Attend que llama-server réponde 200 sur /health (503 tant que le modèle charge).
+    Renvoie False si le processus meurt ou si le délai est dépassé.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            return False
+        if igor_llm.probe_backend(LOCAL_SERVER_BACKEND, timeout=1.0):
+            return True
+        time.sleep(SERVER_POLL_INTERVAL)
+    return False
+
+def prefix_frequencies():
+    """Appels de chaque préfixe statique d'après le journal des tours (intention, mode une passe)."""
+    counts = collections.Counter()
+    for turn in igor_turnlog.read_turns():
+        for entry in turn.get("segments") or (turn,):
+            if entry.get("source") == "single_pass":
+                counts[SINGLE_PASS_KEY] += 1
+            elif entry.get("intent") and entry.get("llm_calls"):
+                counts[entry["intent"]] += 1
+    return counts
+
+def warm_up_prompt_cache(backend=LOCAL_SERVER_BACKEND):
+    """
+    Pré-évalue les préfixes statiques les plus fréquents (1 token généré), autant que
+    le serveur a de slots, pour que leur cache KV soit déjà rempli au premier vrai tour.
+    Au-delà, une préchauffe écraserait le cache d'un préfixe déjà chauffé.
+    """
+    started = time.time()
+    prefixes = [(intent, build_intent_prefix) for intent in igor_globals.INTENT_TOOL_GROUPS]
+    if single_pass_enabled():
+        prefixes.insert(0, (SINGLE_PASS_KEY, lambda _key: build_single_pass_prefix()))
+    counts = prefix_frequencies()
+    igor_llm.seed_prefix_hits(counts)
+    # Tri stable : à fréquence égale (journal vide), l'ordre par défaut est conservé
+    prefixes.sort(key=lambda item: -counts[item[0]])
+    prefixes = prefixes[:max(1, igor_llm.launched_slots(backend))]
+    for intent, build_prefix in prefixes:
+        if igor_globals.LLM_SERVER_STATE != "warming":
+            return # Serveur arrêté pendant la préchauffe
+        try:
+            igor_llm.generate(build_prefix(intent), backend=backend, n_predict=1,
+                              temperature=0.0, timeout=120, prefix_key=intent)
+        except igor_llm.LLMError as e:
+            log.warning("  [LLM-SRV] ⚠️ Préchauffe %s échouée : %s", intent, e)
+    log.info("  [LLM-SRV] 🔥 Préchauffe de %s préfixe(s) terminée en %.1fs", len(prefixes), time.time() - started)
+    # TTFT à froid de chaque préfixe : référence pour les appels suivants (outil STATUS)
+    for line in igor_llm.ttft_report():
+        log.info("  [LLM-SRV] %s", line)
+
+def _await_ready_and_warm_up(proc):
+    """Thread de démarrage : chargement du modèle -> préchauffe -> prêt."""
+    load_started = time.time()
+    if not wait_for_server_ready(proc):
+        if igor_globals.LLM_SERVER_PROCESS is proc:
+            log.error("  [LLM-SRV] ❌ Le serveur n'est jamais devenu prêt (/health).")
+            igor_globals.LLM_SERVER_STATE = "stopped" if proc.poll() is not None else "loading"
+        return
+    if igor_globals.LLM_SERVER_PROCESS is not proc:
+        return # Arrêté entre-temps
+    log.info("  [LLM-SRV] ✅ Modèle chargé en %.1fs, préchauffe des prompts...", time.time() - load_started)
+    igor_globals.LLM_SERVER_STATE = "warming"
+    warm_up_prompt_cache()
+    if igor_globals.LLM_SERVER_PROCESS is proc:
+        igor_globals.LLM_SERVER_STATE = "ready"
+
 def manage_local_server(action):
     """Démarre ou arrête le serveur llama.cpp local."""
     if action == "stop":
         if igor_globals.LLM_SERVER_PROCESS:
-            print("  [LLM-SRV] Arrêt du serveur...", flush=True)
+            log.info("  [LLM-SRV] Arrêt du serveur...")
             igor_globals.LLM_SERVER_PROCESS.terminate()
             try:
                 igor_globals.LLM_SERVER_PROCESS.wait(timeout=2)
             except:
                 igor_globals.LLM_SERVER_PROCESS.kill()
             igor_globals.LLM_SERVER_PROCESS = None
+            igor_llm.forget_launched_server(LOCAL_SERVER_BACKEND['url'])
+        igor_globals.LLM_SERVER_STATE = "stopped"
         return False
 
     elif action == "start":
@@ -179,46 +263,53 @@ def manage_local_server(action):
         missing = False
         
         if not binary:
-            print("  [LLM-SRV] ❌ Config: Chemin binaire vide.", flush=True)
+            log.error("  [LLM-SRV] ❌ Config: Chemin binaire vide.")
             missing = True
         elif not os.path.isfile(binary):
-            print(f"  [LLM-SRV] ❌ FICHIER BINAIRE INTROUVABLE :\n    Attendu: '{binary}'\n    Conseil: Avez-vous compilé llama.cpp ? (make)", flush=True)
+            log.error("  [LLM-SRV] ❌ FICHIER BINAIRE INTROUVABLE :\n    Attendu: '%s'\n    Conseil: Avez-vous compilé llama.cpp ? (make)", binary)
             missing = True
         elif not os.access(binary, os.X_OK):
-            print(f"  [LLM-SRV] ⚠️ Permission refusée : '{binary}' n'est pas exécutable.\n    Tentative de correction (chmod +x)...", flush=True)
+            log.warning("  [LLM-SRV] ⚠️ Permission refusée : '%s' n'est pas exécutable.\n    Tentative de correction (chmod +x)...", binary)
             try:
                 os.chmod(binary, 0o755)
             except Exception as e:
-                print(f"    Echec chmod: {e}")
+                log.warning("    Echec chmod: %s", e)
                 missing = True
 
         if not model:
-            print("  [LLM-SRV] ❌ Config: Chemin modèle vide.", flush=True)
+            log.error("  [LLM-SRV] ❌ Config: Chemin modèle vide.")
             missing = True
         elif not os.path.isfile(model):
-            print(f"  [LLM-SRV] ❌ FICHIER MODÈLE INTROUVABLE :\n    Attendu: '{model}'\n    Conseil: Vérifiez le nom exact du fichier.", flush=True)
+            log.error("  [LLM-SRV] ❌ FICHIER MODÈLE INTROUVABLE :\n    Attendu: '%s'\n    Conseil: Vérifiez le nom exact du fichier.", model)
             missing = True
 
         if missing:
             return False
 
         try:
-            print(f"  [LLM-SRV] Démarrage : {os.path.basename(binary)} sur {os.path.basename(model)}", flush=True)
+            log.info("  [LLM-SRV] Démarrage : %s sur %s", os.path.basename(binary), os.path.basename(model))
             
+            # Slots parallèles : les préfixes les plus fréquents gardent chacun leur cache KV (id_slot)
+            # Le contexte est partagé entre slots, on le dimensionne pour ~3k tokens par slot
+            slots = igor_llm.prompt_slots()
+            ctx_size = max(8192, 3072 * slots)
+
             # Commande de démarrage standard
             cmd = [
                 binary,
                 "-m", model,
-                "-c", "8192",      # Contexte augmenté (8k standard ajd)
+                "-c", str(ctx_size), # Contexte augmenté (8k standard ajd, plus si plusieurs slots)
                 "--port", "8080",
                 "-ngl", "99",      # GPU Layers
                 "--host", "0.0.0.0"
             ]
+            if slots > 1:
+                cmd += ["-np", str(slots)]
             
             # DEBUG : Affichage de la commande complète
             import shlex
             cmd_str = ' '.join(shlex.quote(s) for s in cmd)
-            print(f"  [LLM-SRV] 📟 COMMANDE LANCÉE :\n{cmd_str}", flush=True)
+            log.info("  [LLM-SRV] 📟 COMMANDE LANCÉE :\n%s", cmd_str)
             
             # Lancement avec capture des erreurs (stderr=PIPE)
             # On utilise text=True pour recevoir des chaînes de caractères
@@ -236,8 +327,8 @@ def manage_local_server(action):
                 
                 # Si on arrive ici, c'est que le processus s'est ARRÊTÉ (Crash)
                 _, stderr_output = igor_globals.LLM_SERVER_PROCESS.communicate()
-                print(f"  [LLM-SRV] ❌ CRASH AU DÉMARRAGE (Code {ret_code}) :", flush=True)
-                print(f"  [LLM-LOG] {stderr_output}", flush=True)
+                log.error("  [LLM-SRV] ❌ CRASH AU DÉMARRAGE (Code %s) :", ret_code)
+                log.error("  [LLM-LOG] %s", stderr_output)
                 igor_globals.LLM_SERVER_PROCESS = None
                 return False
                 
@@ -248,95 +339,104 @@ def manage_local_server(action):
                 def monitor_stderr(proc):
                     for line in proc.stderr:
                         if "error" in line.lower() or "warning" in line.lower():
-                            print(f"  [LLM-LOG] {line.strip()}", flush=True)
+                            log.warning("  [LLM-LOG] %s", line.strip())
                 
                 t = threading.Thread(target=monitor_stderr, args=(igor_globals.LLM_SERVER_PROCESS,), daemon=True)
                 t.start()
+
+                # Serveur à nous : -np connu, l'épinglage des préfixes (id_slot) est sûr
+                igor_llm.register_launched_server(LOCAL_SERVER_BACKEND['url'], slots if slots > 1 else 1)
+                
+                # Le processus tourne mais le modèle est peut-être encore en chargement :
+                # attente de /health puis préchauffe des préfixes, en tâche de fond (UI non bloquée)
+                igor_globals.LLM_SERVER_STATE = "loading"
+                threading.Thread(target=_await_ready_and_warm_up,
+                                 args=(igor_globals.LLM_SERVER_PROCESS,), daemon=True).start()
                 
-                print("  [LLM-SRV] ✅ Serveur démarré avec succès.", flush=True)
+                log.info("  [LLM-SRV] ✅ Serveur démarré avec succès (chargement du modèle...)")
                 return True
                 
         except Exception as e:
-            print(f"  [LLM-SRV] Exception démarrage : {e}", flush=True)
+            log.error("  [LLM-SRV] Exception démarrage : %s", e)
             return False
 
-def check_intent_category(words, actions, objects, category, focus = 0, inquiries = {}, states = {}, points_needed = 1):
-    found_actions = words.intersection(actions)
-    found_objects = words.intersection(objects)
-    found_inquiries = set()
-    found_states = set()
-    if(inquiries):
-        found_inquiries = words.intersection(inquiries)
-    if(states):
-        found_states = words.intersection(states)
-    
-    agent_name = set([skills.MEMORY['agent_name'].lower()])
-
-    trust_level = 1.0
-
-    noise_words = words - found_actions - found_objects - found_inquiries - found_states - igor_globals.STOP_WORDS - agent_name
-
-    noise_words = {word for word in noise_words if len(word) >= 3}
-
-    words_without_stop = words - igor_globals.STOP_WORDS - agent_name #Met la sonnerie en mode douceur > met sonnerie mode douceur
-
-    words_diff = words_without_stop - noise_words
-
-    #print(f"  [INTENT CATEGORY] actions: {actions}", flush=True)
-    print(f"  [INTENT CATEGORY] {category}\nwords: {words}\nnoise_words: {noise_words}\nfound_actions: {len(found_actions)}\nfound_objects: {len(found_objects)}\nfound_inquiries: {len(found_inquiries)}\nfound_states: {len(found_states)}\nwords diff: {words_diff}", flush=True)
-
-    has_action = bool(found_actions)
-    has_object = bool(found_objects)
-    has_inquiries = bool(found_inquiries)
-    has_states = bool(found_states)
-    action_count = len(found_actions)
-    object_count = len(found_objects)
-    inquiries_count = len(found_inquiries)
-    states_count = len(found_states)
-    action_points = action_count * 5
-    object_points = object_count * 2
-    total_points = action_points + object_points
-    #inquiries_count =
-    #states_count = 
-
-    is_focused_command = len(words_diff) <= focus and (len(found_objects) + len(found_inquiries) + len(found_states)) >= points_needed
-
-    print(f"  [INTENT POINTS] {total_points}", flush=True)
-    #print(f"  [INTENT CATEGORY] has action: {has_action}", flush=True)
-    #print(f"  [INTENT CATEGORY] is_focused_command: {is_focused_command}", flush=True)
-
-    if has_action:
-        total_points += inquiries_count + states_count
-
-    #if total_points >= 7.0:
-        #return category
-
-    #if has_action:
-        #if not has_object and is_focused_command:
-        #    return category
-        #if has_object:
-        #    return category
-    #return
-    return total_points
-    
-
-@lru_cache(maxsize=256)
-def classify_query_intent(user_input):
+# === SCORE DES ÉTIQUETTES D'INTENTION (PHASE 0, MODE RAPIDE) ===
+# Une lettre par étiquette : chaque code tient en un token, le serveur n'évalue qu'un token
+INTENT_LABEL_CODES = {
+    "A": "ALARM", "B": "TIME", "C": "WEATHER", "D": "MEDIA", "E": "MEMORY", "F": "PROJECT",
+    "G": "LAUNCH", "H": "CONTROL", "I": "SEARCH", "J": "KNOWLEDGE", "K": "CHAT",
+}
+INTENT_SCORE_KEY = "INTENT_SCORE"
+INTENT_SCORE_THRESHOLD = 0.5   # Probabilité minimale pour court-circuiter les filtres
+
+INTENT_SCORE_PREFIX = """Classe la demande dans UNE catégorie. Réponds par la lettre seule.
+A) ALARM : réveil, alarmes, heure de lever
+B) TIME : heure actuelle
+C) WEATHER : météo, température
+D) MEDIA : musique, son, volume, identifier un son
+E) MEMORY : carnet de notes, rappels, faits connus sur l'utilisateur
+F) PROJECT : projets de développement, fichiers et tâches de projet
+G) LAUNCH : ouvrir un logiciel, un site, une vidéo
+H) CONTROL : fenêtres, plein écran, réglages de l'assistant
+I) SEARCH : recherche web
+J) KNOWLEDGE : savoir général, apprendre un sujet, calcul
+K) CHAT : discussion, autre
+
+Exemples :
+"À quelle heure je me lève ?" -> A
+"C'est quoi ce son ?" -> D
+"Rappelle-moi de..." -> E
+"Il fera chaud ?" -> C
+"J'ai quel âge ?" -> E"""
+
+def intent_scoring_enabled():
+    """Mode opt-in ('intent_scoring' dans memory.json)."""
+    return bool(skills.MEMORY.get('intent_scoring', False))
+
+def score_intent_labels(user_input):
     """
-    Classification avec priorité à la compréhension sémantique (LLM) pour les phrases complexes.
+    Distribution de probabilité sur les intentions, lue sur UN token (n_probs de Llama.cpp).
+    Renvoie {INTENTION: probabilité} renormalisé, ou {} si indisponible (Ollama, erreur).
     """
-    current_timestamp = time.time()
-    print(f"    [TIMESTAMP START] {current_timestamp}",flush=True)
+    backend = next((b for b in igor_llm.ROUTER.candidates(1) if b.get('type') != 'ollama'), None)
+    if backend is None:
+        return {}
 
-    lower = user_input.lower().strip()
-    cleaned = remove_accents_and_special_chars(lower)
-    
-    # === PHASE 0 : COMPRÉHENSION D'INTENTION BRUTE (LLM FIRST) ===
-    # On interroge le LLM en premier pour capturer le sens implicite (ex: "je me lève" = ALARME)
-    # Condition : Phrase > 3 mots pour ne pas ralentir les commandes simples ("Stop", "Heure")
-    if len(lower.split()) > 3:
-        print(f"  [CLASSIFY] 🧠 Analyse sémantique profonde (LLM)...", flush=True)
-        
+    prompt = f'{INTENT_SCORE_PREFIX}\n\nDemande : "{user_input}"\nLettre :'
+    started = time.time()
+    try:
+        scores = igor_llm.label_probabilities(prompt, list(INTENT_LABEL_CODES), backend=backend,
+                                              timeout=igor_llm.ROUTER.timeout_for(backend, 30.0, 1),
+                                              prefix_key=INTENT_SCORE_KEY)
+    except igor_llm.LLMError as e:
+        igor_llm.ROUTER.record_failure(backend)
+        log.warning("  [CLASSIFY] ⚠️ Score d'intention indisponible : %s", e)
+        return {}
+    igor_llm.ROUTER.record_success(backend, time.time() - started, 1)
+    return {INTENT_LABEL_CODES[code]: prob for code, prob in scores.items()}
+
+def phase0_llm_intent(user_input):
+    """
+    Phase 0 de classify_query_intent : compréhension du sens implicite par le LLM
+    (score des étiquettes ou fiche technique). Renvoie l'intention si elle fait
+    partie des intentions qui priment sur les mots-clés, sinon None.
+    """
+    log.info("  [CLASSIFY] 🧠 Analyse sémantique profonde (LLM)...")
+
+    # On accepte l'intention si ce n'est pas CHAT (pour CHAT, on laisse les filtres décider)
+    # Cela permet de forcer ALARM même si les mots clés "sonnerie" sont absents
+    valid_overrides = {"ALARM", "MEDIA", "WEATHER", "TIME", "MEMORY", "PROJECT"}
+
+    # Mode score (opt-in) : un seul token évalué au lieu d'une fiche de 200 tokens
+    distribution = score_intent_labels(user_input) if intent_scoring_enabled() else {}
+    if distribution:
+        detected, confidence = max(distribution.items(), key=lambda kv: kv[1])
+        top3 = sorted(distribution.items(), key=lambda kv: kv[1], reverse=True)[:3]
+        log.info("  [CLASSIFY] 📊 Scores : %s", ", ".join(f"{k} {v:.2f}" for k, v in top3))
+        if detected in valid_overrides and confidence >= INTENT_SCORE_THRESHOLD:
+            log.info("  [CLASSIFY] 🎯 Intention comprise par LLM : %s (%.2f)", detected, confidence)
+            return detected
+    else:
         # Prompt spécialisé pour la déduction de contexte implicite
         pre_prompt = f"""Remplis la fiche technique de la demande.
 CATÉGORIES : ALARM, TIME, WEATHER, MULTIMEDIA, CHAT, DEVELOPMENT, CONTROL_OS, NOTEBOOK, WEB_SEARCH, USER_KNOWN_FACTS.
@@ -357,7 +457,7 @@ NATURE (littéral)"""
 
         # Appel augmenté (besoin de plus de tokens pour générer la fiche complète)
         raw_response = call_llm_api(pre_prompt, n_predict=200, temperature=0.0)
-        
+    
         detected = None
         if raw_response:
             # Extraction précise de la ligne CATÉGORIES via Regex
@@ -365,278 +465,219 @@ NATURE (littéral)"""
             match = re.search(r"(?:CATÉGORIES|CATEGORIES)\s*[:]\s*([A-Z_]+)", raw_response, re.IGNORECASE)
             if match:
                 detected = match.group(1).upper().strip()
-                print(f"  [CLASSIFY] 📄 Fiche extraite : {detected}\nRAW : {raw_response}", flush=True)
-            
-            # On accepte l'intention si ce n'est pas CHAT (pour CHAT, on laisse les filtres décider)
-            # Cela permet de forcer ALARM même si les mots clés "sonnerie" sont absents
-            valid_overrides = {"ALARM", "MEDIA", "WEATHER", "TIME", "MEMORY", "PROJECT"}
-            
+                log.info("  [CLASSIFY] 📄 Fiche extraite : %s\nRAW : %s", detected, raw_response)
+        
             if detected in valid_overrides:
-                print(f"  [CLASSIFY] 🎯 Intention comprise par LLM : {detected}", flush=True)
+                log.info("  [CLASSIFY] 🎯 Intention comprise par LLM : %s", detected)
                 return detected
+    return None
+
+# === CLASSIFIEUR LOCAL (CPU, SANS LLM) ===
+LOCAL_INTENT_THRESHOLD = 0.85   # Confiance minimale pour se passer du LLM
+
+def local_intent_enabled():
+    """Mode opt-in ('local_intent' dans memory.json)."""
+    return bool(skills.MEMORY.get('local_intent', False))
+
+def local_intent(user_input):
+    """Intention du classifieur local si sa confiance suffit, sinon None."""
+    intent, confidence = igor_intent_model.predict(user_input)
+    threshold = skills.MEMORY.get('local_intent_threshold', LOCAL_INTENT_THRESHOLD)
+    if intent and confidence >= threshold:
+        log.info("  [CLASSIFY] 🧮 Classifieur local : %s (%.2f)", intent, confidence)
+        return intent
+    return None
+
+def commit_keyword_intent(speculation, intent):
+    """Les mots-clés ont tranché : la spéculation LLM en cours est abandonnée."""
+    if speculation is not None:
+        speculation.cancel()
+    return intent
+
+# === CACHE PERSISTANT DES CLASSEMENTS ===
+INTENT_CACHE = igor_intent_cache.IntentCache()
+_CLASSIFY_STATE = threading.local()   # 'transient' : résultat de repli à ne pas mémoriser
 
-    ranking = dict()
+def classify_query_intent(user_input):
+    """
+    Classification avec cache disque, clé = phrase normalisée (sans mot d'éveil,
+    accents ni ponctuation). Invalidé quand les vocabulaires ou les applis changent.
+    """
+    key = utterance_key(user_input)
+    fingerprint = igor_intent_index.get_index().digest
+    turn = igor_turnlog.current()
+    cached = INTENT_CACHE.get(key, fingerprint)
+    if cached:
+        log.info("  [CLASSIFY] 💾 Cache : %s", cached)
+        if turn is not None:
+            turn.set(intent=cached, source="cache")
+        return cached
+
+    _CLASSIFY_STATE.transient = False
+    started = time.time()
+    intent = _classify_query_intent(user_input)
+    if turn is not None:
+        turn.add_latency("classify", time.time() - started)
+        turn.set(intent=intent)
+    if not _CLASSIFY_STATE.transient:
+        INTENT_CACHE.put(key, intent, fingerprint)
+    return intent
+
+def note_classify_source(source, **fields):
+    """Source de la décision de classement (journal des tours)."""
+    turn = igor_turnlog.current()
+    if turn is not None:
+        turn.set(source=source, **fields)
+
+def _classify_query_intent(user_input):
+    """
+    Classification avec priorité à la compréhension sémantique (LLM) pour les phrases complexes.
+    """
+    current_timestamp = time.time()
+    log.debug("    [TIMESTAMP START] %s", current_timestamp)
+
+    lower = user_input.lower().strip()
+    cleaned = remove_accents_and_special_chars(lower)
     
+    # === PHASE 0 : COMPRÉHENSION D'INTENTION BRUTE (LLM FIRST) ===
+    # On interroge le LLM en premier pour capturer le sens implicite (ex: "je me lève" = ALARME)
+    # Condition : Phrase > 3 mots pour ne pas ralentir les commandes simples ("Stop", "Heure")
+    # Lancée tout de suite, en parallèle du scoring par mots-clés ci-dessous :
+    # si les mots-clés suffisent (commande évidente), la requête LLM est annulée
+    # Classifieur local confiant : ni phase 0 ni appel IA final (les mots-clés gardent la priorité)
+    confident_local = local_intent(user_input) if local_intent_enabled() else None
+    speculation = None
+    if len(lower.split()) > 3 and not confident_local:
+        speculation = igor_llm.Speculation(igor_turnlog.bind(phase0_llm_intent), user_input, label="Analyse sémantique (phase 0)")
+
+    # Index précompilé (vocabulaires + applis installées) : un passage sur les mots,
+    # un passage de l'automate sur la phrase, au lieu de ~25 intersections et des dizaines de scans
+    index = igor_intent_index.get_index()
+    found = index.matches(cleaned)
+
     # === PRÉ-FILTRE ABSOLU : COMMANDES MULTIPLES ===
-    multi_keywords = [" et ", " puis ", " ensuite ", " apres "]
-    multi_count = sum(1 for multi in multi_keywords if multi in cleaned)
+    multi_count = len(found["multi"])
     
-    print(f"   [MULTIACTION] Conjonctions: {multi_count}", flush=True)
+    log.debug("   [MULTIACTION] Conjonctions: %s", multi_count)
 
     if multi_count > 0:
         # Vérifier qu'il y a bien 2 verbes d'action
-        verb_count = sum(1 for verb in igor_globals.MULTI_ACTIONS if verb in cleaned)
+        verb_count = len(found["multi_actions"])
         
-        print(f"   [MULTIACTION] Actions: {verb_count}", flush=True)
+        log.debug("   [MULTIACTION] Actions: %s", verb_count)
 
         if verb_count > multi_count:
-            print(f"  [CLASSIFY] 🎯 COMMANDES MULTIPLES détectées", flush=True)
-            return "CONTROL"  # CONTROL gère le BATCH
-
-    # === PRÉ-FILTRE ===
-    split_words = cleaned.split()
-    unique_words = set(split_words)
-    apps_list = set(INSTALLED_APPS)
-    
-    # === PRÉ-FILTRE : EXIT ===
-    #if (check_intent_category(unique_words, igor_globals.EXIT_ACTIONS, igor_globals.EXIT_OBJECTS, "IDENTITY", 0, set(), set(), 0)):
-    #print(f"  [CLASSIFY] PRÉ-FILTRE: IDENTITY (EXIT) - Regex: {lower}", flush=True)
-    points = check_intent_category(unique_words, igor_globals.EXIT_ACTIONS, igor_globals.EXIT_OBJECTS, "IDENTITY", 0, set(), set(), 0)
-    ranking["IDENTITY"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: IDENTITY (EXIT) - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : IDENTITY (BASE) ===
-    points = check_intent_category(unique_words, igor_globals.BASE_ACTIONS, igor_globals.BASE_OBJECTS, "IDENTITY", 0 , igor_globals.BASE_INQUIRIES)
-    if ranking["IDENTITY"] < points:
-        ranking["IDENTITY"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: IDENTITY (BASE) - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SET FAVORITE ===
-    points = check_intent_category(unique_words, igor_globals.SETFAVORITE_ACTIONS, igor_globals.SETFAVORITE_OBJECTS, "CONTROL", 1)
-    ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (SET_FAVORITE) - Regex: {lower} Points: "+str(points), flush=True)
-
-    # === PRÉ-FILTRE : MEDIA (VOLUME) ===
-    points = check_intent_category(unique_words, igor_globals.VOLUME_ACTIONS, igor_globals.VOLUME_OBJECTS, "MEDIA")
-    ranking["MEDIA"] = points
-    print(f"  [CLASSIFY] ⛔ PRÉ-FILTRE: MEDIA (VOLUME) - Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : SET_MUTE ===
-    points = check_intent_category(unique_words, igor_globals.MUTE_ACTIONS, igor_globals.MUTE_OBJECTS, "MEDIA")
-    if ranking["MEDIA"] < points:
-        ranking["MEDIA"] = points
-    print(f"  [CLASSIFY] ⛔ PRÉ-FILTRE: MEDIA (SET_MUTE) - Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : MEDIA ===
-    points = check_intent_category(unique_words, igor_globals.LISTEN_ACTIONS, igor_globals.LISTEN_OBJECTS, "MEDIA", 0)
-    if ranking["MEDIA"] < points:
-        ranking["MEDIA"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: MEDIA (LISTEN_SYSTEM)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : MEDIA ===
-    points = check_intent_category(unique_words, igor_globals.MEDIA_ACTIONS, igor_globals.MEDIA_OBJECTS, "MEDIA", 1)
-    if ranking["MEDIA"] < points:
-        ranking["MEDIA"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: MEDIA - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SYSTEM (FIND) ===
-    points = check_intent_category(unique_words, igor_globals.FIND_ACTIONS, igor_globals.FIND_OBJECTS, "SYSTEM", 1)
-    ranking["SYSTEM"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SYSTEM (FIND) - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : MEMORY ===
-    points = check_intent_category(unique_words, igor_globals.NOTES_ACTIONS, igor_globals.NOTES_OBJECTS, "MEMORY")
-    ranking["MEMORY"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: MEMORY (NOTES)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : LAUNCH (app) ===   
-    open_objects = igor_globals.OPEN_OBJECTS | apps_list
-    points = check_intent_category(unique_words, igor_globals.OPEN_ACTIONS, open_objects, "LAUNCH", 1)
-    ranking["LAUNCH"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: LAUNCH (APP)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : LAUNCH (web) ===   
-    points = check_intent_category(unique_words, igor_globals.WEB_ACTIONS, igor_globals.WEB_OBJECTS, "LAUNCH")
-    if ranking["LAUNCH"] < points:
-        ranking["LAUNCH"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: LAUNCH (WEB)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : SHELL ===
-    points = check_intent_category(unique_words, igor_globals.SHELL_ACTIONS, igor_globals.SHELL_OBJECTS, "SYSTEM", 1)
-    if ranking["SYSTEM"] < points:
-        ranking["SYSTEM"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SYSTEM (SHELL)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : CONTROL (FULLSCREEN) ===
-    fullscreen_objects = igor_globals.FULLSCREEN_OBJECTS | apps_list
-    points = check_intent_category(unique_words, igor_globals.FULLSCREEN_ACTIONS, fullscreen_objects, "CONTROL", 0, set(), igor_globals.FULLSCREEN_STATES)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (FULLSCREEN)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : CONTROL (CLOSE WINDOW)===
-    close_object = igor_globals.CLOSE_OBJECTS | apps_list
-    points = check_intent_category(unique_words, igor_globals.CLOSE_ACTIONS, close_object, "CONTROL", 0)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (CLOSE WINDOW)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : CONTROL ===
-    points = check_intent_category(unique_words, igor_globals.CONTROL_ACTIONS, igor_globals.CONTROL_OBJECTS, "CONTROL", 0)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL - Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : CONTROL (WINDOW) ===
-    points = check_intent_category(unique_words, igor_globals.WINDOWSTATS_ACTIONS, igor_globals.WINDOWSTATS_OBJECTS,
-                               "CONTROL", 1, igor_globals.WINDOWSTATS_INQUIRIES, igor_globals.WINDOWSTATS_STATES)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (WINDOW)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : CONTROL (FOCUS) ===
-    focus_objects = igor_globals.FOCUS_OBJECTS | apps_list
-    points = check_intent_category(unique_words, igor_globals.FOCUS_ACTIONS, focus_objects, "CONTROL", 1)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (FOCUS)- Regex: {lower} Points: "+str(points), flush=True)
-        
-    # === PRÉ-FILTRE : VISION ===
-    points = check_intent_category(unique_words, igor_globals.VISION_ACTIONS, igor_globals.VISION_OBJECTS, "VISION")
-    ranking["VISION"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: VISION - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SHORTCUT ===
-    points = check_intent_category(unique_words, igor_globals.SHORTCUTLIST_ACTIONS, igor_globals.SHORTCUTLIST_OBJECTS, "SHORTCUT", 0)
-    ranking["SHORTCUT"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SHORTCUT (SHORTCUT_LIST)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SHORTCUT ===
-    points = check_intent_category(unique_words, igor_globals.SHORTCUT_ACTIONS, igor_globals.SHORTCUT_OBJECTS, "SHORTCUT", 2)
-    if ranking["SHORTCUT"] < points:
-        ranking["SHORTCUT"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SHORTCUT - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : MEMORY ===
-    points = check_intent_category(unique_words, igor_globals.READMEM_ACTIONS, igor_globals.READMEM_OBJECTS, "MEMORY")
-    if ranking["MEMORY"] < points:
-        ranking["MEMORY"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: MEMORY (READ_MEM)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SEARCH (TIME) ===
-    points = check_intent_category(unique_words, igor_globals.TIME_ACTIONS, igor_globals.TIME_OBJECTS, "SEARCH", 1, igor_globals.TIME_INQUIRIES)
-    ranking["SEARCH"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SEARCH (TIME)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SEARCH (METEO) ===
-    points = check_intent_category(unique_words, igor_globals.METEO_ACTIONS, igor_globals.METEO_OBJECTS, "SEARCH", 1, igor_globals.METEO_INQUIRIES)
-    if ranking["SEARCH"] < points:
-        ranking["SEARCH"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SEARCH (METEO)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : KNOWLEDGE ===
-    points = check_intent_category(unique_words, igor_globals.LEARN_ACTIONS, igor_globals.LEARN_OBJECTS, "KNOWLEDGE", 3)
-    ranking["KNOWLEDGE"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: KNOWLEDGE (LEARN)- Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : SEARCH ===
-    points = check_intent_category(unique_words, igor_globals.SEARCH_ACTIONS, igor_globals.SEARCH_OBJECTS, "SEARCH", 4)
-    if ranking["SEARCH"] < points:
-        ranking["SEARCH"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: SEARCH - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : CONTROL OPEN_FILE ===
-    points = check_intent_category(unique_words, igor_globals.OPEN_ACTIONS, igor_globals.OPEN_OBJECTS, "CONTROL", 2)
-    if ranking["CONTROL"] < points:
-        ranking["CONTROL"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: CONTROL (OPEN_FILE) - Regex: {lower} Points: "+str(points), flush=True)
-    
-    # === PRÉ-FILTRE : MEMORY ===
-    points = check_intent_category(unique_words, igor_globals.MEMORY_ACTIONS, igor_globals.MEMORY_OBJECTS, "MEMORY", 10)
-    if ranking["MEMORY"] < points:
-        ranking["MEMORY"] = points
-    print(f"  [CLASSIFY] PRÉ-FILTRE: MEMORY - Regex: {lower} Points: "+str(points), flush=True)
+            log.info("  [CLASSIFY] 🎯 COMMANDES MULTIPLES détectées")
+            note_classify_source("keywords")
+            return commit_keyword_intent(speculation, "CONTROL")  # CONTROL gère le BATCH
+
+    # === PRÉ-FILTRES ACTION/OBJET (toutes les règles en un passage) ===
+    tokens = cleaned.split()
+    unique_words = set(tokens)
+    # Transcriptions approximatives : mots inconnus rapprochés phonétiquement du vocabulaire
+    fuzzy = index.fuzzy_words(tokens, igor_globals.STOP_WORDS)
+    if fuzzy:
+        log.info("  [CLASSIFY] 🔤 Rapprochement phonétique : %s", ", ".join(sorted(fuzzy)))
+        unique_words |= fuzzy
+    # Un mot deviné compte comme objet (appli, fenêtre...), jamais comme verbe d'action
+    ranking = index.score(unique_words, fuzzy)
+    boosted = []   # Catégories forcées à 7 par les pré-filtres (rejouées par igor_train.py)
+    log.debug("  [CLASSIFY] PRÉ-FILTRES - Regex: %s Points: %s", lower, ranking)
     
     # === PRÉ-FILTRE : LAUNCH ===
-    launch_keywords = ["ouvre", "lance", "demarre", "va sur", "open", "start", "affiche", 
-                       "mets", "met", "joue", "regarde", "montre"]
-    video_keywords = ["video", "youtube", "clip", "film"]
-    
-    has_launch = any(k in cleaned for k in launch_keywords)
-    has_video = any(k in cleaned for k in video_keywords)
+    has_launch = bool(found["launch"])
+    has_video = bool(found["video"])
     
     # Vérification anti-conflit (Calculs ou Commandes Shell)
-    is_calculation = any(calc in cleaned for calc in ["calcul de", "resultat de", "combien"])
-    is_shell_cmd = "commande" in cleaned or "shell" in cleaned
+    is_calculation = bool(found["calculation"])
+    is_shell_cmd = bool(found["shell"])
     
     if has_launch:
         if not is_calculation and not is_shell_cmd:
-            print(f"  [CLASSIFY] PRÉ-FILTRE: LAUNCH", flush=True)
+            log.info("  [CLASSIFY] PRÉ-FILTRE: LAUNCH")
             if ranking["LAUNCH"] < 7:
                 ranking["LAUNCH"] = 7
+            boosted.append("LAUNCH")
     
     if has_video:
-        print(f"  [CLASSIFY] PRÉ-FILTRE: LAUNCH (VIDEO)", flush=True)
+        log.info("  [CLASSIFY] PRÉ-FILTRE: LAUNCH (VIDEO)")
         if ranking["LAUNCH"] < 7:
             ranking["LAUNCH"] = 7
+        boosted.append("LAUNCH")
     
     # === PRÉ-FILTRE : MATH (calculs) ===
     has_operators = any(op in user_input for op in ['+', '-', '*', '/', '=', '^'])
-    has_calc_words = any(w in cleaned for w in ["calcule", "combien fait", "résultat de"])
-    is_app_launch = any(f"{launch} " in cleaned for launch in ["lance", "ouvre", "démarre"])
+    has_calc_words = bool(found["calc_words"])
+    is_app_launch = bool(found["app_launch"])
     
     if (has_operators or has_calc_words) and not is_app_launch:
-        print(f"  [CLASSIFY] PRÉ-FILTRE: KNOWLEDGE (MATH)", flush=True)
+        log.info("  [CLASSIFY] PRÉ-FILTRE: KNOWLEDGE (MATH)")
         if ranking["KNOWLEDGE"] < 7:
             ranking["KNOWLEDGE"] = 7
+        boosted.append("KNOWLEDGE")
     
     current_timestamp = time.time() - current_timestamp
-    print(f"    [TIMESTAMP END] {current_timestamp*0.0001}ms",flush=True)
+    log.debug("    [TIMESTAMP END] %.1fms", current_timestamp * 1000)
 
     # === PRÉ-FILTRE : PROJECT ===
-    if any(k in cleaned for k in ["projet", "code", "fichier", "todo", "sauve"]):
-        print(f"  [CLASSIFY] PRÉ-FILTRE: PROJECT", flush=True)
+    if found["project"]:
+        log.info("  [CLASSIFY] PRÉ-FILTRE: PROJECT")
         ranking["PROJECT"] = 7
+        boosted.append("PROJECT")
     
     # === PRÉ-FILTRE : IDENTITY (noms) ===
     # On rend la détection plus agressive pour capturer les affirmations "Tu es..."
-    identity_keywords = ["appelle", "nom", "prénom", "suis", "es tu", "tu es", "t'es", "qui es", "qui suis"]
-    if any(w in cleaned for w in identity_keywords):
+    if found["identity"]:
         # On vérifie qu'on parle bien de personnes (je/tu/mon/ton)
-        if any(pron in cleaned for pron in ["je", "j'", "mon", "ma", "mes", "tu", "te", "ton", "ta", "tes", "moi", "toi", "t'", "m'"]):
-            print(f"  [CLASSIFY] PRÉ-FILTRE: IDENTITY", flush=True)
+        if found["pronouns"]:
+            log.info("  [CLASSIFY] PRÉ-FILTRE: IDENTITY")
             if ranking["IDENTITY"] < 7:
                 ranking["IDENTITY"] = 7
+            boosted.append("IDENTITY")
 
     # === PRÉ-FILTRE : ALARM ===
     # AJOUT des versions sans accents (reveil, reveille)
-    alarm_keywords = ["alarme", "reveil", "reveille", "sonnerie", "debout"]
-    if any(k in cleaned for k in alarm_keywords):
+    # Journal des tours : de quoi rejouer le barème avec d'autres poids
+    note_classify_source("keywords", ranking={k: v for k, v in ranking.items() if v}, boosted=boosted,
+                         rule_hits={igor_intent_index.KEYWORD_RULES[rule_id][0]: counts
+                                    for rule_id, counts in index.rule_counts(unique_words, fuzzy).items()})
+
+    if found["alarm"]:
         # Si on détecte une notion de temps (chiffres, "dans", "à", "h", "min")
         # ET qu'on ne parle pas de configuration ("change", "style", "son")
-        time_triggers = ["dans", "à", "pour", "minutes", "heures", "h", "min", "sec"]
-        has_time = any(t in cleaned for t in time_triggers) or any(char.isdigit() for char in cleaned)
+        has_time = bool(found["time_triggers"]) or any(char.isdigit() for char in cleaned)
         
-        is_config = any(s in cleaned for s in ["change", "règle", "définit", "style", "type", "bruit", "son"])
+        is_config = bool(found["alarm_config"])
         
         if has_time and not is_config:
             # FIX : On retourne la CATEGORIE (str) pour que brain_query charge les outils ALARM.
             # L'extraction des arguments sera faite par l'IA ou l'heuristique.
-            print(f"  [CLASSIFY] PRÉ-FILTRE: ALARM (Intent Detect)", flush=True)
-            return "ALARM"
+            log.info("  [CLASSIFY] PRÉ-FILTRE: ALARM (Intent Detect)")
+            return commit_keyword_intent(speculation, "ALARM")
 
-        print(f"  [CLASSIFY] PRÉ-FILTRE: ALARM (Intent)", flush=True)
-        return "ALARM"
+        log.info("  [CLASSIFY] PRÉ-FILTRE: ALARM (Intent)")
+        return commit_keyword_intent(speculation, "ALARM")
         
     sorted_ranking = dict(sorted(ranking.items(), key=lambda item: item[1], reverse=True))
 
-    print(f"    [DEBUG RANKING] {sorted_ranking}",flush=True)
+    log.debug("    [DEBUG RANKING] %s", sorted_ranking)
 
     value = list(sorted_ranking.values())[0]
     key = list(sorted_ranking.keys())[0]
     if value >= 7:
-        print(f"CATEGORIE: {key} VALEUR: {value}",flush=True)
-        return key
+        log.debug("CATEGORIE: %s VALEUR: %s", key, value)
+        return commit_keyword_intent(speculation, key)
+
+    if confident_local:
+        note_classify_source("local")
+        return confident_local
+
+    # Mots-clés non concluants : on attend la compréhension sémantique lancée en parallèle
+    if speculation is not None:
+        detected = speculation.result()
+        if detected:
+            note_classify_source("llm_phase0")
+            return detected
 
     # === APPEL IA (Seulement si aucun pré-filtre) ===
     prompt = f"""Classifie en 1 MOT parmi: IDENTITY MEDIA SHORTCUT VISION PROJECT ALARM SEARCH KNOWLEDGE LAUNCH CONTROL MEMORY CHAT
@@ -649,19 +690,22 @@ Réponse (1 mot uniquement):"""
 #Phrase: "{user_input}"
 #Réponse (1 mot uniquement):"""
 
+    note_classify_source("llm")
     # Appel unifié
-    raw_intent = call_llm_api(prompt, n_predict=10, temperature=0.0)
+    # Prompt minuscule : la latence de queue domine -> requête couverte si activée
+    raw_intent = call_llm_api(prompt, n_predict=10, temperature=0.0, hedge=True)
     
     if not raw_intent:
-         print(f"  [CLASSIFY] API Error ou Vide → CHAT", flush=True)
+         log.info("  [CLASSIFY] API Error ou Vide → CHAT")
+         _CLASSIFY_STATE.transient = True
          return "CHAT"
     
     raw_intent = raw_intent.strip().upper()
         
-    print(f" [RAW INTENT] {raw_intent}",flush=True)
+    log.debug(" [RAW INTENT] %s", raw_intent)
 
     if not raw_intent:
-        print(f"  [CLASSIFY] Réponse vide → CHAT", flush=True)
+        log.info("  [CLASSIFY] Réponse vide → CHAT")
         return "CHAT"
     
     intent = re.sub(r'[^A-Z]', '', raw_intent)
@@ -673,10 +717,10 @@ Réponse (1 mot uniquement):"""
     }
     
     if intent not in valid_intents:
-        print(f"  [CLASSIFY] Intent IA inconnu '{intent}' (raw:'{raw_intent}') → CHAT", flush=True)
+        log.warning("  [CLASSIFY] Intent IA inconnu '%s' (raw:'%s') → CHAT", intent, raw_intent)
         return "CHAT"
     
-    print(f"  [CLASSIFY] Intent IA: {intent}", flush=True)
+    log.info("  [CLASSIFY] Intent IA: %s", intent)
     return intent
 
 def remove_accents_and_special_chars(input_str):
@@ -708,7 +752,7 @@ def extract_json_from_response(raw_text):
     # Suppression radicale des blocs de pensée <think>...</think>
     # Le flag re.DOTALL permet au . de matcher aussi les retours à la ligne
     if "<think>" in raw_text:
-        print(f"  [BRAIN] 🧠 Nettoyage de la pensée (DeepSeek-R1 detected)", flush=True)
+        log.info("  [BRAIN] 🧠 Nettoyage de la pensée (DeepSeek-R1 detected)")
         raw_text = re.sub(r'<think>.*?</think>', '', raw_text, flags=re.DOTALL).strip()
     # ---------------------------------------
     
@@ -728,7 +772,7 @@ def extract_json_from_response(raw_text):
                     parsed = json.loads(candidate)
                     # ✅ VALIDATION : Doit avoir "tool"
                     if isinstance(parsed, dict) and 'tool' in parsed:
-                        print(f"  [JSON-EXTRACT] ✅ Stratégie 0 (Early-cut) : {candidate[:80]}...", flush=True)
+                        log.info("  [JSON-EXTRACT] ✅ Stratégie 0 (Early-cut) : %s...", candidate[:80])
                         return parsed, None
                 except:
                     pass
@@ -747,7 +791,7 @@ def extract_json_from_response(raw_text):
                     parsed = json.loads(candidate)
                     # ✅ VALIDATION : Doit être une liste de dicts avec "tool"
                     if isinstance(parsed, list) and all(isinstance(x, dict) and 'tool' in x for x in parsed):
-                        print(f"  [JSON-EXTRACT] ✅ Stratégie 0 (Early-cut) : {candidate[:80]}...", flush=True)
+                        log.info("  [JSON-EXTRACT] ✅ Stratégie 0 (Early-cut) : %s...", candidate[:80])
                         return parsed, None
                 except:
                     pass
@@ -770,10 +814,10 @@ def extract_json_from_response(raw_text):
                     
                     # Validation : Doit avoir "tool" (dict) ou être une liste de dicts avec "tool"
                     if isinstance(parsed, dict) and 'tool' in parsed:
-                        print(f"  [JSON-EXTRACT] ✅ Stratégie 1 (Regex) : {candidate[:80]}...", flush=True)
+                        log.info("  [JSON-EXTRACT] ✅ Stratégie 1 (Regex) : %s...", candidate[:80])
                         return parsed, None
                     elif isinstance(parsed, list) and all(isinstance(x, dict) and 'tool' in x for x in parsed):
-                        print(f"  [JSON-EXTRACT] ✅ Stratégie 1 (Regex-List) : {candidate[:80]}...", flush=True)
+                        log.info("  [JSON-EXTRACT] ✅ Stratégie 1 (Regex-List) : %s...", candidate[:80])
                         return parsed, None
                 except:
                     continue
@@ -784,10 +828,10 @@ def extract_json_from_response(raw_text):
         try:
             parsed = json.loads(code_block.group(1))
             if isinstance(parsed, dict) and 'tool' in parsed:
-                print(f"  [JSON-EXTRACT] ✅ Stratégie 2 (Code block)", flush=True)
+                log.info("  [JSON-EXTRACT] ✅ Stratégie 2 (Code block)")
                 return parsed, None
             elif isinstance(parsed, list):
-                print(f"  [JSON-EXTRACT] ✅ Stratégie 2 (Code block list)", flush=True)
+                log.info("  [JSON-EXTRACT] ✅ Stratégie 2 (Code block list)")
                 return parsed, None
         except:
             pass
@@ -799,10 +843,10 @@ def extract_json_from_response(raw_text):
             try:
                 parsed = json.loads(line)
                 if isinstance(parsed, dict) and 'tool' in parsed:
-                    print(f"  [JSON-EXTRACT] ✅ Stratégie 3 (Line) : {line[:80]}...", flush=True)
+                    log.info("  [JSON-EXTRACT] ✅ Stratégie 3 (Line) : %s...", line[:80])
                     return parsed, None
                 elif isinstance(parsed, list):
-                    print(f"  [JSON-EXTRACT] ✅ Stratégie 3 (Line list)", flush=True)
+                    log.info("  [JSON-EXTRACT] ✅ Stratégie 3 (Line list)")
                     return parsed, None
             except:
                 continue
@@ -810,11 +854,11 @@ def extract_json_from_response(raw_text):
     # 🆕 Stratégie 4 : Nettoyage de la flèche (→) et tout ce qui suit
     if '→' in raw_text:
         clean_text = raw_text.split('→')[0].strip()
-        print(f"  [JSON-EXTRACT] 🧹 Nettoyage flèche détecté. Avant: {len(raw_text)} chars, Après: {len(clean_text)} chars", flush=True)
+        log.info("  [JSON-EXTRACT] 🧹 Nettoyage flèche détecté. Avant: %s chars, Après: %s chars", len(raw_text), len(clean_text))
         try:
             parsed = json.loads(clean_text)
             if isinstance(parsed, dict) and 'tool' in parsed:
-                print(f"  [JSON-EXTRACT] ✅ Stratégie 4 (Arrow-clean)", flush=True)
+                log.info("  [JSON-EXTRACT] ✅ Stratégie 4 (Arrow-clean)")
                 return parsed, None
         except:
             pass
@@ -843,7 +887,7 @@ def fallback_intent_detection(user_input):
     for keywords, action in fallback_map.items():
         if any(kw in lower for kw in keywords):
             tool, args = action if isinstance(action, tuple) else (action, user_input)
-            print(f"  [FALLBACK] Détection par mots-clés : {tool}", flush=True)
+            log.info("  [FALLBACK] Détection par mots-clés : %s", tool)
             return tool, args
     
     # Si vraiment rien ne matche
@@ -878,7 +922,7 @@ def force_batch_if_needed(user_input, parsed_result):
         
         # On vérifie si au moins un verbe est présent
         if any(v in lower for v in action_map):
-            print(f"  [BATCH-FIX] ⚠️ Tentative de découpage intelligent...", flush=True)
+            log.warning("  [BATCH-FIX] ⚠️ Tentative de découpage intelligent...")
             
             # Découpage par "et", "puis", etc.
             parts = re.split(r'\s+(?:et|puis|ensuite|après)\s+', lower)
@@ -918,50 +962,25 @@ def force_batch_if_needed(user_input, parsed_result):
                 
                 # Si on a réussi à extraire au moins 2 actions valides
                 if len(actions) >= 2:
-                    print(f"  [BATCH-FIX] ✅ Réparation réussie (Regex) : {actions}", flush=True)
+                    log.info("  [BATCH-FIX] ✅ Réparation réussie (Regex) : %s", actions)
                     return actions
     
     return parsed_result
 
-def brain_query(user_input):
-    print(f"\n{'='*20} [DEBUG] ENTRÉE CHAT {'='*20}\n>>> {user_input}\n{'='*55}", flush=True)
-
+def build_intent_prefix(intent):
     """
-    Cerveau de l'agent - Version 2.2 (Anti-Hallucination R1 & Json Fix).
+    Partie statique du prompt de brain_query pour une intention :
+    persona, micro-prompt, outils du groupe, règles et exemples.
+    Ne contient rien qui change d'un tour à l'autre (historique, phrase utilisateur),
+    afin que le serveur LLM puisse réutiliser son cache KV pour ce préfixe.
     """
-    # === ÉTAPE 0 : PRÉ-FILTRE HEURISTIQUE (ACTIVÉ) ===
-    #quick_result = quick_heuristic_check(user_input)
-    #if quick_result:
-        #print(f"  [BRAIN] ⚡ Heuristique appliquée : {quick_result}", flush=True)
-        # On formate pour simuler une réponse IA si c'est un tuple (TOOL, ARGS)
-        #if isinstance(quick_result, tuple):
-            #return quick_result[0], quick_result[1]
-        #return quick_result
-    
-    # === ÉTAPE 1 : CLASSIFICATION ===
-    intent = classify_query_intent(user_input)
-    
-    # === ÉTAPE 2 : CONSTRUCTION CONTEXTE MINIMAL ===
     current_name = skills.MEMORY['agent_name']
-    user_name = skills.MEMORY['user_name']
     current_proj = skills.MEMORY.get('current_project', 'Aucun')
-    
-    context_parts = []
-    context_parts.append(f"Agent: {current_name}, User: {user_name}")
-    
-    # Historique (seulement pour CHAT)
-    if intent == "CHAT":
-        last_msgs = igor_globals.CHAT_HISTORY[-2:] if igor_globals.CHAT_HISTORY else []
-        if last_msgs:
-            context_parts.append(f"Historique: {' | '.join(last_msgs)}")
-    
-    # Contexte spécifique selon l'intent
+
+    # Contexte spécifique selon l'intent (valeurs stables : le cache n'est perdu que si elles changent)
     local_files_str = ""
     facts_str = ""
     
-    if intent == "PROJECT":
-        context_parts.append(f"Projet actif: {current_proj}")
-    
     if intent == "KNOWLEDGE":
         try:
             files = glob.glob(os.path.join(skills.KNOWLEDGE_DIR, "*.txt"))
@@ -975,9 +994,7 @@ def brain_query(user_input):
         if facts:
             facts_str = "; ".join(facts[:3])
     
-    context_str = "\n".join(context_parts)
-    
-    # === ÉTAPE 3 : RÉCUPÉRATION MICRO-PROMPT ===
+    # === RÉCUPÉRATION MICRO-PROMPT ===
     micro_prompt_template = igor_globals.MICRO_PROMPTS.get(intent, igor_globals.MICRO_PROMPTS["CHAT"])
     
     # === INJECTION VARIABLES DYNAMIQUES ===
@@ -993,10 +1010,11 @@ def brain_query(user_input):
         if placeholder in micro_prompt:
             micro_prompt = micro_prompt.replace(placeholder, str(value))
     
-    # === ÉTAPE 4 : SÉLECTION OUTILS (Charge SEULEMENT le groupe concerné) ===
+    # === SÉLECTION OUTILS (Charge SEULEMENT le groupe concerné) ===
     relevant_groups = igor_globals.INTENT_TOOL_GROUPS.get(intent, ["BASE"])
     
-    print(f"\n{'='*20} [DEBUG] RAISON MICROPROMPT {'='*16}\nINTENTION DÉTECTÉE : {intent}\nGROUPES ASSOCIÉS   : {relevant_groups}\nRAISON             : L'intention '{intent}' force l'inclusion des outils {relevant_groups} et du guide spécifique '{intent}'.\n{'='*58}", flush=True)
+    log.debug("\n%s [DEBUG] RAISON MICROPROMPT %s\nINTENTION DÉTECTÉE : %s\nGROUPES ASSOCIÉS   : %s\nRAISON             : L'intention '%s' force l'inclusion des outils %s et du guide spécifique '%s'.\n%s",
+              '=' * 20, '=' * 16, intent, relevant_groups, intent, relevant_groups, intent, '=' * 58)
 
     tools_list = []
     
@@ -1004,12 +1022,10 @@ def brain_query(user_input):
         if group_name in igor_globals.TOOLS_GROUPS:
             tools_list.extend(igor_globals.TOOLS_GROUPS[group_name])
     
-    # Dédoublonnage
-    tools_list = list(set(tools_list))
+    # Dédoublonnage (ordre conservé : un set changerait l'ordre à chaque lancement et casserait le cache)
+    tools_list = list(dict.fromkeys(tools_list))
     tools_str = "\n".join([f"- {t}" for t in tools_list])
     
-    # === ÉTAPE 5 : PROMPT FINAL (DYNAMIQUE) ===
-    
     # --- MODIFICATION DEEPSEEK-R1 ---
     current_model = skills.MEMORY.get('llm_model_name', '').lower()
     is_r1 = "r1" in current_model or "deepseek" in current_model or "reason" in current_model
@@ -1035,10 +1051,7 @@ def brain_query(user_input):
 5. Si doute → utilise CHAT"""
     # --------------------------------
 
-    prompt = f"""Tu es {current_name} (l'agent IA). Tu DOIS répondre UNIQUEMENT avec du JSON valide.
-
-CONTEXTE:
-{context_str}
+    return f"""Tu es {current_name} (l'agent IA). Tu DOIS répondre UNIQUEMENT avec du JSON valide.
 
 GUIDE SPÉCIFIQUE:
 {micro_prompt}
@@ -1051,23 +1064,262 @@ OUTILS:
 EXEMPLES:
 User: "Quelle heure ?" → {{"tool": "TIME", "args": ""}}
 User: "Ferme Firefox" → {{"tool": "CLOSE_WINDOW", "args": "Firefox"}}
-User: "Ouvre la calculette" → {{"tool": "LAUNCH", "args": "calculatrice"}}
+User: "Ouvre la calculette" → {{"tool": "LAUNCH", "args": "calculatrice"}}"""
+
+# Bornes des grammaires par intention : moins de tokens possibles = tour plus court
+GRAMMAR_ARGS_MAX_CHARS = 240   # Réponses CHAT comprises
+GRAMMAR_BATCH_MAX = 4          # Actions max dans un BATCH
+
+def intent_tool_names(intent):
+    """Noms d'outils autorisés pour une intention (ordre de TOOLS_GROUPS)."""
+    names = []
+    for group_name in igor_globals.INTENT_TOOL_GROUPS.get(intent, ["BASE"]):
+        for tool_desc in igor_globals.TOOLS_GROUPS.get(group_name, []):
+            m = re.match(r"\s*([A-Z_]+)", tool_desc)
+            if m:
+                names.append(m.group(1))
+    # CHAT reste toujours possible ("Si doute -> utilise CHAT")
+    names.append("CHAT")
+    return list(dict.fromkeys(names))
+
+@lru_cache(maxsize=None)
+def intent_grammar(intent):
+    """
+    Grammaire GBNF (Llama.cpp) propre à une intention :
+    "tool" limité aux outils du groupe, "args" borné en longueur,
+    une action ou une liste de GRAMMAR_BATCH_MAX actions au plus.
+    """
+    tools_rule = " | ".join(f'"\\"{name}\\""' for name in intent_tool_names(intent))
+    return "\n".join([
+        f'root ::= action | "[" ws action ("," ws action){{0,{GRAMMAR_BATCH_MAX - 1}}} ws "]"',
+        'action ::= "{" ws "\\"tool\\"" ws ":" ws tool ws "," ws "\\"args\\"" ws ":" ws args ws "}"',
+        f'tool ::= {tools_rule}',
+        f'args ::= "\\"" char{{0,{GRAMMAR_ARGS_MAX_CHARS}}} "\\""',
+        'char ::= [^"\\\\\\x00-\\x1f] | "\\\\" ["\\\\/bfnrtu]',
+        'ws ::= [ ]?',
+    ])
+
+@lru_cache(maxsize=None)
+def intent_json_schema(intent):
+    """Même contrainte que intent_grammar, sous forme de schéma JSON (Ollama)."""
+    action = {
+        "type": "object",
+        "properties": {
+            "tool": {"type": "string", "enum": intent_tool_names(intent)},
+            "args": {"type": "string", "maxLength": GRAMMAR_ARGS_MAX_CHARS},
+        },
+        "required": ["tool", "args"],
+    }
+    return {"anyOf": [action, {"type": "array", "items": action, "minItems": 1, "maxItems": GRAMMAR_BATCH_MAX}]}
+
+# === MODE UNE PASSE (INTENTION + OUTIL EN UNE SEULE GÉNÉRATION) ===
+# Remplace "fiche technique" (phase 0 de classify_query_intent) + appel outil de brain_query
+# par une génération contrainte unique. Le pipeline en deux temps reste le repli.
+SINGLE_PASS_KEY = "SINGLE_PASS"
+
+def single_pass_enabled():
+    """Mode opt-in ('single_pass_brain' dans memory.json)."""
+    return bool(skills.MEMORY.get('single_pass_brain', False))
+
+def single_pass_tool_names():
+    names = []
+    for intent in igor_globals.INTENT_TOOL_GROUPS:
+        names.extend(intent_tool_names(intent))
+    return list(dict.fromkeys(names))
+
+@lru_cache(maxsize=None)
+def single_pass_grammar():
+    """{"intent": INTENTION, "call": action | [actions]} avec intention et outils énumérés."""
+    intents_rule = " | ".join(f'"\\"{name}\\""' for name in igor_globals.INTENT_TOOL_GROUPS)
+    tools_rule = " | ".join(f'"\\"{name}\\""' for name in single_pass_tool_names())
+    return "\n".join([
+        'root ::= "{" ws "\\"intent\\"" ws ":" ws intent ws "," ws "\\"call\\"" ws ":" ws call ws "}"',
+        f'call ::= action | "[" ws action ("," ws action){{0,{GRAMMAR_BATCH_MAX - 1}}} ws "]"',
+        'action ::= "{" ws "\\"tool\\"" ws ":" ws tool ws "," ws "\\"args\\"" ws ":" ws args ws "}"',
+        f'intent ::= {intents_rule}',
+        f'tool ::= {tools_rule}',
+        f'args ::= "\\"" char{{0,{GRAMMAR_ARGS_MAX_CHARS}}} "\\""',
+        'char ::= [^"\\\\\\x00-\\x1f] | "\\\\" ["\\\\/bfnrtu]',
+        'ws ::= [ ]?',
+    ])
+
+@lru_cache(maxsize=None)
+def single_pass_json_schema():
+    action = {
+        "type": "object",
+        "properties": {
+            "tool": {"type": "string", "enum": single_pass_tool_names()},
+            "args": {"type": "string", "maxLength": GRAMMAR_ARGS_MAX_CHARS},
+        },
+        "required": ["tool", "args"],
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "intent": {"type": "string", "enum": list(igor_globals.INTENT_TOOL_GROUPS)},
+            "call": {"anyOf": [action, {"type": "array", "items": action, "minItems": 1, "maxItems": GRAMMAR_BATCH_MAX}]},
+        },
+        "required": ["intent", "call"],
+    }
+
+def build_single_pass_prefix():
+    """Préfixe statique du mode une passe : intentions avec leurs outils, puis tous les outils décrits."""
+    current_name = skills.MEMORY['agent_name']
+
+    intents_lines = []
+    for intent in igor_globals.INTENT_TOOL_GROUPS:
+        intents_lines.append(f"- {intent} : {', '.join(intent_tool_names(intent))}")
+    intents_str = "\n".join(intents_lines)
+
+    tools_list = []
+    for intent in igor_globals.INTENT_TOOL_GROUPS:
+        for group_name in igor_globals.INTENT_TOOL_GROUPS[intent]:
+            tools_list.extend(igor_globals.TOOLS_GROUPS.get(group_name, []))
+    tools_str = "\n".join([f"- {t}" for t in dict.fromkeys(tools_list)])
+
+    return f"""Tu es {current_name} (l'agent IA). Tu DOIS répondre UNIQUEMENT avec du JSON valide.
+Déduis l'INTENTION de la demande (même implicite : "je me lève à 7h" = ALARM), puis l'action.
+
+INTENTIONS (et leurs outils):
+{intents_str}
+
+OUTILS:
+{tools_str}
+
+RÈGLES ABSOLUES:
+1. Format : {{"intent": "INTENTION", "call": {{"tool": "NOM", "args": "valeur"}}}}
+2. PLUSIEURS actions (si "et", "puis") : "call": [{{"tool":...}}, {{"tool":...}}]
+3. L'outil doit appartenir à l'intention choisie
+4. Si doute → intention CHAT, outil CHAT
+
+EXEMPLES:
+User: "À quelle heure je me lève demain ?" → {{"intent": "ALARM", "call": {{"tool": "SHOW_ALARMS", "args": ""}}}}
+User: "Ferme Firefox" → {{"intent": "CONTROL", "call": {{"tool": "CLOSE_WINDOW", "args": "Firefox"}}}}
+User: "Ouvre la calculette" → {{"intent": "LAUNCH", "call": {{"tool": "LAUNCH", "args": "calculatrice"}}}}"""
+
+def single_pass_query(user_input):
+    """
+    Une seule génération contrainte pour l'intention ET l'appel d'outil.
+    Renvoie (intention, JSON brut de l'appel) ou (None, None) -> pipeline en deux temps.
+    """
+    context_parts = [f"Agent: {skills.MEMORY['agent_name']}, User: {skills.MEMORY['user_name']}"]
+    last_msgs = igor_globals.CHAT_HISTORY[-2:] if igor_globals.CHAT_HISTORY else []
+    if last_msgs:
+        context_parts.append(f"Historique: {' | '.join(last_msgs)}")
+    context_parts.append(f"Projet actif: {skills.MEMORY.get('current_project', 'Aucun')}")
+    context_str = "\n".join(context_parts)
+
+    prompt = f"""{build_single_pass_prefix()}
+
+CONTEXTE:
+{context_str}
+
+User: "{user_input}"
+JSON:"""
+
+    log.info("  [BRAIN] ⚡ Mode une passe (intention + outil)...")
+    raw = call_llm_api(prompt, n_predict=300, temperature=0.1, grammar=single_pass_grammar(), stop_on_json=True,
+                       prefix_key=SINGLE_PASS_KEY, json_schema=single_pass_json_schema())
+    if not raw:
+        return None, None
+
+    parsed, error = extract_json_from_response(raw)
+    if error or not isinstance(parsed, dict) or 'call' not in parsed:
+        log.info("  [BRAIN] Mode une passe illisible, repli deux temps : %s", error or raw[:100])
+        return None, None
+
+    intent = str(parsed.get('intent', '')).upper()
+    if intent not in igor_globals.INTENT_TOOL_GROUPS:
+        intent = "CHAT"
+    log.info("  [CLASSIFY] 🎯 Intention (une passe) : %s", intent)
+    return intent, json.dumps(parsed['call'], ensure_ascii=False)
+
+def two_pass_query(user_input):
+    """
+    Pipeline en deux temps : classification (mots-clés + fiche LLM pour les phrases longues),
+    puis génération de l'appel d'outil avec le préfixe de l'intention.
+    Renvoie (intention, JSON brut ou None).
+    """
+    # === ÉTAPE 1 : CLASSIFICATION ===
+    intent = classify_query_intent(user_input)
+    
+    # === ÉTAPE 2 : CONSTRUCTION CONTEXTE MINIMAL (partie variable, en fin de prompt) ===
+    current_name = skills.MEMORY['agent_name']
+    user_name = skills.MEMORY['user_name']
+    
+    context_parts = []
+    context_parts.append(f"Agent: {current_name}, User: {user_name}")
+    
+    # Historique (seulement pour CHAT)
+    if intent == "CHAT":
+        last_msgs = igor_globals.CHAT_HISTORY[-2:] if igor_globals.CHAT_HISTORY else []
+        if last_msgs:
+            context_parts.append(f"Historique: {' | '.join(last_msgs)}")
+    
+    if intent == "PROJECT":
+        context_parts.append(f"Projet actif: {skills.MEMORY.get('current_project', 'Aucun')}")
+    
+    context_str = "\n".join(context_parts)
+    
+    # === ÉTAPES 3-5 : PRÉFIXE STATIQUE (guide, outils, règles, exemples) ===
+    # Identique d'un tour à l'autre pour une même intention -> le serveur garde son cache KV
+    # et n'évalue que le contexte + la phrase utilisateur.
+    prefix = build_intent_prefix(intent)
+
+    prompt = f"""{prefix}
+
+CONTEXTE:
+{context_str}
 
 User: "{user_input}"
 JSON:"""
     
     # === ÉTAPE 6 : APPEL API ===
-    grammar_json = "root ::= object | list\nobject ::= \"{\" pair (\",\" pair)* \"}\"\npair ::= string \":\" value\nstring ::= '\"' [^\"]* '\"'\nvalue ::= string | number | object | list\nlist ::= \"[\" (object (\",\" object)*)? \"]\"\nnumber ::= [0-9]+"
+    # Grammaire propre à l'intention (mise en cache) : "tool" ne peut être qu'un outil du groupe,
+    # le modèle n'a plus de nom à épeler librement ni d'outil à inventer
+    grammar_json = intent_grammar(intent)
     
     # Appel via la nouvelle fonction unifiée
-    raw = call_llm_api(prompt, n_predict=300, temperature=0.1, grammar=grammar_json)
+    # Streaming : on coupe la génération dès que l'objet/la liste JSON est fermé(e)
+    raw = call_llm_api(prompt, n_predict=300, temperature=0.1, grammar=grammar_json, stop_on_json=True,
+                       prefix_key=intent, json_schema=intent_json_schema(intent))
+    return intent, raw
+
+def brain_query(user_input):
+    log.debug("\n%s [DEBUG] ENTRÉE CHAT %s\n>>> %s\n%s", '=' * 20, '=' * 20, user_input, '=' * 55)
+
+    """
+    Cerveau de l'agent - Version 2.2 (Anti-Hallucination R1 & Json Fix).
+    """
+    # === ÉTAPE 0 : PRÉ-FILTRE HEURISTIQUE (ACTIVÉ) ===
+    #quick_result = quick_heuristic_check(user_input)
+    #if quick_result:
+        #print(f"  [BRAIN] ⚡ Heuristique appliquée : {quick_result}", flush=True)
+        # On formate pour simuler une réponse IA si c'est un tuple (TOOL, ARGS)
+        #if isinstance(quick_result, tuple):
+            #return quick_result[0], quick_result[1]
+        #return quick_result
+    
+    # === ÉTAPE 0bis : MODE UNE PASSE (OPT-IN) ===
+    # Même seuil que la phase 0 de classify_query_intent : les commandes courtes
+    # restent sur les filtres par mots-clés, plus rapides qu'un appel LLM
+    raw = None
+    if single_pass_enabled() and len(user_input.split()) > 3:
+        intent, raw = single_pass_query(user_input)
+        if raw is not None:
+            note_classify_source("single_pass")
+    if raw is None:
+        intent, raw = two_pass_query(user_input)
+    turn = igor_turnlog.current()
+    if turn is not None:
+        turn.set(intent=intent, raw=raw)
 
     try:
         if not raw:
-             return fallback_intent_detection(user_input)
+             return query_fallback(user_input)
         
         # Log tronqué pour éviter le spam <think>
-        print(f"\n{'='*20} [DEBUG] SORTIE AGENT (BRUT) {'='*15}\n{raw[:500]}...", flush=True)
+        log.debug("\n%s [DEBUG] SORTIE AGENT (BRUT) %s\n%s...", '=' * 20, '=' * 15, raw[:500])
 
         parsed, error = extract_json_from_response(raw)
         
@@ -1076,7 +1328,7 @@ JSON:"""
             # CAS 1 : Le modèle renvoie une liste simple [TOOL, ARGS] au lieu d'un dict
             # Ex: ["CLOSE_WINDOW", "Firefox"]
             if isinstance(parsed, list) and len(parsed) > 0 and isinstance(parsed[0], str):
-                print(f"  [BRAIN] 🔧 Correction R1 (Format Liste détecté)", flush=True)
+                log.info("  [BRAIN] 🔧 Correction R1 (Format Liste détecté)")
                 tool = parsed[0]
                 args = str(parsed[1]) if len(parsed) > 1 else ""
                 
@@ -1091,7 +1343,7 @@ JSON:"""
             # CAS 2 : Le champ 'tool' contient une liste (Hallucination imbriquée)
             # Ex: {"tool": ["CLOSE_WINDOW", "Firefox"]}
             elif isinstance(parsed, dict) and isinstance(parsed.get('tool'), list):
-                print(f"  [BRAIN] 🔧 Correction R1 (Tool est une liste)", flush=True)
+                log.info("  [BRAIN] 🔧 Correction R1 (Tool est une liste)")
                 raw_list = parsed['tool']
                 if len(raw_list) > 0:
                     parsed['tool'] = raw_list[0]
@@ -1106,7 +1358,7 @@ JSON:"""
                     first_word = t.split(' ')[0]
                     # On vérifie grossièrement si le premier mot ressemble à un outil (majuscules)
                     if first_word.isupper() and len(first_word) > 2:
-                        print(f"  [BRAIN] 🔧 Correction R1 (Split Tool/Args)", flush=True)
+                        log.info("  [BRAIN] 🔧 Correction R1 (Split Tool/Args)")
                         parsed['tool'] = first_word
                         parsed['args'] = t[len(first_word):].strip()
 
@@ -1115,15 +1367,16 @@ JSON:"""
             if isinstance(parsed, dict):
                 tool_check = str(parsed.get('tool', '')).upper()
                 if tool_check in ["DEL_WINDOW", "DELETE_WINDOW", "STOP_PROGRAM", "KILL_APP", "KILL_WINDOW"]:
-                    print(f"  [BRAIN] 🔧 Correction Hallucination Outil: {tool_check} -> CLOSE_WINDOW", flush=True)
+                    log.info("  [BRAIN] 🔧 Correction Hallucination Outil: %s -> CLOSE_WINDOW", tool_check)
                     parsed['tool'] = "CLOSE_WINDOW"
 
-            print(f"{'-'*20} [DEBUG] JSON FINAL {'-'*20}\n{json.dumps(parsed, indent=2, ensure_ascii=False)}\n{'='*58}", flush=True)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("%s [DEBUG] JSON FINAL %s\n%s\n%s", '-' * 20, '-' * 20, json.dumps(parsed, indent=2, ensure_ascii=False), '=' * 58)
         # -------------------------------------------------------------
 
         if error:
-            print(f"  [BRAIN] Échec parsing : {error}", flush=True)
-            return fallback_intent_detection(user_input)
+            log.warning("  [BRAIN] Échec parsing : %s", error)
+            return query_fallback(user_input)
         
         # === FILTRE ANTI-HALLUCINATION SPÉCIAL MÉTÉO ===
         if isinstance(parsed, dict) and parsed.get('tool') == 'WEATHER':
@@ -1132,38 +1385,39 @@ JSON:"""
                 user_clean = igor_config.remove_accents(user_input.lower())
                 city_clean = igor_config.remove_accents(arg_city.lower())
                 if city_clean not in user_clean:
-                    print(f"  [ANTI-HALLUCINATION] Suppression de la ville inventée : '{arg_city}'", flush=True)
+                    log.info("  [ANTI-HALLUCINATION] Suppression de la ville inventée : '%s'", arg_city)
                     parsed['args'] = ""
 
         # === VALIDATION FINALE ===
         if isinstance(parsed, list):
             for item in parsed:
                 if not isinstance(item, dict) or 'tool' not in item:
-                    print(f"  [BRAIN] Item BATCH invalide: {item}", flush=True)
-                    return fallback_intent_detection(user_input)
+                    log.warning("  [BRAIN] Item BATCH invalide: %s", item)
+                    return query_fallback(user_input)
             
-            print(f"  [BRAIN] ✅ BATCH détecté ({len(parsed)} actions)", flush=True)
+            log.info("  [BRAIN] ✅ BATCH détecté (%s actions)", len(parsed))
             return "BATCH", parsed
         
         elif isinstance(parsed, dict) and 'tool' in parsed:
             parsed = force_batch_if_needed(user_input, parsed)
 
             if isinstance(parsed, list):
-                print(f"  [BRAIN] ✅ BATCH corrigé automatiquement ({len(parsed)} actions)", flush=True)
+                log.info("  [BRAIN] ✅ BATCH corrigé automatiquement (%s actions)", len(parsed))
                 return "BATCH", parsed
 
             tool_name = str(parsed['tool'])
             args_val = str(parsed.get('args', ''))
             
-            print(f"  [BRAIN] ✅ Action unique: {tool_name}", flush=True)
+            log.info("  [BRAIN] ✅ Action unique: %s", tool_name)
             return tool_name, args_val
         
         else:
-            print(f"  [BRAIN] Format JSON invalide: {type(parsed)}", flush=True)
-            return fallback_intent_detection(user_input)
+            log.warning("  [BRAIN] Format JSON invalide: %s", type(parsed))
+            return query_fallback(user_input)
     
     except Exception as e:
-        print(f"  [BRAIN] Exception : {e}")
+        log.warning("  [BRAIN] Exception : %s", e)
+        _QUERY_STATE.transient = True
         return "CHAT", "Je bugue un peu là."
 
 def log_query_stats(source, intent=None):
@@ -1172,19 +1426,6 @@ def log_query_stats(source, intent=None):
     if intent:
         igor_globals.STATS["intents"][intent] = igor_globals.STATS["intents"].get(intent, 0) + 1
 
-def print_stats():
-    """Affiche les stats de performance (appeler en debug)"""
-    total = sum([igor_globals.STATS["heuristic_hits"], igor_globals.STATS["cache_hits"], igor_globals.STATS["ai_calls"]])
-    if total == 0:
-        return
-    
-    print("\n=== STATISTIQUES BRAIN ===")
-    print(f"Heuristiques: {igor_globals.STATS['heuristic_hits']} ({igor_globals.STATS['heuristic_hits']/total*100:.1f}%)")
-    print(f"Cache: {igor_globals.STATS['cache_hits']} ({igor_globals.STATS['cache_hits']/total*100:.1f}%)")
-    print(f"Appels IA: {igor_globals.STATS['ai_calls']} ({igor_globals.STATS['ai_calls']/total*100:.1f}%)")
-    print(f"\nIntents détectés: {igor_globals.STATS['intents']}")
-    print("==========================\n")
-
 def quick_heuristic_check(user_input):
     """
     PRÉ-filtre AVANT brain_query pour les cas ULTRA évidents.
@@ -1207,16 +1448,16 @@ def quick_heuristic_check(user_input):
     
     # Si on mentionne explicitement un projet, on NE FAIT PAS d'heuristique
     if has_project_context:
-        print(f"  [QUICK] 🎯 Contexte PROJET détecté → Laisse l'IA gérer", flush=True)
+        log.info("  [QUICK] 🎯 Contexte PROJET détecté → Laisse l'IA gérer")
         return None  # Laisse l'IA décider (elle a le contexte des projets)
     
     # Détection explicite de la demande de vitesse pour la vision
     if ("vite" in lower or "rapide" in lower) and ("regarde" in lower or "vision" in lower):
             if "écran" in lower or "screen" in lower:
-                print(f"  [QUICK] Vision Rapide (Écran) détectée", flush=True)
+                log.info("  [QUICK] Vision Rapide (Écran) détectée")
                 return ("VISION", "vite screen")
             elif "photo" in lower or "webcam" in lower:
-                 print(f"  [QUICK] Vision Rapide (Webcam) détectée", flush=True)
+                 log.info("  [QUICK] Vision Rapide (Webcam) détectée")
                  return ("VISION", "vite webcam")
 
     # === PRIORITÉ 0.5 : VISION (QUESTIONS CONTEXTUELLES) ===
@@ -1227,7 +1468,7 @@ def quick_heuristic_check(user_input):
          if any(w in lower for w in ["tu", "ce que", "qu'est-ce", "que", "ton", "tes"]):
              # Exclusion des fichiers explicites pour éviter "Regarde le fichier X"
              if not any(w in lower for w in ["fichier", "dossier", "document", "projet"]):
-                 print(f"  [QUICK] 👁️ Vision contextuelle détectée -> VISION", flush=True)
+                 log.info("  [QUICK] 👁️ Vision contextuelle détectée -> VISION")
                  # On passe l'input entier pour que tool_vision_look détecte "moi"/"webcam" ou "écran"
                  return ("VISION", user_input)
 
@@ -1261,7 +1502,7 @@ def quick_heuristic_check(user_input):
             for noise in ["fichier ", "file ", "nommé ", "appelé "]:
                 clean_query = clean_query.replace(noise, "").strip()
             
-            print(f"  [QUICK] 🔍 RECHERCHE FICHIER détectée: '{clean_query}'", flush=True)
+            log.info("  [QUICK] 🔍 RECHERCHE FICHIER détectée: '%s'", clean_query)
             return ("FIND", clean_query)
 
     # === PRIORITÉ 1.5 : LECTURE DE NOTE (INTERCEPTION CRITIQUE) ===
@@ -1272,7 +1513,7 @@ def quick_heuristic_check(user_input):
         
         # Si on demande de lire une note ET qu'il n'y a pas d'extension (.txt) explicite
         if has_note_verb and not any(ext in lower for ext in [".txt", ".md", ".pdf", ".doc"]):
-            print(f"  [QUICK] 📝 LECTURE NOTE détectée (Prioritaire): '{user_input}'", flush=True)
+            log.info("  [QUICK] 📝 LECTURE NOTE détectée (Prioritaire): '%s'", user_input)
             return ("READ_NOTE", user_input)
 
     # === PRIORITÉ 1.55 : MÉMOIRE LONG TERME (MEM) ===
@@ -1283,7 +1524,7 @@ def quick_heuristic_check(user_input):
         match = re.search(r"(?:retiens|sache|mémorise)\s+que\s+(.+)", user_input, re.IGNORECASE)
         if match:
             fact = match.group(1).strip()
-            print(f"  [QUICK] 🧠 Mémoire détectée : '{fact}'", flush=True)
+            log.info("  [QUICK] 🧠 Mémoire détectée : '%s'", fact)
             return ("MEM", fact)
 
     # === PRIORITÉ 1.6 : ÉCRITURE DE NOTE (HEURISTIQUE) ===
@@ -1295,7 +1536,7 @@ def quick_heuristic_check(user_input):
         clean_text = re.sub(r"^(?:note|noter|ajoute\s+une\s+note)\s*(?:que|qu'|de|d'|ceci|:)?\s*", "", user_input, flags=re.IGNORECASE).strip()
         
         if clean_text:
-            print(f"  [QUICK] 📝 Écriture note détectée : '{clean_text}'", flush=True)
+            log.info("  [QUICK] 📝 Écriture note détectée : '%s'", clean_text)
             return ("NOTE", clean_text)
     
     # === PRIORITÉ 2 : OUVERTURE DE FICHIERS (OPEN_FILE) ===
@@ -1348,12 +1589,12 @@ def quick_heuristic_check(user_input):
             # Note : On laisse le mot "document" ou "stickman" ici, 
             # car tool_open_file (dans igor_system) fera son propre nettoyage final.
             
-            print(f"  [QUICK] 🎯 FICHIER détecté (Heuristique): '{clean_query}' -> OPEN_FILE", flush=True)
+            log.info("  [QUICK] 🎯 FICHIER détecté (Heuristique): '%s' -> OPEN_FILE", clean_query)
             return ("OPEN_FILE", clean_query)
         
         # Cas ambigu : projet actif
         elif likely_project_file:
-            print(f"  [QUICK] ⚠️ Ambiguïté (Projet: {current_project}) → IA", flush=True)
+            log.warning("  [QUICK] ⚠️ Ambiguïté (Projet: %s) → IA", current_project)
             return None
     
     # === PRIORITÉ IDENTITÉ : QUESTIONS (CHAT) ===
@@ -1369,7 +1610,7 @@ def quick_heuristic_check(user_input):
     )
     if regex_question_user.search(lower):
         user_n = skills.MEMORY.get('user_name', 'Utilisateur')
-        print(f"  [QUICK] ❓ Question identité user -> CHAT", flush=True)
+        log.info("  [QUICK] ❓ Question identité user -> CHAT")
         return ("CHAT", f"Tu t'appelles {user_n}.")
 
     # 2. QUESTION SUR L'AGENT ("C'est quoi ton nom ?", "Ton nom est ?")
@@ -1382,7 +1623,7 @@ def quick_heuristic_check(user_input):
     )
     if regex_question_agent.search(lower):
         agent_n = skills.MEMORY.get('agent_name', 'Igor')
-        print(f"  [QUICK] ❓ Question identité agent -> CHAT", flush=True)
+        log.info("  [QUICK] ❓ Question identité agent -> CHAT")
         return ("CHAT", f"Je m'appelle {agent_n}.")
 
     # === PRIORITÉ IDENTITÉ : COMMANDES (CHANGEMENT DE NOM) ===
@@ -1400,7 +1641,7 @@ def quick_heuristic_check(user_input):
         for noise in ["le ", "la ", "un "]: 
              if new_name.startswith(noise): new_name = new_name[len(noise):]
         
-        print(f"  [QUICK] 🆔 Changement nom USER détecté : '{new_name}' -> USERNAME", flush=True)
+        log.info("  [QUICK] 🆔 Changement nom USER détecté : '%s' -> USERNAME", new_name)
         return ("USERNAME", new_name)
 
     # 4. CHANGER LE NOM DE L'AGENT ("Tu t'appelles Igor", "Ton nom est Igor")
@@ -1416,7 +1657,7 @@ def quick_heuristic_check(user_input):
         for noise in ["le ", "la ", "un "]:
              if new_name.startswith(noise): new_name = new_name[len(noise):]
 
-        print(f"  [QUICK] 🆔 Changement nom AGENT détecté : '{new_name}' -> AGENTNAME", flush=True)
+        log.info("  [QUICK] 🆔 Changement nom AGENT détecté : '%s' -> AGENTNAME", new_name)
         return ("AGENTNAME", new_name)
 
     # === PRIORITÉ 2.1 : ALARME (COMMANDES EXPLICITES) ===
@@ -1428,7 +1669,7 @@ def quick_heuristic_check(user_input):
         # Si on voit "supprime", "efface", "retire" + alarme -> DEL_ALARM
         del_keywords = ["supprime", "efface", "retire", "enleve", "enlève", "annule", "arrete", "arrête", "stop"]
         if any(w in lower for w in del_keywords):
-            print(f"  [QUICK] 🗑️ Suppression alarme détectée -> DEL_ALARM: '{user_input}'", flush=True)
+            log.info("  [QUICK] 🗑️ Suppression alarme détectée -> DEL_ALARM: '%s'", user_input)
             return ("DEL_ALARM", user_input)
 
         # 2. DÉTECTION CRÉATION
@@ -1440,7 +1681,7 @@ def quick_heuristic_check(user_input):
         is_config = any(s in lower for s in ["change", "règle", "defin", "choisi", "style", "type", "bruit", "son"])
         
         if has_time and not is_config:
-             print(f"  [QUICK] ⏰ Alarme détectée -> ALARM: '{user_input}'", flush=True)
+             log.info("  [QUICK] ⏰ Alarme détectée -> ALARM: '%s'", user_input)
              return ("ALARM", user_input)
 
     # === PRIORITÉ 2.2 : RAPPELS (Ambiguïté Alarme vs Note) ===
@@ -1451,7 +1692,7 @@ def quick_heuristic_check(user_input):
         has_time = any(t in lower for t in time_triggers) or any(char.isdigit() for char in lower)
 
         if has_time:
-             print(f"  [QUICK] ⏰ Rappel temporel détecté -> ALARM", flush=True)
+             log.info("  [QUICK] ⏰ Rappel temporel détecté -> ALARM")
              return ("ALARM", user_input)
 
         # 2. Sinon, c'est une Note (To-Do)
@@ -1459,7 +1700,7 @@ def quick_heuristic_check(user_input):
         clean_text = re.sub(r"^(?:se\s+)?rappell?ez?(?:[-\s]moi)?\s*(?:de|d')?\s*", "", user_input, flags=re.IGNORECASE).strip()
         
         if clean_text:
-            print(f"  [QUICK] 📝 Rappel tâche détecté -> NOTE: '{clean_text}'", flush=True)
+            log.info("  [QUICK] 📝 Rappel tâche détecté -> NOTE: '%s'", clean_text)
             return ("NOTE", clean_text)
 
     # === PRIORITÉ 2.3 : GESTION TODO LIST (Done/Add) ===
@@ -1473,7 +1714,7 @@ def quick_heuristic_check(user_input):
              nums = re.findall(r'\d+', user_input)
              if nums:
                  idx = nums[0] # On prend le premier chiffre trouvé
-                 print(f"  [QUICK] ✅ Validation Tâche détectée -> PROJECT_TODO_DONE: '{idx}'", flush=True)
+                 log.info("  [QUICK] ✅ Validation Tâche détectée -> PROJECT_TODO_DONE: '%s'", idx)
                  return ("PROJECT_TODO_DONE", idx)
 
     # === PRIORITÉ 2.5 : Commandes Muet/Parole (REGEX ROBUSTE) ===
@@ -1487,7 +1728,7 @@ def quick_heuristic_check(user_input):
     )
 
     if regex_unmute.search(lower):
-        print(f"  [QUICK] Unmute détecté (Regex): {lower}", flush=True)
+        log.info("  [QUICK] Unmute détecté (Regex): %s", lower)
         return ("SET_MUTE", "off")
 
     # === PRIORITÉ 2.6 : COMMANDES SHELL ===
@@ -1504,7 +1745,7 @@ def quick_heuristic_check(user_input):
                 idx = lower.find(trigger) + len(trigger)
                 cmd = user_input[idx:].strip().lstrip(":").strip()
                 if cmd:
-                    print(f"  [QUICK] SHELL détecté: '{cmd}'", flush=True)
+                    log.info("  [QUICK] SHELL détecté: '%s'", cmd)
                     return ("SHELL", cmd)
 
     # === PRIORITÉ 3 : Commandes système (1 mot) ===
@@ -1525,7 +1766,7 @@ def quick_heuristic_check(user_input):
     }
     
     if lower in direct_commands:
-        print(f"  [QUICK] Commande directe: {lower}", flush=True)
+        log.info("  [QUICK] Commande directe: %s", lower)
         return direct_commands[lower]
     
     # === PRIORITÉ 4 : Questions système (REGEX) ===
@@ -1561,7 +1802,7 @@ def quick_heuristic_check(user_input):
 
     for pattern, action in system_regexes:
         if re.search(pattern, lower):
-            print(f"  [QUICK] Question système (Regex): {action[0]}", flush=True)
+            log.info("  [QUICK] Question système (Regex): %s", action[0])
             return action
         
     # === PRIORITÉ 4.5 : Vitesse de la voix (SPEED) ===
@@ -1574,7 +1815,7 @@ def quick_heuristic_check(user_input):
     ]
     
     if any(k in lower for k in speed_keywords):
-        print(f"  [QUICK] Vitesse voix détectée : '{user_input}'", flush=True)
+        log.info("  [QUICK] Vitesse voix détectée : '%s'", user_input)
         return ("SET_SPEED", user_input)
         
     # Cas spécifique "parle doucement"
@@ -1590,7 +1831,7 @@ def quick_heuristic_check(user_input):
     ]
     
     if any(t in lower for t in music_status_triggers):
-        print(f"  [QUICK] 🎵 Statut Musique détecté -> MUSIC_CHECK (Passif)", flush=True)
+        log.info("  [QUICK] 🎵 Statut Musique détecté -> MUSIC_CHECK (Passif)")
         # On passe l'argument "status" pour empêcher Igor de lancer/pauser des trucs
         return ("MUSIC_CHECK", "status")
 
@@ -1609,7 +1850,7 @@ def quick_heuristic_check(user_input):
     # Si demande de musique SANS question d'identification
     if any(trigger in lower for trigger in music_launch_triggers):
         if not any(neg in lower for neg in music_negative):
-            print(f"  [QUICK] 🎵 Lancement MUSIQUE détecté -> MUSIC_CHECK", flush=True)
+            log.info("  [QUICK] 🎵 Lancement MUSIQUE détecté -> MUSIC_CHECK")
             return ("MUSIC_CHECK", "")
     
     # === PRIORITÉ 6 : Contrôle média ===
@@ -1624,7 +1865,7 @@ def quick_heuristic_check(user_input):
     # === PRIORITÉ 7 : Recettes de cuisine (SEARCH forcé) ===
     # Force la recherche Web pour les recettes au lieu de la définition (KNOWLEDGE)
     if "recette" in lower:
-        print(f"  [QUICK] Recette cuisine détectée -> SEARCH: '{user_input}'", flush=True)
+        log.info("  [QUICK] Recette cuisine détectée -> SEARCH: '%s'", user_input)
         return ("SEARCH", user_input)
 
     # === PRIORITÉ 8 : Gestion des Raccourcis (List/Delete) ===
@@ -1643,12 +1884,12 @@ def quick_heuristic_check(user_input):
                 target = target.replace(noise, "")
             target = target.strip()
             
-            print(f"  [QUICK] Suppression raccourci détectée: '{target}'", flush=True)
+            log.info("  [QUICK] Suppression raccourci détectée: '%s'", target)
             return ("SHORTCUT_DELETE", target)
             
         # Cas 2 : Liste / Consultation
         if any(w in lower for w in ["quels", "quelles", "liste", "mes", "voir", "montre"]):
-            print(f"  [QUICK] Liste raccourcis détectée", flush=True)
+            log.info("  [QUICK] Liste raccourcis détectée")
             return ("SHORTCUT_LIST", "")
 
     # === PRIORITÉ 6 : YouTube ===
@@ -1662,7 +1903,7 @@ def quick_heuristic_check(user_input):
         
         if len(query) > 2:
             youtube_arg = f"Youtube {query}"
-            print(f"  [QUICK] Youtube détecté: '{youtube_arg}'", flush=True)
+            log.info("  [QUICK] Youtube détecté: '%s'", youtube_arg)
             return ("LAUNCH", youtube_arg)
     
     # === PRIORITÉ 7 : Vidéos ===
@@ -1677,24 +1918,24 @@ def quick_heuristic_check(user_input):
             
             if len(subject) > 2:
                 youtube_arg = f"Youtube {subject}"
-                print(f"  [QUICK] Vidéo détectée: '{youtube_arg}'", flush=True)
+                log.info("  [QUICK] Vidéo détectée: '%s'", youtube_arg)
                 return ("LAUNCH", youtube_arg)
     
     # === PRIORITÉ 8 : Nombres seuls ===
     if lower.isdigit():
         num = int(lower)
         if skills.LAST_WIKI_OPTIONS:
-            print(f"  [QUICK] Sélection Wiki #{num}", flush=True)
+            log.info("  [QUICK] Sélection Wiki #%s", num)
             return ("LEARN", lower)
         if 0 <= num <= 100:
-            print(f"  [QUICK] Volume {num}", flush=True)
+            log.info("  [QUICK] Volume %s", num)
             return ("VOLUME", lower)
     
     # === PRIORITÉ 9 : Sélection Wikipedia ===
     if skills.LAST_WIKI_OPTIONS:
         selection_keywords = ["premier", "1er", "deuxième", "second", "2ème", "troisième", "3ème"]
         if any(k in lower for k in selection_keywords):
-            print(f"  [QUICK] Sélection contextuelle Wiki", flush=True)
+            log.info("  [QUICK] Sélection contextuelle Wiki")
             return ("LEARN", user_input)
 
     # === PRIORITÉ 10 : MAXIMISATION / PLEIN ÉCRAN (Force l'outil FULLSCREEN) ===
@@ -1702,7 +1943,7 @@ def quick_heuristic_check(user_input):
     if any(k in lower for k in ["maximise", "maximize", "agrandis", "plein écran", "fullscreen"]):
         # On vérifie que ce n'est pas une question ("c'est quoi le plein écran")
         if not any(k in lower for k in ["c'est quoi", "comment"]):
-            print(f"  [QUICK] Maximisation détectée -> FULLSCREEN", flush=True)
+            log.info("  [QUICK] Maximisation détectée -> FULLSCREEN")
             return ("FULLSCREEN", user_input)
 
     # === PRIORITÉ 11 : FOCUS FENÊTRE (NOUVEAU) ===
@@ -1713,32 +1954,182 @@ def quick_heuristic_check(user_input):
         if target.startswith("sur "): target = target[4:].strip()
         
         if target:
-            print(f"  [QUICK] Focus détecté -> FOCUS_WINDOW: '{target}'", flush=True)
+            log.info("  [QUICK] Focus détecté -> FOCUS_WINDOW: '%s'", target)
             return ("FOCUS_WINDOW", target)
     
     return None  # Pas de match → Appel IA nécessaire
 
+def utterance_key(user_input):
+    """Clé de cache d'une phrase : même normalisation que le cache des classements."""
+    wake_words = igor_intent_cache.WAKE_WORDS + (skills.MEMORY.get('agent_name', ''),)
+    return igor_intent_cache.normalize_utterance(user_input, wake_words)
+
+# === CACHE DES RÉPONSES ===
+_QUERY_STATE = threading.local()   # 'transient' : réponse de repli (LLM muet, JSON illisible) à ne pas mémoriser
+
+def query_fallback(user_input):
+    """Repli par mots-clés de brain_query : valable pour ce tour, jamais mis en cache."""
+    _QUERY_STATE.transient = True
+    return fallback_intent_detection(user_input)
+
+@lru_cache(maxsize=None)
+def _prompt_templates_digest():
+    h = hashlib.sha1()
+    for table in (igor_globals.MICRO_PROMPTS, igor_globals.INTENT_TOOL_GROUPS, igor_globals.TOOLS_GROUPS):
+        h.update(repr(sorted(table.items())).encode())
+    return h.hexdigest()
+
+def query_cache_digest():
+    """
+    Empreinte de ce qui produit une réponse : backend et modèle, mode une passe,
+    vocabulaires/applis (index des intentions) et gabarits de prompt.
+    Un changement de modèle ou de prompt ne ressert plus les anciennes réponses.
+    """
+    backend = igor_llm.active_backend()
+    h = hashlib.sha1()
+    h.update(f"{backend['type']}|{backend['url']}|{backend['model_name']}|{single_pass_enabled()}|".encode())
+    h.update(f"{skills.MEMORY.get('agent_name', '')}|{_prompt_templates_digest()}|".encode())
+    h.update(igor_intent_index.get_index().digest.encode())
+    return h.hexdigest()[:16]
+
 def get_cached_or_query(user_input):
     """
     Vérifie le cache avant d'appeler l'IA.
-    Utilise un hash MD5 de la requête comme clé.
+    Clé = phrase normalisée ("Igor, ouvre Firefox." == "ouvre firefox") + empreinte
+    modèle/prompts ; cache LRU avec échéance par entrée, repoussée à chaque hit,
+    et copie sur disque. Les réponses de repli ne sont pas mémorisées.
     """
-    # Hash de la requête (insensible à la casse)
-    cache_key = hashlib.md5(user_input.lower().encode()).hexdigest()
+    cache_key = utterance_key(user_input)
+    if cache_key:
+        cache_key = f"{cache_key}|{query_cache_digest()}"
     
-    if cache_key in igor_globals.QUERY_CACHE:
+    cached = igor_globals.QUERY_CACHE.get(cache_key) if cache_key else None
+    if cached is not None:
         log_query_stats("cache_hits")
-        print(f"  [CACHE HIT] Réponse instantanée", flush=True)
-        return igor_globals.QUERY_CACHE[cache_key]
+        log.info("  [CACHE HIT] Réponse instantanée")
+        turn = igor_turnlog.current()
+        if turn is not None:
+            turn.set(source="query_cache")
+        return tuple(cached)
     
     # Appel IA
+    _QUERY_STATE.transient = False
+    _CLASSIFY_STATE.transient = False
     result = brain_query(user_input)
     log_query_stats("ai_calls")
     
-    # Sauvegarde cache (avec limite de taille FIFO)
-    if len(igor_globals.QUERY_CACHE) >= igor_globals.CACHE_MAX_SIZE:
-        # Supprime la plus ancienne entrée
-        igor_globals.QUERY_CACHE.pop(next(iter(igor_globals.QUERY_CACHE)))
-    
-    igor_globals.QUERY_CACHE[cache_key] = result
-    return result
\ No newline at end of file
+    # Sauvegarde cache (durée de vie selon l'outil : une réponse CHAT vieillit vite),
+    # sauf repli : classement ou réponse obtenus sans le LLM
+    if _QUERY_STATE.transient or _CLASSIFY_STATE.transient:
+        log.info("  [CACHE] Réponse de repli non mémorisée")
+    elif cache_key:
+        tool = result[0] if isinstance(result, tuple) else None
+        igor_globals.QUERY_CACHE.put(cache_key, list(result), ttl=igor_globals.QUERY_CACHE_TTL_BY_TOOL.get(tool))
+    return result
+
+# === SEGMENTATION EN AMONT (COMMANDES MULTIPLES) ===
+SEGMENT_SEPARATORS = re.compile(r'(\s*,\s*|\s+(?:et|puis|ensuite|après|apres)\s+)', re.IGNORECASE)
+SEGMENT_MAX = 6   # Au-delà, on laisse le LLM gérer la phrase entière
+# Mots sautés pour trouver la tête d'un segment sans verbe ("et la calculatrice" -> calculatrice)
+SEGMENT_DETERMINERS = {"le", "la", "les", "l", "un", "une", "des", "du", "de", "d",
+                       "mon", "ma", "mes", "ton", "ta", "tes", "ce", "cet", "cette", "ces", "aussi"}
+
+def _segment_words(segment):
+    return [w for w in re.split(r"[\s'’]+", remove_accents_and_special_chars(segment.lower())) if w]
+
+def _segment_verb(segment):
+    """Premier verbe d'action du segment (mot d'origine), ou None."""
+    for word in segment.split():
+        if remove_accents_and_special_chars(word.lower()) in igor_globals.MULTI_ACTIONS:
+            return word
+    return None
+
+def _leading_verb(segment):
+    """Verbe d'action en tête du segment ("ouvre firefox"), ou None ("comment ça va")."""
+    words = segment.split()
+    if words and remove_accents_and_special_chars(words[0].lower()) in igor_globals.MULTI_ACTIONS:
+        return words[0]
+    return None
+
+def _known_object(segment):
+    """Le segment désigne-t-il un objet des vocabulaires ou une application installée ?"""
+    words = _segment_words(segment)
+    while words and words[0] in SEGMENT_DETERMINERS:
+        words = words[1:]
+    if not words:
+        return False
+    # Objets des règles, noms d'applis compris (un mot ou le segment entier : "visual studio code")
+    postings = igor_intent_index.get_index().postings
+    return any(role == igor_intent_index.ROLE_OBJECT
+               for key in (words[0], " ".join(words)) for _rule, role in postings.get(key, ()))
+
+def segment_utterance(user_input):
+    """
+    Découpe une phrase en commandes ordonnées, en une fois.
+    Un segment commence une commande s'il a son propre verbe en tête ("... et ferme le terminal"),
+    ou s'il désigne un objet connu / une appli et hérite alors du verbe précédent
+    ("ferme firefox et la calculatrice" -> ["ferme firefox", "ferme la calculatrice"]).
+    Sinon il reste dans l'argument de la commande précédente ("recherche Roméo et Juliette",
+    "écris bonjour, comment ça va"). Pas de découpage si la phrase ne commence pas par
+    une commande ("la différence entre le chat et le chien").
+    """
+    text = user_input.strip()
+    pieces = SEGMENT_SEPARATORS.split(text)
+    parts, separators = pieces[0::2], pieces[1::2]
+    if len(parts) < 2 or len(parts) > SEGMENT_MAX or not _segment_verb(parts[0]):
+        return [text]
+
+    segments = [parts[0].strip()]
+    verb = _segment_verb(parts[0])
+    for separator, part in zip(separators, parts[1:]):
+        part = part.strip()
+        if not part:
+            continue
+        own_verb = _leading_verb(part)
+        if own_verb:
+            verb = own_verb
+            segments.append(part)
+        elif _known_object(part):
+            segments.append(f"{verb} {part}")
+        else:
+            segments[-1] += separator + part
+    if len(segments) < 2:
+        return [text]
+    return segments
+
+def resolve_utterance(user_input):
+    """
+    Point d'entrée du cerveau pour une phrase complète : segmentation, puis classification
+    et résolution de tous les segments en parallèle. Renvoie (outil, args) ; plusieurs
+    segments donnent un seul ("BATCH", [actions dans l'ordre]) pour l'exécuteur.
+    Chaque segment a sa propre entrée dans le journal du tour (intention, source, sortie brute).
+    """
+    segments = segment_utterance(user_input)
+    if len(segments) == 1:
+        return get_cached_or_query(user_input)
+
+    log.info("  [SEGMENT] %s commandes : %s", len(segments), segments)
+    turn = igor_turnlog.current()
+    if turn is not None:
+        turn.set(source="segments")
+    pending = [igor_llm.Speculation(igor_turnlog.bind(get_cached_or_query, turn.segment(segment) if turn else None),
+                                    segment, label=f"Segment {i}")
+               for i, segment in enumerate(segments, 1)]
+
+    plan = []
+    for segment, speculation in zip(segments, pending):
+        result = speculation.result()
+        if not result:
+            log.warning("  [SEGMENT] ⚠️ Segment non résolu : '%s'", segment)
+            continue
+        tool, args = result
+        if tool == "BATCH" and isinstance(args, list):
+            plan.extend(item for item in args if isinstance(item, dict))
+        elif not (tool == "CHAT" and not args):
+            plan.append({"tool": tool, "args": args})
+
+    if len(plan) == 1:
+        return plan[0]["tool"], plan[0]["args"]
+    if not plan:
+        return "CHAT", ""
+    return "BATCH", plan
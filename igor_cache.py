@@ -0,0 +1,138 @@
+# igor_cache.py
+"""
+Caches clé -> valeur du cerveau : LRU véritable, expiration par entrée, copie sur disque.
+- L'ordre d'usage est tenu par un OrderedDict (hit = remis en tête, éviction = le plus ancien).
+- Chaque entrée a sa propre échéance ; 'sliding' : un hit repousse l'échéance
+  (une commande fréquente ne repasse jamais par le LLM).
+- Copie JSON écrite de façon atomique (fichier temporaire + rename), au plus toutes les
+  SAVE_INTERVAL secondes et à la sortie du programme.
+Chaque cache s'enregistre dans CACHES : l'outil STATUS affiche leurs métriques.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+
+import igor_log
+
+log = igor_log.get_logger("cache")
+
+SAVE_INTERVAL = 5.0
+CACHES = {}   # nom -> TTLCache
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=256, ttl=None, path=None, sliding=False):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.sliding = sliding
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self._entries = OrderedDict()   # clé -> [valeur, échéance ou None, ttl de l'entrée]
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if path:
+            self._load()
+            atexit.register(self.save)
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires, ttl = entry
+            if expires is not None and expires <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                self._dirty = True
+                return default
+            self._entries.move_to_end(key)
+            if self.sliding and ttl:
+                entry[1] = now + ttl
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        """ttl : durée de vie de cette entrée (secondes), sinon celle du cache ; 0 = pas de cache."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl == 0:
+            return
+        with self._lock:
+            self._entries[key] = [value, time.time() + ttl if ttl else None, ttl]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+        self._maybe_save()
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"name": self.name, "entries": len(self._entries), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations, "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    # --- PERSISTANCE ---
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            for key, value, expires, ttl in data.get("entries", []):
+                if expires is None or expires > now:
+                    self._entries[key] = [value, expires, ttl]
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        except (OSError, ValueError, TypeError) as e:
+            log.warning("  [CACHE] ⚠️ Cache '%s' illisible, ignoré : %s", self.name, e)
+
+    def _maybe_save(self):
+        if self.path and time.time() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Écriture atomique de la copie disque (ordre LRU conservé), si quelque chose a changé."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, value, expires, ttl] for key, (value, expires, ttl) in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.time()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except (OSError, TypeError) as e:
+            log.warning("  [CACHE] ⚠️ Sauvegarde du cache '%s' impossible : %s", self.name, e)
+
+
+def all_stats():
+    return [cache.stats() for cache in CACHES.values()]
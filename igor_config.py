@@ -18,7 +18,13 @@ import unicodedata
 import requests
 import queue
 import threading
+import sqlite3
+import atexit
 from difflib import SequenceMatcher
+import igor_log
+import igor_store
+
+log = igor_log.get_logger("config")
 
 # --- CONFIGURATION & PATHS ---
 KNOWLEDGE_DIR = "knowledge"
@@ -27,6 +33,7 @@ MEMORY_FILE = "memory.json"
 SEARCH_LOG_FILE = "search_history.log"  # Fichier de log
 USER_HOME = os.path.expanduser("~")
 SHORTCUTS_FILE = "shortcuts.json"
+STORE_DB = igor_store.STORE_DB   # Faits, carnet, alarmes, instances LLM et raccourcis (SQLite)
 
 # --- CONFIGURATION API ---
 OLLAMA_API_URL = "http://localhost:11434/api/generate"
@@ -84,6 +91,11 @@ ALARM_STYLES = {
 }
 
 # --- GESTION MÉMOIRE ---
+# Après open_store(), les listes de MEMORY (faits, carnet, alarmes, instances LLM) sont
+# tenues en base : MEMORY['notebook'].append(...) reste valable, save_memory n'écrit que
+# les lignes touchées. Sans open_store (bench, entraînement), tout reste dans memory.json.
+STORE = igor_store.Store(STORE_DB, shortcuts_file=SHORTCUTS_FILE)
+
 def load_memory():
     """Charge la mémoire depuis le fichier JSON ou crée les défauts."""
     default_mem = {
@@ -107,23 +119,132 @@ def load_memory():
         "window_y": None,
         "current_project": None
     }
-    if not os.path.exists(MEMORY_FILE): return default_mem
-    try:
-        with open(MEMORY_FILE, 'r', encoding='utf-8') as f: 
-            mem = json.load(f)
-            # Fusion avec les clés par défaut manquantes
-            for k, v in default_mem.items():
-                if k not in mem: mem[k] = v
-            return mem
-    except: return default_mem
+    # Relecture (ex: après le dialogue de config) : les modifications en attente d'abord
+    if 'MEMORY_WRITER' in globals(): flush_memory()
+    mem = default_mem
+    if os.path.exists(MEMORY_FILE):
+        try:
+            with open(MEMORY_FILE, 'r', encoding='utf-8') as f: 
+                mem = json.load(f)
+                # Fusion avec les clés par défaut manquantes
+                for k, v in default_mem.items():
+                    if k not in mem: mem[k] = v
+        except: mem = default_mem
+    mem = igor_store.MemoryDict(mem)
+    if STORE.attached:
+        STORE.attach(mem, MEMORY_FILE)
+    return mem
+
+def open_store():
+    """Démarrage de l'appli : listes et raccourcis passent en base (migration au premier lancement)."""
+    STORE.durable = MEMORY.get('memory_fsync', "always") == "always"
+    if STORE.attach(MEMORY, MEMORY_FILE):
+        STORE.migrate_shortcuts()
+
+# --- ÉCRITURE DIFFÉRÉE DE LA MÉMOIRE ---
+SAVE_DEBOUNCE = 0.5   # Les modifications rapprochées (clics, alarmes, notes) font une seule écriture
+# Politique fsync ('memory_fsync' dans memory.json) :
+#   "always" : chaque écriture est forcée sur disque, "exit" : seulement l'écriture finale, "never" : jamais
+FSYNC_POLICIES = ("always", "exit", "never")
+
+class MemoryWriter:
+    """
+    Écrit memory.json depuis un thread dédié : save_memory ne fait que signaler
+    une modification, jamais d'E/S dans le thread GTK ni au milieu d'un tour.
+    JSON compact écrit dans un fichier temporaire puis renommé (jamais de fichier à moitié écrit).
+    """
+
+    def __init__(self, path, debounce=SAVE_DEBOUNCE, fsync="always", store=None):
+        self.path = path
+        self.store = store   # Listes écrites ligne à ligne en base, le reste dans memory.json
+        self.debounce = debounce
+        self.fsync = fsync if fsync in FSYNC_POLICIES else "always"
+        self.requests = self.writes = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, data):
+        """Note la dernière version à écrire et réveille le thread d'écriture."""
+        with self._cond:
+            self._pending = data
+            self.requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+            time.sleep(self.debounce)   # Fenêtre de regroupement
+            self.flush(final=False)
+
+    def flush(self, final=True):
+        """Écrit tout de suite la version en attente (appelé aussi à la sortie)."""
+        with self._io_lock:
+            with self._cond:
+                data, self._pending = self._pending, None
+            if self.store:
+                # Lignes notées par les listes en base (y compris celles d'un essai raté)
+                try:
+                    self.store.flush()
+                except sqlite3.Error as e:
+                    log.warning("  [MEMORY] ⚠️ Écriture en base impossible : %s", e)
+            if data is None:
+                return
+            self._write(data, sync=self.fsync == "always" or (final and self.fsync == "exit"))
+
+    def _write(self, data, sync):
+        for _ in range(3):
+            try:
+                text = json.dumps(self.store.settings(data) if self.store else data,
+                                  ensure_ascii=False, separators=(",", ":"))
+                break
+            except RuntimeError:   # Dictionnaire modifié par un autre thread pendant la sérialisation
+                time.sleep(0.01)
+        else:
+            log.warning("  [MEMORY] ⚠️ Mémoire en cours de modification, sauvegarde reportée.")
+            with self._cond:
+                if self._pending is None:
+                    self._pending = data
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(text)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            if sync:
+                dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            self.writes += 1
+        except OSError as e:
+            log.warning("  [MEMORY] ⚠️ Sauvegarde impossible : %s", e)
 
 def save_memory(mem_data):
-    """Sauvegarde la mémoire dans le fichier JSON."""
-    with open(MEMORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(mem_data, f, indent=4, ensure_ascii=False)
+    """Sauvegarde la mémoire dans le fichier JSON (en arrière-plan, voir MemoryWriter)."""
+    MEMORY_WRITER.schedule(mem_data)
+
+def flush_memory():
+    """Force l'écriture des modifications en attente (avant os._exit ou une relecture du fichier)."""
+    MEMORY_WRITER.flush()
 
 # Chargement initial de la mémoire
 MEMORY = load_memory()
+MEMORY_WRITER = MemoryWriter(MEMORY_FILE, fsync=MEMORY.get('memory_fsync', "always"), store=STORE)
+atexit.register(flush_memory)
+# Niveaux de journalisation par sous-système (ex: "log_levels": {"brain": "DEBUG"})
+igor_log.configure(MEMORY.get('log_levels', {}))
+igor_log.install_crash_dump()
 # Variable globale pratique pour le mode auto-apprentissage
 AUTO_LEARN_MODE = MEMORY.get('auto_learn', False)
 
@@ -137,10 +258,15 @@ def remove_accents(input_str):
     # On garde uniquement les caractères qui ne sont pas des marques d'accent (Mn)
     return "".join([c for c in nfkd_form if not unicodedata.category(c) == 'Mn']).lower()
 
+# 'degraded' : le dernier résumé du thread est une troncature de secours (IA indisponible)
+SUMMARY_STATE = threading.local()
+
 def smart_summarize(text, source_name="résultat"):
     """
     Si le texte est trop long, demande à l'IA de le résumer.
     Sinon, renvoie le texte tel quel.
+    Si l'IA échoue, renvoie le texte tronqué et lève SUMMARY_STATE.degraded
+    (à ne pas mettre en cache).
     """
     if not text: return f"Aucun {source_name}."
     
@@ -167,40 +293,17 @@ def smart_summarize(text, source_name="résultat"):
             f"Ne dis pas 'Voici le résumé', donne juste les faits."
         )
 
-        # Récupération de la config active (Ollama ou Llama.cpp)
-        backend = MEMORY.get('llm_backend', 'llamacpp')
-        url = MEMORY.get('llm_api_url', LLM_TEXT_API_URL)
-        model_name = MEMORY.get('llm_model_name', 'mistral-small')
-
-        if backend == 'ollama':
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": 150,
-                    "temperature": 0.2,
-                    "stop": ["\n\n"]
-                }
-            }
-            res = requests.post(url, json=payload, timeout=20)
-            summary = res.json().get('response', '').strip()
-        else:
-            # Format Llama.cpp Server
-            payload = {
-                "prompt": prompt,
-                "n_predict": 150,
-                "temperature": 0.2,
-                "stop": ["\n\n"]
-            }
-            res = requests.post(url, json=payload, timeout=20)
-            summary = res.json().get('content', '').strip()
+        # Client LLM partagé (config active Ollama ou Llama.cpp, connexion keep-alive)
+        # Import local : igor_llm dépend lui-même de ce module
+        import igor_llm
+        summary = igor_llm.generate(prompt, n_predict=150, temperature=0.2, stop=["\n\n"], timeout=20)
         
         return f"(Résumé auto) : {summary}"
 
     except Exception as e:
         print(f"  [ERR] Echec résumé : {e}")
         # Fallback : on tronque proprement si l'IA échoue
+        SUMMARY_STATE.degraded = True
         return text[:MAX_CHARS] + "... (Texte trop long et IA indisponible)"
 
 def abort_tasks():
@@ -218,11 +321,18 @@ def abort_tasks():
             
         # 2. Kill Réseau (Vision)
         if CURRENT_VISION_SESSION:
-            print("  [SYSTEM] KILL switch activé sur la Vision.", flush=True)
+            log.info("  [SYSTEM] KILL switch activé sur la Vision.")
             try: CURRENT_VISION_SESSION.close()
             except: pass
             CURRENT_VISION_SESSION = None
 
-        print("  [SYSTEM] Tâches annulées.", flush=True)
+        # 3. Kill Réseau (générations LLM en cours : brain, résumé, classification...)
+        # Import local : igor_llm dépend lui-même de ce module
+        import igor_llm
+        cancelled = igor_llm.cancel_all()
+        if cancelled:
+            log.info("  [SYSTEM] KILL switch activé sur %s génération(s) LLM.", cancelled)
+
+        log.info("  [SYSTEM] Tâches annulées.")
     except Exception as e:
-        print(f"  [ERR] Erreur vidage queue: {e}")
\ No newline at end of file
+        log.error("  [ERR] Erreur vidage queue: %s", e)
\ No newline at end of file
@@ -0,0 +1,172 @@
+# igor_dedup.py
+"""
+Détection des quasi-doublons du carnet de notes sans comparer chaque note.
+- Index inversé des trigrammes de caractères (texte en minuscules) -> notes qui les contiennent.
+- Une nouvelle note compte ses trigrammes partagés avec chaque note (coefficient de Dice)
+  et ne compare que les TOP_K premières, de longueur compatible : SequenceMatcher tranche,
+  même score et même note retenue qu'avant.
+- L'index suit la liste MEMORY['notebook'] pas à pas (ajout, remplacement, suppression) ;
+  il n'est reconstruit que si la liste a été remplacée (rechargement, effacement).
+"""
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher
+
+THRESHOLD = 0.65       # Même seuil que l'ancienne comparaison exhaustive
+TOP_K = 32             # Notes les plus proches (trigrammes) vérifiées par SequenceMatcher
+MIN_DICE = 0.2         # Quasi-doublons mesurés (ratio > 0.65, 15 caractères et plus) : Dice >= 0.26
+SHORT_TEXT = 15        # En dessous, deux textes proches peuvent ne partager aucun trigramme
+
+
+def _shingles(text):
+    text = " ".join(text.split())
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(a, b):
+    """Score de l'ancienne comparaison (insensible à la casse)."""
+    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def _length_bounds(n, threshold):
+    """
+    ratio <= 2 * min(longueurs) / somme des longueurs : seules les notes de longueur
+    strictement comprise entre les deux bornes peuvent dépasser le seuil.
+    """
+    return n * threshold / (2 - threshold), n * (2 - threshold) / threshold
+
+
+class ShingleIndex:
+    """Trigrammes des notes, suivant une liste de textes (identifiants stables, ordre de la liste)."""
+
+    def __init__(self):
+        self.source = None    # Liste suivie (MEMORY['notebook'])
+        self.order = []       # Identifiant de chaque note, dans l'ordre de la liste
+        self.texts = {}       # identifiant -> texte
+        self.grams = {}       # identifiant -> trigrammes
+        self.lengths = {}     # identifiant -> longueur du texte
+        self.postings = {}    # trigramme -> {identifiant}
+        self.short = set()    # Notes de moins de SHORT_TEXT caractères
+        self._next_id = 0
+
+    def sync(self, texts):
+        """Reconstruit l'index seulement si la liste suivie a été remplacée ou a changé de taille."""
+        if texts is not self.source or len(texts) != len(self.order):
+            self.source = texts
+            self.order, self.texts, self.grams, self.lengths = [], {}, {}, {}
+            self.postings, self.short = {}, set()
+            for text in texts:
+                self._append(text)
+        return self
+
+    def _append(self, text):
+        note_id = self._next_id
+        self._next_id += 1
+        self.order.append(note_id)
+        self._index(note_id, text)
+        return len(self.order) - 1
+
+    def _index(self, note_id, text):
+        grams = _shingles(text.lower())
+        self.texts[note_id] = text
+        self.grams[note_id] = grams
+        self.lengths[note_id] = len(text)
+        if len(text) < SHORT_TEXT:
+            self.short.add(note_id)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(note_id)
+
+    def _unindex(self, note_id):
+        self.short.discard(note_id)
+        del self.lengths[note_id]
+        for gram in self.grams.pop(note_id):
+            ids = self.postings.get(gram)
+            if ids:
+                ids.discard(note_id)
+                if not ids:
+                    del self.postings[gram]
+        return self.texts.pop(note_id)
+
+    def add(self, text):
+        """Note ajoutée en fin de liste ; renvoie sa position."""
+        return self._append(text)
+
+    def replace(self, pos, text):
+        note_id = self.order[pos]
+        self._unindex(note_id)
+        self._index(note_id, text)
+
+    def remove(self, pos):
+        """Note retirée de la liste (les suivantes remontent d'une position)."""
+        return self._unindex(self.order.pop(pos))
+
+    def candidates(self, text, threshold=THRESHOLD, k=TOP_K):
+        """Positions des k notes les plus proches (Dice des trigrammes), de longueur compatible."""
+        n = len(text)
+        if n < SHORT_TEXT:
+            return self._short_candidates(text, threshold, k)
+        grams = _shingles(text.lower())
+        shared = Counter()    # identifiant -> trigrammes en commun avec le texte
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids:
+                shared.update(ids)
+        lo, hi = _length_bounds(n, threshold)
+        best = []             # Tas des k meilleurs (dice, identifiant)
+
+        def push(dice, note_id):
+            if len(best) < k:
+                heapq.heappush(best, (dice, note_id))
+            elif (dice, note_id) > best[0]:
+                heapq.heapreplace(best, (dice, note_id))
+
+        # Notes courtes : Dice peu fiable, gardées quel que soit leur score
+        for note_id in self.short:
+            if lo < self.lengths[note_id] < hi:
+                push(2 * shared[note_id] / (len(grams) + len(self.grams[note_id])), note_id)
+        floor = MIN_DICE
+        for note_id, common in shared.most_common():
+            # Dice <= 2c / (|Q| + c) : les notes suivantes, moins partagées, ne feront pas mieux
+            if 2 * common / (len(grams) + common) < floor:
+                break
+            if note_id in self.short or not lo < self.lengths[note_id] < hi:
+                continue
+            dice = 2 * common / (len(grams) + len(self.grams[note_id]))
+            if dice >= MIN_DICE:
+                push(dice, note_id)
+                if len(best) == k:
+                    floor = max(MIN_DICE, best[0][0])
+        return self._positions(sorted(best, reverse=True))
+
+    def _short_candidates(self, text, threshold, k):
+        """
+        Texte court : deux textes proches peuvent ne partager aucun trigramme ("lait la" /
+        "mardi la"). Les notes de longueur compatible sont triées par quick_ratio (majorant de ratio).
+        """
+        lowered = text.lower()
+        lo, hi = _length_bounds(len(text), threshold)
+        scored = []
+        for note_id in self.order:
+            if lo < self.lengths[note_id] < hi:
+                bound = SequenceMatcher(None, self.texts[note_id].lower(), lowered).quick_ratio()
+                if bound > threshold:
+                    scored.append((bound, note_id))
+        return self._positions(heapq.nlargest(k, scored))
+
+    def _positions(self, best):
+        if len(best) > 8:
+            position = {note_id: pos for pos, note_id in enumerate(self.order)}
+            return [position[note_id] for _, note_id in best]
+        return [self.order.index(note_id) for _, note_id in best]
+
+    def find_similar(self, text, threshold=THRESHOLD):
+        """(position, texte) de la première note au-delà du seuil, ou None."""
+        lowered = text.lower()
+        for pos in sorted(self.candidates(text, threshold)):
+            matcher = SequenceMatcher(None, self.texts[self.order[pos]].lower(), lowered)
+            # quick_ratio majore ratio : le calcul complet n'est fait que s'il peut passer le seuil
+            if matcher.quick_ratio() > threshold and matcher.ratio() > threshold:
+                return pos, self.texts[self.order[pos]]
+        return None
@@ -1,6 +1,7 @@
 # igor_globals.py
 import threading
 import igor_skills as skills
+import igor_cache
 
 # --- CONFIGURATION API & MODÈLES ---
 API_URL = "http://localhost:8080/completion"
@@ -8,6 +9,8 @@ MODEL_PATH = "model"
 
 # --- GESTION PROCESSUS LLM LOCAL ---
 LLM_SERVER_PROCESS = None
+# État du serveur local : "stopped", "loading" (modèle en chargement), "warming" (préchauffe du cache), "ready"
+LLM_SERVER_STATE = "stopped"
 
 # --- GLOBALS PARTAGÉS ---
 # Ces variables sont modifiées par d'autres modules, donc on les centralise ici
@@ -19,8 +22,12 @@ SPEAK_LOCK = threading.Lock()
 
 # --- IA & MÉMOIRE ---
 CHAT_HISTORY = []
-QUERY_CACHE = {}
-CACHE_MAX_SIZE = 100
+CACHE_MAX_SIZE = 500
+QUERY_CACHE_FILE = "query_cache.json"
+QUERY_CACHE_TTL = 7 * 24 * 3600            # Sans usage pendant 7 jours, une entrée expire
+QUERY_CACHE_TTL_BY_TOOL = {"CHAT": 3600}   # Réponses libres : 1 h seulement
+QUERY_CACHE = igor_cache.TTLCache("réponses", maxsize=CACHE_MAX_SIZE, ttl=QUERY_CACHE_TTL,
+                                  path=QUERY_CACHE_FILE, sliding=True)
 MAX_HISTORY = 6
 
 # --- STATISTIQUES ---
@@ -437,6 +444,21 @@ STOP_WORDS = {
     # --- Alphabet Complet
     "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z"
 }
+# Mots courants hors vocabulaire : déjà des vrais mots, jamais corrigés phonétiquement
+# ("firefox est lent" ne doit pas devenir "firefox est lance")
+COMMON_WORDS = {
+    "lent", "lente", "lents", "rapide", "monde", "pates", "pate", "cout", "coute", "couts",
+    "gros", "grand", "grande", "petit", "petite", "beau", "belle", "mauvais", "nouveau",
+    "vieux", "long", "longue", "court", "courte", "haut", "bas", "fort", "forte", "faible",
+    "lourd", "facile", "difficile", "possible", "vrai", "faux",
+    "jour", "nuit", "matin", "soir", "semaine", "mois", "annee", "minute",
+    "maison", "travail", "gens", "homme", "femme", "enfant", "ami", "amis", "famille",
+    "ville", "pays", "route", "voiture", "porte", "table", "livre", "lettre", "mot", "mots",
+    "nom", "prix", "part", "partie", "fin", "debut", "fond", "main", "tete", "pied",
+    "veux", "voudrais", "peux", "peut", "dois", "doit", "vais", "suis",
+    "ont", "avez", "etes", "etait", "aime", "pense", "crois", "dit",
+    "lentement", "mieux", "moins", "plus", "tres", "trop", "assez", "peu", "beaucoup",
+}
 MULTI_ACTIONS = {
     # --- Démarrage / Activation / Ouverture ---
     "allume", "allumer", "allumez",
@@ -0,0 +1,119 @@
+# igor_intent_cache.py
+"""
+Cache persistant des classifications d'intention (SQLite, survit aux redémarrages).
+La clé est la phrase normalisée : "Igor, ouvre Firefox." et "ouvre firefox" partagent
+la même entrée. Chaque entrée porte l'empreinte des vocabulaires et des applis installées
+au moment du classement : si l'empreinte change, les anciennes entrées sont purgées.
+Le cache s'enregistre dans igor_cache.CACHES : l'outil STATUS affiche ses hits/misses.
+"""
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+
+import igor_cache
+import igor_log
+
+log = igor_log.get_logger("cache")
+
+CACHE_DB = "intent_cache.db"
+WAKE_WORDS = ("igor", "assistant", "ordinateur")   # Mêmes mots-clés par défaut que le détecteur FR
+
+
+def normalize_utterance(text, wake_words=WAKE_WORDS):
+    """Minuscules, sans accents ni ponctuation, mot d'éveil en tête retiré, espaces simples."""
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    words = re.sub(r"[^\w]+", ' ', text).split()
+    wake = {unicodedata.normalize('NFD', w.lower()).encode('ascii', 'ignore').decode() for w in wake_words if w}
+    while len(words) > 1 and words[0] in wake:
+        words.pop(0)
+    return ' '.join(words)
+
+
+class IntentCache:
+    """Table phrase normalisée -> intention, avec compteurs de hits/misses."""
+
+    def __init__(self, path=CACHE_DB, name="classements"):
+        self.name = name
+        self.path = path
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.purged = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._fingerprint = None
+        igor_cache.CACHES[name] = self
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS intents (
+                key TEXT PRIMARY KEY, intent TEXT NOT NULL, fingerprint TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL)""")
+            self._conn.commit()
+        return self._conn
+
+    def _check_fingerprint(self, db, fingerprint):
+        """Première requête avec une nouvelle empreinte : les entrées périmées sont supprimées."""
+        if fingerprint == self._fingerprint:
+            return
+        purged = db.execute("DELETE FROM intents WHERE fingerprint != ?", (fingerprint,)).rowcount
+        db.commit()
+        self._fingerprint = fingerprint
+        self.purged += purged
+        if purged:
+            log.info("  [CACHE] Vocabulaire ou applis modifiés : %s classements oubliés.", purged)
+
+    def get(self, key, fingerprint):
+        """Intention en cache pour cette clé, ou None (compté comme miss)."""
+        if not self.enabled or not key:
+            return None
+        try:
+            with self._lock:
+                db = self._db()
+                self._check_fingerprint(db, fingerprint)
+                row = db.execute("SELECT intent FROM intents WHERE key = ?", (key,)).fetchone()
+                if row:
+                    db.execute("UPDATE intents SET hits = hits + 1 WHERE key = ?", (key,))
+                    db.commit()
+                    self.hits += 1
+                    return row[0]
+                self.misses += 1
+        except sqlite3.Error as e:
+            log.warning("  [CACHE] ⚠️ Lecture impossible : %s", e)
+        return None
+
+    def put(self, key, intent, fingerprint):
+        if not self.enabled or not key or not intent:
+            return
+        try:
+            with self._lock:
+                db = self._db()
+                db.execute("""INSERT INTO intents (key, intent, fingerprint, updated) VALUES (?, ?, ?, ?)
+                              ON CONFLICT(key) DO UPDATE SET intent = excluded.intent,
+                              fingerprint = excluded.fingerprint, updated = excluded.updated""",
+                           (key, intent, fingerprint, time.time()))
+                db.commit()
+        except sqlite3.Error as e:
+            log.warning("  [CACHE] ⚠️ Écriture impossible : %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM intents")
+            self._db().commit()
+            self.hits = self.misses = self.purged = 0
+
+    def stats(self):
+        """Mêmes clés que igor_cache.TTLCache.stats (pas de taille max, purges = expirations)."""
+        total = self.hits + self.misses
+        try:
+            with self._lock:
+                entries = self._db().execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {"name": self.name, "entries": entries, "maxsize": None,
+                "hits": self.hits, "misses": self.misses, "evictions": 0, "expirations": self.purged,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
@@ -0,0 +1,274 @@
+# igor_intent_index.py
+"""
+Index précompilé des mots-clés de classification (classify_query_intent).
+- Règles "action/objet" : une table de postings mot -> (règle, rôle) remplace
+  les ~25 appels à check_intent_category (intersections de sets) par un seul
+  passage sur les mots de la phrase.
+- Mots-clés "sous-chaîne" : un automate Aho-Corasick trouve en un seul passage
+  toutes les occurrences (y compris imbriquées) au lieu de dizaines de any(k in cleaned).
+L'index est reconstruit seulement si les applications installées, les vocabulaires
+ou les poids appris (keyword_weights.json, voir igor_train.py) changent.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import deque
+
+import igor_globals
+import igor_log
+import igor_system
+import igor_phonetic
+
+log = igor_log.get_logger("intent")
+
+# --- RÈGLES ACTION/OBJET ---
+# (libellé, catégorie, actions, objets, interrogatifs, états, + noms d'applis dans les objets)
+# Même barème que l'ancien check_intent_category : action x5, objet x2, +1 par interrogatif/état si action.
+KEYWORD_RULES = [
+    ("EXIT", "IDENTITY", "EXIT_ACTIONS", "EXIT_OBJECTS", None, None, False),
+    ("BASE", "IDENTITY", "BASE_ACTIONS", "BASE_OBJECTS", "BASE_INQUIRIES", None, False),
+    ("SET_FAVORITE", "CONTROL", "SETFAVORITE_ACTIONS", "SETFAVORITE_OBJECTS", None, None, False),
+    ("VOLUME", "MEDIA", "VOLUME_ACTIONS", "VOLUME_OBJECTS", None, None, False),
+    ("SET_MUTE", "MEDIA", "MUTE_ACTIONS", "MUTE_OBJECTS", None, None, False),
+    ("LISTEN_SYSTEM", "MEDIA", "LISTEN_ACTIONS", "LISTEN_OBJECTS", None, None, False),
+    ("MEDIA", "MEDIA", "MEDIA_ACTIONS", "MEDIA_OBJECTS", None, None, False),
+    ("FIND", "SYSTEM", "FIND_ACTIONS", "FIND_OBJECTS", None, None, False),
+    ("NOTES", "MEMORY", "NOTES_ACTIONS", "NOTES_OBJECTS", None, None, False),
+    ("APP", "LAUNCH", "OPEN_ACTIONS", "OPEN_OBJECTS", None, None, True),
+    ("WEB", "LAUNCH", "WEB_ACTIONS", "WEB_OBJECTS", None, None, False),
+    ("SHELL", "SYSTEM", "SHELL_ACTIONS", "SHELL_OBJECTS", None, None, False),
+    ("FULLSCREEN", "CONTROL", "FULLSCREEN_ACTIONS", "FULLSCREEN_OBJECTS", None, "FULLSCREEN_STATES", True),
+    ("CLOSE WINDOW", "CONTROL", "CLOSE_ACTIONS", "CLOSE_OBJECTS", None, None, True),
+    ("CONTROL", "CONTROL", "CONTROL_ACTIONS", "CONTROL_OBJECTS", None, None, False),
+    ("WINDOW", "CONTROL", "WINDOWSTATS_ACTIONS", "WINDOWSTATS_OBJECTS", "WINDOWSTATS_INQUIRIES", "WINDOWSTATS_STATES", False),
+    ("FOCUS", "CONTROL", "FOCUS_ACTIONS", "FOCUS_OBJECTS", None, None, True),
+    ("VISION", "VISION", "VISION_ACTIONS", "VISION_OBJECTS", None, None, False),
+    ("SHORTCUT_LIST", "SHORTCUT", "SHORTCUTLIST_ACTIONS", "SHORTCUTLIST_OBJECTS", None, None, False),
+    ("SHORTCUT", "SHORTCUT", "SHORTCUT_ACTIONS", "SHORTCUT_OBJECTS", None, None, False),
+    ("READ_MEM", "MEMORY", "READMEM_ACTIONS", "READMEM_OBJECTS", None, None, False),
+    ("TIME", "SEARCH", "TIME_ACTIONS", "TIME_OBJECTS", "TIME_INQUIRIES", None, False),
+    ("METEO", "SEARCH", "METEO_ACTIONS", "METEO_OBJECTS", "METEO_INQUIRIES", None, False),
+    ("LEARN", "KNOWLEDGE", "LEARN_ACTIONS", "LEARN_OBJECTS", None, None, False),
+    ("SEARCH", "SEARCH", "SEARCH_ACTIONS", "SEARCH_OBJECTS", None, None, False),
+    ("OPEN_FILE", "CONTROL", "OPEN_ACTIONS", "OPEN_OBJECTS", None, None, False),
+    ("MEMORY", "MEMORY", "MEMORY_ACTIONS", "MEMORY_OBJECTS", None, None, False),
+]
+
+ROLE_ACTION, ROLE_OBJECT, ROLE_INQUIRY, ROLE_STATE = range(4)
+ROLE_NAMES = ("action", "object", "inquiry", "state")
+
+# Points par mot trouvé (interrogatifs/états comptent seulement s'il y a une action).
+# Surchargés par KEYWORD_WEIGHTS_FILE, écrit par igor_train.py à partir du journal des tours.
+DEFAULT_WEIGHTS = {"action": 5, "object": 2, "inquiry": 1, "state": 1}
+KEYWORD_WEIGHTS_FILE = "keyword_weights.json"
+
+# --- FAMILLES DE MOTS-CLÉS CHERCHÉS EN SOUS-CHAÎNE (phrase nettoyée) ---
+SUBSTRING_FAMILIES = {
+    "multi": [" et ", " puis ", " ensuite ", " apres "],
+    "launch": ["ouvre", "lance", "demarre", "va sur", "open", "start", "affiche",
+               "mets", "met", "joue", "regarde", "montre"],
+    "video": ["video", "youtube", "clip", "film"],
+    "calculation": ["calcul de", "resultat de", "combien"],
+    "shell": ["commande", "shell"],
+    "calc_words": ["calcule", "combien fait", "résultat de"],
+    "app_launch": ["lance ", "ouvre ", "démarre "],
+    "project": ["projet", "code", "fichier", "todo", "sauve"],
+    "identity": ["appelle", "nom", "prénom", "suis", "es tu", "tu es", "t'es", "qui es", "qui suis"],
+    "pronouns": ["je", "j'", "mon", "ma", "mes", "tu", "te", "ton", "ta", "tes", "moi", "toi", "t'", "m'"],
+    "alarm": ["alarme", "reveil", "reveille", "sonnerie", "debout"],
+    "time_triggers": ["dans", "à", "pour", "minutes", "heures", "h", "min", "sec"],
+    "alarm_config": ["change", "règle", "définit", "style", "type", "bruit", "son"],
+}
+
+
+class SubstringAutomaton:
+    """Aho-Corasick minimal : toutes les occurrences de tous les motifs en un passage."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+            state = nxt
+        self.out[state].add(pattern)
+
+    def _link(self):
+        todo = deque(self.goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for ch, nxt in self.goto[state].items():
+                todo.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def scan(self, text):
+        """Ensemble des motifs présents dans text."""
+        found = set()
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+def load_weights(path=KEYWORD_WEIGHTS_FILE):
+    """Poids appris s'ils existent, complétés par les poids par défaut."""
+    weights = dict(DEFAULT_WEIGHTS)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            learned = json.load(f)
+        weights.update({k: float(v) for k, v in learned.items() if k in DEFAULT_WEIGHTS})
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+    return weights
+
+
+class KeywordIndex:
+    """Index construit une fois : postings mot -> règles, et automate des sous-chaînes."""
+
+    def __init__(self, apps, weights=None):
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        # Ordre de première apparition : départage les égalités comme l'ancien classement
+        self.categories = list(dict.fromkeys([rule[1] for rule in KEYWORD_RULES] + ["PROJECT"]))
+        self.postings = {}
+        for rule_id, (_label, _cat, actions, objects, inquiries, states, with_apps) in enumerate(KEYWORD_RULES):
+            object_words = set(getattr(igor_globals, objects))
+            if with_apps:
+                object_words |= apps
+            for role, words in ((ROLE_ACTION, getattr(igor_globals, actions)),
+                                (ROLE_OBJECT, object_words),
+                                (ROLE_INQUIRY, getattr(igor_globals, inquiries) if inquiries else ()),
+                                (ROLE_STATE, getattr(igor_globals, states) if states else ())):
+                for word in words:
+                    self.postings.setdefault(word, []).append((rule_id, role))
+
+        self.families = {name: frozenset(words) for name, words in SUBSTRING_FAMILIES.items()}
+        self.families["multi_actions"] = frozenset(igor_globals.MULTI_ACTIONS)
+        patterns = set()
+        for words in self.families.values():
+            patterns |= words
+        self.automaton = SubstringAutomaton(patterns)
+        self.phonetic = igor_phonetic.PhoneticIndex(self.postings)
+        self.digest = self._digest(apps)
+
+    def _digest(self, apps):
+        """Empreinte stable (contenu, pas identité) : sert au cache persistant des classements."""
+        h = hashlib.sha1()
+        for word in sorted(self.postings):
+            h.update(f"{word}:{self.postings[word]}|".encode())
+        for name in sorted(self.families):
+            h.update(f"{name}:{sorted(self.families[name])}|".encode())
+        h.update(repr(sorted(apps)).encode())
+        h.update(repr(sorted(self.weights.items())).encode())
+        return h.hexdigest()
+
+    def fuzzy_words(self, tokens, skip=()):
+        """
+        Mots du vocabulaire rapprochés phonétiquement des mots inconnus de la phrase
+        ("fire fox" -> firefox). Rien à faire si tous les mots sont connus ou ignorés.
+        Les mots courants (igor_globals.COMMON_WORDS) ne sont jamais corrigés.
+        """
+        skip = set(skip) | igor_globals.COMMON_WORDS
+        if all(t in self.postings or t in skip for t in tokens):
+            return set()
+        known = {t for t in tokens if t in self.postings}
+        return self.phonetic.match_tokens(tokens, skip=known | skip) - known
+
+    def rule_counts(self, words, fuzzy=()):
+        """
+        Mots trouvés par règle et par rôle ({indice de règle: [actions, objets, interrogatifs, états]}).
+        fuzzy : mots issus du rapprochement phonétique, comptés seulement comme objets
+        (un verbe deviné ne suffit pas à déclencher une action).
+        """
+        counts = {}
+        for word in words:
+            for rule_id, role in self.postings.get(word, ()):
+                if word in fuzzy and role != ROLE_OBJECT:
+                    continue
+                counts.setdefault(rule_id, [0, 0, 0, 0])[role] += 1
+        return counts
+
+    def rule_points(self, words, fuzzy=()):
+        """Points de chaque règle touchée ({indice de règle: points}), en un passage sur les mots."""
+        return {rule_id: points_for(counts, self.weights)
+                for rule_id, counts in self.rule_counts(words, fuzzy).items()}
+
+    def score(self, words, fuzzy=()):
+        """Classement par catégorie (max des règles), toutes catégories présentes."""
+        ranking = {cat: 0 for cat in self.categories}
+        for rule_id, total in self.rule_points(words, fuzzy).items():
+            category = KEYWORD_RULES[rule_id][1]
+            if ranking[category] < total:
+                ranking[category] = total
+        return ranking
+
+    def matches(self, cleaned):
+        """Sous-chaînes trouvées, regroupées par famille : {famille: set(mots-clés)}."""
+        found = self.automaton.scan(cleaned)
+        return {name: words & found for name, words in self.families.items()}
+
+
+def points_for(counts, weights):
+    """Barème d'une règle : actions et objets, + interrogatifs/états si au moins une action."""
+    actions, objects, inquiries, states = counts
+    total = actions * weights["action"] + objects * weights["object"]
+    if actions:
+        total += inquiries * weights["inquiry"] + states * weights["state"]
+    return total
+
+
+_INDEX = None
+_FINGERPRINT = None
+_LOCK = threading.Lock()
+
+
+def _fingerprint():
+    """Empreinte bon marché : un nouveau scan des applis ou un vocabulaire modifié la change."""
+    apps = igor_system.INSTALLED_APPS
+    vocab = []
+    for rule in KEYWORD_RULES:
+        for attr in rule[2:6]:
+            if attr:
+                value = getattr(igor_globals, attr)
+                vocab.append((id(value), len(value)))
+    try:
+        weights_mtime = os.path.getmtime(KEYWORD_WEIGHTS_FILE)
+    except OSError:
+        weights_mtime = None
+    return (id(apps), len(apps), id(igor_globals.MULTI_ACTIONS), len(igor_globals.MULTI_ACTIONS), tuple(vocab), weights_mtime)
+
+
+def get_index():
+    """Index courant, reconstruit seulement si l'empreinte a changé."""
+    global _INDEX, _FINGERPRINT
+    fingerprint = _fingerprint()
+    if _INDEX is not None and fingerprint == _FINGERPRINT:
+        return _INDEX
+    with _LOCK:
+        if _INDEX is None or fingerprint != _FINGERPRINT:
+            _INDEX = KeywordIndex(set(igor_system.INSTALLED_APPS), load_weights())
+            _FINGERPRINT = fingerprint
+            log.info("  [INIT] Index mots-clés : %s mots, %s états sous-chaînes.",
+                     len(_INDEX.postings), len(_INDEX.automaton.goto))
+    return _INDEX
@@ -0,0 +1,171 @@
+# igor_intent_model.py
+"""
+Classifieur d'intention local (CPU, sans LLM), entre le classement par mots-clés et le LLM.
+- Caractéristiques : n-grammes de caractères (3 à 5) hachés dans un espace fixe, pondérés TF-IDF.
+- Modèle : un centroïde normalisé par intention, score = cosinus (un produit creux par intention).
+- Apprentissage : les exemples des MICRO_PROMPTS ("phrase" → {outil}) + les phrases
+  journalisées dans LOGGED_EXAMPLES_FILE (une ligne JSON {"text", "intent"} par phrase).
+Le modèle est reconstruit seulement si le fichier d'exemples journalisés change.
+"""
+import os
+import re
+import json
+import zlib
+import threading
+import unicodedata
+
+import igor_globals
+import igor_log
+
+log = igor_log.get_logger("intent")
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Pas de NumPy : classifieur local désactivé (on passe au LLM)
+
+HASH_DIM = 1 << 14
+NGRAM_SIZES = (3, 4, 5)
+SOFTMAX_TEMPERATURE = 0.05   # Cosinus -> probabilités : plus bas = plus tranché
+MIN_SIMILARITY = 0.2         # En dessous, la phrase ne ressemble à aucun exemple
+LOGGED_EXAMPLES_FILE = "intent_examples.jsonl"
+
+# Les MICRO_PROMPTS n'ont pas d'exemples de discussion : quelques phrases pour que CHAT existe
+CHAT_SEED_EXAMPLES = [
+    "Salut, comment ça va ?",
+    "Merci beaucoup",
+    "Raconte-moi une blague",
+    "Tu es drôle",
+    "Bonne nuit",
+    "Qu'est-ce que tu en penses ?",
+]
+
+# Ligne d'exemple des MICRO_PROMPTS : "Phrase" → {{"tool": ...}}
+_EXAMPLE_RE = re.compile(r'^"(.+?)"\s*(?:→|->)\s*\{', re.M)
+
+
+def normalize(text):
+    """Minuscules, sans accents, ponctuation -> espaces, espaces simples."""
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.sub(r"[^a-z0-9]+", ' ', text).split())
+
+
+def hashed_ngrams(text):
+    """{indice haché: nombre d'occurrences} des n-grammes de caractères de la phrase normalisée."""
+    padded = f" {normalize(text)} "
+    counts = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            h = zlib.crc32(padded[i:i + n].encode()) & (HASH_DIM - 1)
+            counts[h] = counts.get(h, 0) + 1
+    return counts
+
+
+def micro_prompt_examples():
+    """[(phrase, intention)] extraits des exemples des MICRO_PROMPTS."""
+    examples = []
+    for intent, template in igor_globals.MICRO_PROMPTS.items():
+        for text in _EXAMPLE_RE.findall(template):
+            examples.append((text, intent))
+    examples.extend((text, "CHAT") for text in CHAT_SEED_EXAMPLES)
+    return examples
+
+
+def logged_examples(path=LOGGED_EXAMPLES_FILE):
+    """[(phrase, intention)] journalisés (lignes illisibles ignorées)."""
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            text, intent = entry.get("text"), entry.get("intent")
+            if text and intent in igor_globals.MICRO_PROMPTS:
+                examples.append((text, intent))
+    return examples
+
+
+class CentroidClassifier:
+    """TF-IDF haché + plus proche centroïde."""
+
+    def __init__(self, examples):
+        self.intents = sorted({intent for _, intent in examples})
+        docs = [hashed_ngrams(text) for text, _ in examples]
+
+        # IDF lissé sur les exemples
+        df = np.zeros(HASH_DIM, dtype=np.float32)
+        for doc in docs:
+            df[list(doc)] += 1
+        self.idf = np.log((1 + len(docs)) / (1 + df)).astype(np.float32) + 1.0
+
+        self.centroids = np.zeros((len(self.intents), HASH_DIM), dtype=np.float32)
+        row_of = {intent: i for i, intent in enumerate(self.intents)}
+        for doc, (_, intent) in zip(docs, examples):
+            idx, vals = self._vector(doc)
+            self.centroids[row_of[intent], idx] += vals
+        norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+        self.centroids /= np.maximum(norms, 1e-9)
+
+    def _vector(self, doc):
+        """Vecteur creux normalisé (indices, valeurs) d'une phrase."""
+        idx = np.fromiter(doc.keys(), dtype=np.int64, count=len(doc))
+        vals = np.fromiter(doc.values(), dtype=np.float32, count=len(doc))
+        vals = (1.0 + np.log(vals)) * self.idf[idx]
+        norm = np.linalg.norm(vals)
+        return idx, (vals / norm if norm else vals)
+
+    def predict(self, text):
+        """(intention, confiance, similarité) ; (None, 0.0, 0.0) pour une phrase vide."""
+        doc = hashed_ngrams(text)
+        if not doc:
+            return None, 0.0, 0.0
+        idx, vals = self._vector(doc)
+        sims = self.centroids[:, idx] @ vals
+        best = int(np.argmax(sims))
+        probs = np.exp((sims - sims[best]) / SOFTMAX_TEMPERATURE)
+        return self.intents[best], float(probs[best] / probs.sum()), float(sims[best])
+
+
+_MODEL = None
+_FINGERPRINT = None
+_LOCK = threading.Lock()
+
+
+def _fingerprint(path=LOGGED_EXAMPLES_FILE):
+    try:
+        st = os.stat(path)
+        return (id(igor_globals.MICRO_PROMPTS), st.st_mtime, st.st_size)
+    except OSError:
+        return (id(igor_globals.MICRO_PROMPTS), None, None)
+
+
+def get_model():
+    """Modèle courant (None sans NumPy), réentraîné si les exemples journalisés ont changé."""
+    global _MODEL, _FINGERPRINT
+    if np is None:
+        return None
+    fingerprint = _fingerprint()
+    if _MODEL is not None and fingerprint == _FINGERPRINT:
+        return _MODEL
+    with _LOCK:
+        if _MODEL is None or fingerprint != _FINGERPRINT:
+            examples = micro_prompt_examples() + logged_examples()
+            _MODEL = CentroidClassifier(examples)
+            _FINGERPRINT = fingerprint
+            log.info("  [INIT] Classifieur local : %s exemples, %s intentions.", len(examples), len(_MODEL.intents))
+    return _MODEL
+
+
+def predict(text):
+    """(intention, confiance) du classifieur local, ou (None, 0.0) s'il ne reconnaît rien."""
+    model = get_model()
+    if model is None:
+        return None, 0.0
+    intent, confidence, similarity = model.predict(text)
+    if similarity < MIN_SIMILARITY:
+        return None, 0.0
+    return intent, confidence
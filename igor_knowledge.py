@@ -12,7 +12,6 @@ import threading
 import urllib.parse
 import wikipedia
 import unicodedata
-from difflib import SequenceMatcher
 from sympy import symbols, solve, Eq, sympify
 from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
 
@@ -40,6 +39,8 @@ except ImportError:
 
 # Imports Configuration & Système
 import igor_config
+import igor_llm
+import igor_dedup
 from igor_config import (
     MEMORY, save_memory, smart_summarize, remove_accents,
     KNOWLEDGE_DIR, SEARCH_LOG_FILE, LLM_TEXT_API_URL,
@@ -177,6 +178,16 @@ def tool_search_web(arg):
 
     return final_response
 
+def log_cached_search(raw_query, response):
+    """Trace dans SEARCH_LOG_FILE une recherche resservie depuis le cache des outils."""
+    try:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(SEARCH_LOG_FILE, 'a', encoding='utf-8') as f_log:
+            f_log.write(f"[{timestamp}] REQUÊTE: {str(raw_query).strip()}\n")
+            f_log.write("CACHE (aucune requête réseau).\n")
+            f_log.write(f"RÉPONSE: {response}\n{'='*50}\n")
+    except Exception: pass
+
 def tool_weather(arg):
     location = str(arg).strip().replace('"', '').replace("'", "")
     
@@ -438,22 +449,27 @@ def tool_consult(arg):
 
 # --- CARNET DE NOTES (SIMILAIRE A LA MEMOIRE) ---
 
+NOTE_INDEX = igor_dedup.ShingleIndex()
+
 def tool_note_write(text):
     text = text.strip()
     if not text: return "Note vide."
     
     notes = MEMORY.get('notebook', [])
-    # Analyse similarité
-    for i, old in enumerate(notes):
-        sim = SequenceMatcher(None, old.lower(), text.lower()).ratio()
-        if sim > 0.65:
-            if len(text) > len(old):
-                notes[i] = text
-                save_memory(MEMORY)
-                return f"Note mise à jour : '{text}'."
-            return f"Note déjà existante : '{old}'."
+    # Analyse similarité (quelques candidates seulement, voir igor_dedup)
+    index = NOTE_INDEX.sync(notes)
+    match = index.find_similar(text)
+    if match:
+        i, old = match
+        if len(text) > len(old):
+            notes[i] = text
+            index.replace(i, text)
+            save_memory(MEMORY)
+            return f"Note mise à jour : '{text}'."
+        return f"Note déjà existante : '{old}'."
 
     MEMORY['notebook'].append(text)
+    index.add(text)
     save_memory(MEMORY)
     return f"Ajouté au carnet : {text}"
 
@@ -492,6 +508,9 @@ def tool_delete_note(arg):
     notes = MEMORY.get('notebook', [])
     if not notes: return "Carnet déjà vide."
 
+    # L'index des quasi-doublons suit la suppression (voir tool_note_write)
+    index = NOTE_INDEX.sync(notes)
+
     # Par numéro
     nums = re.findall(r'\d+', arg)
     if nums:
@@ -499,6 +518,7 @@ def tool_delete_note(arg):
             idx = int(nums[0]) - 1
             if 0 <= idx < len(notes):
                 rm = notes.pop(idx)
+                index.remove(idx)
                 save_memory(MEMORY)
                 return f"Note supprimée : {rm}"
         except: pass
@@ -507,6 +527,7 @@ def tool_delete_note(arg):
     for i, note in enumerate(notes):
         if arg in note.lower():
             rm = notes.pop(i)
+            index.remove(i)
             save_memory(MEMORY)
             return f"Note effacée : {rm}"
     return "Note introuvable."
@@ -664,34 +685,17 @@ def classify_audio_with_llm(text_info):
     """Demande à l'IA locale si le titre ressemble à de la musique."""
     print(f"  [AI-AUDIO] Analyse : '{text_info}'", flush=True)
     
-    # Config dynamique
-    backend = MEMORY.get('llm_backend', 'llamacpp')
-    url = MEMORY.get('llm_api_url', "http://localhost:8080/completion")
-    model_name = MEMORY.get('llm_model_name', 'mistral-small')
-
     try:
         prompt = (f"Analyse ce titre : \"{text_info}\". Est-ce de la musique ? "
                   f"Réponds UNIQUEMENT par 'OUI' ou 'NON'.")
         
-        if backend == 'ollama':
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"num_predict": 10, "temperature": 0.0, "stop": ["\n"]}
-            }
+        if igor_llm.hedging_enabled():
+            # Réponse OUI/NON : on couvre la latence de queue avec un 2e backend
+            ans = igor_llm.generate_hedged(prompt, n_predict=10, temperature=0.0, stop=["\n"], timeout=5)
         else:
-            payload = {"prompt": prompt, "n_predict": 10, "temperature": 0.0, "stop": ["\n"]}
-            
-        res = requests.post(url, json=payload, timeout=5)
-        
-        if res.status_code == 200:
-            data = res.json()
-            if backend == 'ollama':
-                ans = data.get('response', '').strip().upper()
-            else:
-                ans = data.get('content', '').strip().upper()
-            return "OUI" in ans or "YES" in ans
+            ans = igor_llm.generate(prompt, n_predict=10, temperature=0.0, stop=["\n"], timeout=5)
+        ans = ans.upper()
+        return "OUI" in ans or "YES" in ans
             
     except: return None
 
@@ -892,10 +896,6 @@ Réponds en français."""
                 
                 # 2. Analyse via LLM Local (Fonction interne)
                 def _analyze_locally(text):
-                    backend = MEMORY.get('llm_backend', 'llamacpp')
-                    url = MEMORY.get('llm_api_url', "http://localhost:8080/completion")
-                    model_name = MEMORY.get('llm_model_name', 'mistral-small')
-                    
                     prompt = f"""Voici une transcription audio : "{text}"
 Tâche :
 1. Résume le sujet.
@@ -903,14 +903,7 @@ Tâche :
 Ne répète pas le texte, analyse-le."""
 
                     try:
-                        if backend == 'ollama':
-                            payload = {"model": model_name, "prompt": prompt, "stream": False, "options": {"num_predict": 150}}
-                            res = requests.post(url, json=payload, timeout=10)
-                            return res.json().get('response', '').strip()
-                        else:
-                            payload = {"prompt": prompt, "n_predict": 150}
-                            res = requests.post(url, json=payload, timeout=10)
-                            return res.json().get('content', '').strip()
+                        return igor_llm.generate(prompt, n_predict=150, timeout=10)
                     except:
                         return "(Analyse IA indisponible)"
 
@@ -956,13 +949,12 @@ def tool_calculate(arg):
 
 # --- RACCOURCIS (HELPERS COMPLEXES) ---
 
+# En base après migration de shortcuts.json, sinon dans le fichier (voir igor_store)
 def load_shortcuts():
-    if not os.path.exists(SHORTCUTS_FILE): return {}
-    try: return json.load(open(SHORTCUTS_FILE))
-    except: return {}
+    return igor_config.STORE.shortcuts()
 
 def save_shortcuts(data):
-    with open(SHORTCUTS_FILE, 'w') as f: json.dump(data, f, indent=4)
+    igor_config.STORE.save_shortcuts(data)
 
 def _get_url_from_playerctl(require_playing=False):
     if not shutil.which("playerctl"): return None
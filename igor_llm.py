@@ -0,0 +1,1081 @@
+# igor_llm.py
+"""
+Client LLM partagé (Llama.cpp Server & Ollama).
+Un seul endroit pour construire les payloads, lire les réponses
+et réutiliser les connexions HTTP (keep-alive) vers chaque backend.
+"""
+import json
+import math
+import collections
+import contextlib
+import time
+import hashlib
+import queue
+import socket
+import threading
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+
+import igor_config
+import igor_log
+
+# --- CONFIGURATION DU POOL ---
+POOL_MAXSIZE = 4          # Connexions simultanées max par backend (brain + résumé + audio)
+DEFAULT_TIMEOUT = 20.0
+
+log = igor_log.get_logger("llm")
+
+# --- CACHE KV DU PRÉFIXE DE PROMPT ---
+DEFAULT_PROMPT_SLOTS = 4     # Slots du llama-server lancé par Igor (-np) : préfixes fréquents épinglés
+DEFAULT_KEEP_ALIVE = "30m"   # Ollama : garde le modèle (et son cache de préfixe) chargé
+
+# Une session requests par backend (scheme://host:port) -> connexions TCP réutilisées
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+class LLMError(Exception):
+    """Erreur de communication avec un backend LLM (HTTP != 200, réponse illisible...)."""
+    pass
+
+
+class LLMCancelled(LLMError):
+    """La requête a été annulée (requête concurrente gagnante, STOP...)."""
+    pass
+
+
+def _pool_key(url):
+    """Clé de pool : on mutualise par serveur, pas par endpoint."""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """Renvoie la session keep-alive associée au serveur de cette URL (créée à la demande)."""
+    key = _pool_key(url)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSIONS[key] = session
+        return session
+
+
+def close_sessions():
+    """Ferme toutes les connexions du pool (arrêt de l'application, changement de config)."""
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            try: session.close()
+            except: pass
+        _SESSIONS.clear()
+
+
+def active_backend():
+    """Descripteur du backend configuré (même format que les entrées de 'llm_instances')."""
+    mem = igor_config.MEMORY
+    return {
+        'type': mem.get('llm_backend', 'llamacpp'),
+        'url': mem.get('llm_api_url', igor_config.LLM_TEXT_API_URL),
+        'model_name': mem.get('llm_model_name', 'mistral-small')
+    }
+
+
+def prompt_slots():
+    """Nombre de slots (-np) demandés au llama-server lancé par Igor."""
+    try:
+        return max(0, int(igor_config.MEMORY.get('llm_slots', DEFAULT_PROMPT_SLOTS)))
+    except (TypeError, ValueError):
+        return DEFAULT_PROMPT_SLOTS
+
+
+# Épinglage id_slot : seulement sur un serveur lancé par Igor, dont on connaît le -np.
+# Un serveur externe peut avoir moins de slots (id_slot invalide -> erreur) ou d'autres clients.
+_LAUNCHED_SLOTS = {}   # serveur (scheme://host:port) -> nombre de slots
+_PREFIX_HITS = collections.Counter()   # clé de préfixe -> appels
+_PREFIX_SLOTS = {}     # clé de préfixe -> slot réservé
+_PREFIX_SLOTS_LOCK = threading.Lock()
+
+
+def register_launched_server(url, slots):
+    """Serveur llama.cpp lancé par Igor avec 'slots' slots parallèles (caches KV vides)."""
+    with _PREFIX_SLOTS_LOCK:
+        _LAUNCHED_SLOTS[_pool_key(url)] = slots
+        _PREFIX_SLOTS.clear()
+
+
+def forget_launched_server(url):
+    with _PREFIX_SLOTS_LOCK:
+        _LAUNCHED_SLOTS.pop(_pool_key(url), None)
+        _PREFIX_SLOTS.clear()
+
+
+def launched_slots(backend):
+    """Slots du serveur de ce backend s'il a été lancé par Igor, sinon 0."""
+    return _LAUNCHED_SLOTS.get(_pool_key(backend.get('url') or ''), 0)
+
+
+def seed_prefix_hits(counts):
+    """Fréquences connues des préfixes (journal des tours) : ordre d'épinglage dès le démarrage."""
+    with _PREFIX_SLOTS_LOCK:
+        _PREFIX_HITS.update(counts)
+
+
+def prefix_slot(backend, prefix_key):
+    """
+    Slot llama.cpp d'un préfixe statique (ex: intention 'ALARM') sur un serveur lancé par Igor.
+    Les préfixes les plus fréquents ont chacun un slot réservé (cache KV conservé d'un tour
+    à l'autre) ; les autres se partagent le dernier slot au lieu d'évincer un préfixe épinglé.
+    Un préfixe ne prend la place du moins fréquent des épinglés qu'une fois deux fois plus
+    demandé que lui (pas de va-et-vient). None : serveur externe ou un seul slot.
+    """
+    slots = launched_slots(backend)
+    if not prefix_key or slots < 2:
+        return None
+    shared = slots - 1
+    with _PREFIX_SLOTS_LOCK:
+        _PREFIX_HITS[prefix_key] += 1
+        slot = _PREFIX_SLOTS.get(prefix_key)
+        if slot is not None:
+            return slot
+        used = set(_PREFIX_SLOTS.values())
+        free = [s for s in range(shared) if s not in used]
+        if free:
+            slot = free[0]
+        else:
+            coldest = min(_PREFIX_SLOTS, key=_PREFIX_HITS.__getitem__)
+            if _PREFIX_HITS[prefix_key] <= 2 * _PREFIX_HITS[coldest]:
+                return shared
+            slot = _PREFIX_SLOTS.pop(coldest)
+        _PREFIX_SLOTS[prefix_key] = slot
+        return slot
+
+
+def build_payload(backend, prompt, n_predict=150, temperature=None, stop=None,
+                  grammar=None, json_mode=False, stream=False, prefix_key=None):
+    """
+    Construit le corps de requête selon le type de backend.
+    - Ollama (/api/generate) : options imbriquées, 'format' optionnel
+      (json_mode=True -> "json", json_mode=dict -> schéma JSON imposé).
+    - Llama.cpp (/completion) : paramètres à plat, grammaire GBNF optionnelle.
+    Les paramètres à None ne sont pas envoyés (valeurs par défaut du serveur).
+    prefix_key : le prompt commence par un bloc statique identifié par cette clé ;
+    on demande au serveur de garder son cache KV pour n'évaluer que la fin.
+    """
+    if backend.get('type') == 'ollama':
+        options = {"num_predict": n_predict}
+        if temperature is not None: options["temperature"] = temperature
+        if stop: options["stop"] = stop
+        payload = {
+            "model": backend.get('model_name'),
+            "prompt": prompt,
+            "stream": stream,
+            "options": options
+        }
+        # Ollama ne gère pas le GBNF : mode JSON natif, ou schéma (sorties structurées)
+        if isinstance(json_mode, dict):
+            payload["format"] = json_mode
+        elif json_mode:
+            payload["format"] = "json"
+        # Ollama réutilise automatiquement le plus long préfixe commun tant que le modèle
+        # reste chargé : on prolonge sa durée de vie pour ne pas perdre ce cache entre deux tours
+        if prefix_key:
+            payload["keep_alive"] = igor_config.MEMORY.get('llm_keep_alive', DEFAULT_KEEP_ALIVE)
+    else:
+        payload = {"prompt": prompt, "n_predict": n_predict}
+        if temperature is not None: payload["temperature"] = temperature
+        if stop: payload["stop"] = stop
+        if grammar:
+            payload["grammar"] = grammar
+        if stream:
+            payload["stream"] = True
+        if prefix_key:
+            payload["cache_prompt"] = True
+            slot = prefix_slot(backend, prefix_key)
+            if slot is not None:
+                payload["id_slot"] = slot
+    return payload
+
+
+def extract_text(backend, data):
+    """Normalise la réponse JSON du serveur en texte brut."""
+    if backend.get('type') == 'ollama':
+        return (data.get('response') or '').strip()
+    return (data.get('content') or '').strip()
+
+
+class JsonCompletionWatcher:
+    """
+    Suit un flux de texte caractère par caractère et signale la fin
+    du premier objet/tableau JSON de niveau supérieur (accolades équilibrées,
+    en ignorant le contenu des chaînes). Le texte avant le premier '{' ou '['
+    est ignoré.
+    """
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.length = 0      # Nombre de caractères déjà analysés
+        self.end = None      # Position (exclusive) de la fin du JSON une fois complet
+
+    def feed(self, chunk):
+        """Analyse un nouveau morceau. Renvoie True dès que le JSON est complet."""
+        if self.end is not None:
+            return True
+        for i, char in enumerate(chunk):
+            if not self.started:
+                if char in "{[":
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escape: self.escape = False
+                elif char == "\\": self.escape = True
+                elif char == '"': self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.length + i + 1
+                    break
+        self.length += len(chunk)
+        return self.end is not None
+
+
+def _parse_stream_line(backend, line):
+    """
+    Décode une ligne du flux. Renvoie (texte, terminé, données JSON ou None).
+    - Llama.cpp : Server-Sent Events 'data: {...}' avec 'content' et 'stop'.
+    - Ollama : NDJSON '{...}' avec 'response' et 'done'.
+    """
+    if not line:
+        return "", False, None
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', errors='replace')
+    line = line.strip()
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if not line or line == "[DONE]":
+        return "", line == "[DONE]", None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return "", False, None
+    if data.get('error'):
+        raise LLMError(f"Erreur serveur (stream) : {data.get('error')}")
+    if backend.get('type') == 'ollama':
+        return data.get('response') or "", bool(data.get('done')), data
+    return data.get('content') or "", bool(data.get('stop')), data
+
+
+class LLMCall:
+    """
+    Poignée sur une requête en cours, annulable depuis un autre thread.
+    L'annulation coupe le socket : la lecture bloquée se termine immédiatement
+    et le serveur, voyant la connexion fermée, arrête de générer.
+    """
+    def __init__(self, label=""):
+        self.label = label
+        self.cancelled = False
+        self._response = None
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self.cancelled
+        if cancelled:
+            _abort_response(response)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+        if response is not None:
+            _abort_response(response)
+
+
+# --- REQUÊTES EN COURS (ANNULATION GLOBALE : BOUTON STOP / "STOP" VOCAL) ---
+_INFLIGHT = set()
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _register(call):
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.add(call)
+
+
+def _unregister(call):
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.discard(call)
+
+
+def inflight_count():
+    with _INFLIGHT_LOCK:
+        return len(_INFLIGHT)
+
+
+def cancel_all():
+    """
+    Annule toutes les générations en cours (appelée par abort_tasks).
+    Les connexions sont coupées : le serveur arrête de générer et redevient
+    disponible pour la commande suivante. Renvoie le nombre de requêtes annulées.
+    """
+    with _INFLIGHT_LOCK:
+        calls = list(_INFLIGHT)
+    for call in calls:
+        call.cancel()
+    return len(calls)
+
+
+# Portées d'annulation : toute requête lancée par un thread à l'intérieur d'un
+# 'with CancelScope()' peut être annulée d'un coup via scope.cancel(), sans toucher aux autres.
+_SCOPES = threading.local()
+
+
+class CancelScope:
+    """Regroupe les requêtes lancées par le thread courant (voir Speculation)."""
+    def __init__(self):
+        self.cancelled = False
+        self._calls = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if not hasattr(_SCOPES, 'stack'):
+            _SCOPES.stack = []
+        _SCOPES.stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _SCOPES.stack.remove(self)
+        return False
+
+    def add(self, call):
+        with self._lock:
+            self._calls.add(call)
+            cancelled = self.cancelled
+        if cancelled:
+            call.cancel()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            calls = list(self._calls)
+        for call in calls:
+            call.cancel()
+
+
+def _current_scopes():
+    return list(getattr(_SCOPES, 'stack', ()))
+
+
+class Speculation:
+    """
+    Exécution spéculative : fn(*args) démarre tout de suite dans un thread,
+    pendant que l'appelant fait autre chose (ex: scoring par mots-clés).
+    result() attend la valeur ; cancel() abandonne et coupe les requêtes LLM lancées par fn.
+    Une spéculation annulée ou en échec renvoie 'default'.
+    """
+    def __init__(self, fn, *args, default=None, label="spéculation"):
+        self.label = label
+        self.default = default
+        self.scope = CancelScope()
+        self._done = threading.Event()
+        self._value = default
+        self._started = time.time()
+        threading.Thread(target=self._run, args=(fn, args), daemon=True).start()
+
+    def _run(self, fn, args):
+        try:
+            with self.scope:
+                value = fn(*args)
+            if not self.scope.cancelled:
+                self._value = value
+        except Exception as e:
+            if not self.scope.cancelled:
+                log.warning("  [LLM] ⚠️ %s en échec : %s", self.label, e)
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        self._done.wait(timeout)
+        return self._value if not self.scope.cancelled else self.default
+
+    def cancel(self):
+        if not self._done.is_set():
+            log.info("  [LLM] ✂️ %s annulée après %.2fs", self.label, time.time() - self._started)
+        self.scope.cancel()
+
+
+def _abort_response(response):
+    """Ferme brutalement la connexion d'une réponse en streaming (débloque un recv() en cours)."""
+    conn = getattr(response.raw, '_connection', None)
+    sock = getattr(conn, 'sock', None) if conn is not None else None
+    if sock is not None:
+        try: sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+    try: response.close()
+    except: pass
+
+
+def iter_tokens(prompt, backend=None, n_predict=150, temperature=None, stop=None,
+                grammar=None, json_mode=False, timeout=DEFAULT_TIMEOUT, call=None, prefix_key=None):
+    """
+    Génération en streaming : produit les morceaux de texte au fil de l'eau.
+    Un flux lu jusqu'au bout rend sa connexion au pool ; quitter la boucle avant la fin
+    ferme la connexion, ce qui interrompt la génération côté serveur. 'call' (LLMCall) permet d'annuler depuis un autre thread ;
+    chaque requête est de plus inscrite au registre vidé par cancel_all().
+    """
+    if backend is None:
+        backend = active_backend()
+    if not backend.get('url'):
+        raise LLMError("URL du backend non configurée")
+
+    payload = build_payload(backend, prompt, n_predict=n_predict, temperature=temperature,
+                            stop=stop, grammar=grammar, json_mode=json_mode, stream=True,
+                            prefix_key=prefix_key)
+    with contextlib.closing(_stream(backend, payload, timeout, call)) as chunks:
+        for piece, _data in chunks:
+            if piece:
+                yield piece
+
+
+def _stream(backend, payload, timeout, call=None):
+    """
+    Envoie une requête en streaming et produit (texte, données JSON) ligne par ligne.
+    La requête est inscrite au registre (cancel_all) et aux portées d'annulation du thread ;
+    lue jusqu'au bout, sa connexion retourne au pool, sinon elle est fermée.
+    """
+    url = backend['url']
+    if call is None:
+        call = LLMCall(label=backend.get('model_name') or url)
+    _register(call)
+    for scope in _current_scopes():
+        scope.add(call)
+    try:
+        if call.cancelled:
+            raise LLMCancelled("Requête annulée")
+        try:
+            res = get_session(url).post(url, json=payload, timeout=timeout, stream=True)
+        except requests.RequestException as e:
+            if call.cancelled:
+                raise LLMCancelled("Requête annulée") from e
+            raise LLMError(str(e)) from e
+        call.attach(res)
+
+        completed = False
+        try:
+            if res.status_code != 200:
+                raise LLMError(f"Erreur {res.status_code} : {res.text[:200]}")
+            lines = res.iter_lines(chunk_size=256)
+            for line in lines:
+                if call.cancelled:
+                    raise LLMCancelled("Requête annulée")
+                piece, done, data = _parse_stream_line(backend, line)
+                if data is not None:
+                    yield piece, data
+                if done:
+                    break
+            # Fin normale : lecture jusqu'au bout du flux, la connexion retourne au pool.
+            # (Une sortie anticipée de l'appelant ou une annulation passe par le finally sans ce drapeau.)
+            for _ in lines:
+                pass
+            completed = True
+        except (requests.RequestException, OSError, ValueError) as e:
+            # Un socket coupé par cancel() remonte ici sous forme d'erreur de lecture
+            if call.cancelled:
+                raise LLMCancelled("Requête annulée") from e
+            raise LLMError(str(e)) from e
+        finally:
+            if not completed:
+                # Corps non lu en entier : la connexion est fermée (le serveur arrête de générer)
+                res.close()
+        if call.cancelled:
+            raise LLMCancelled("Requête annulée")
+    finally:
+        _unregister(call)
+
+
+# --- MESURE DU TEMPS AU PREMIER TOKEN (TTFT) ---
+# Clé (backend, préfixe) -> {"cold": [s], "warm": [s]} : le premier appel d'un préfixe
+# paie l'évaluation complète du prompt, les suivants ne devraient évaluer que la fin.
+# Sans préfixe, la clé est la classe d'appel ('short'/'long', voir call_class).
+TTFT_STATS = {}
+_TTFT_LOCK = threading.Lock()
+TTFT_HISTORY = 50
+
+
+def _ttft_label(backend):
+    # Deux instances du même modèle sur des machines différentes n'ont pas le même TTFT
+    model, url = backend.get('model_name'), backend.get('url')
+    return f"{model} @ {_pool_key(url)}" if model and url else (model or url)
+
+
+def record_ttft(backend, prefix_key, seconds, n_predict=None):
+    key = (_ttft_label(backend), prefix_key or call_class(n_predict))
+    with _TTFT_LOCK:
+        entry = TTFT_STATS.setdefault(key, {"cold": [], "warm": []})
+        phase = "cold" if not entry["cold"] else "warm"
+        entry[phase] = (entry[phase] + [seconds])[-TTFT_HISTORY:]
+    log.debug("  [LLM] ⏱️ TTFT %.2fs (%s, préfixe %s)", seconds, phase, key[1])
+
+
+def ttft_percentile(backend, q, prefix_key=None, n_predict=None, min_samples=10):
+    """Quantile q des TTFT chauds de ce backend (préfixe ou classe d'appel), None si trop peu de mesures."""
+    key = (_ttft_label(backend), prefix_key or call_class(n_predict))
+    with _TTFT_LOCK:
+        entry = TTFT_STATS.get(key)
+        samples = sorted(entry["warm"]) if entry else []
+    if len(samples) < min_samples:
+        return None
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def ttft_report():
+    """Lignes de synthèse TTFT : premier appel (cache froid) vs moyenne des suivants."""
+    lines = []
+    with _TTFT_LOCK:
+        for (label, prefix), entry in sorted(TTFT_STATS.items()):
+            cold = entry["cold"][0] if entry["cold"] else None
+            warm = sum(entry["warm"]) / len(entry["warm"]) if entry["warm"] else None
+            cold_str = f"{cold:.2f}s" if cold is not None else "-"
+            warm_str = f"{warm:.2f}s ({len(entry['warm'])} appels)" if warm is not None else "-"
+            lines.append(f"TTFT {label} [{prefix}] : froid {cold_str} -> chaud {warm_str}")
+    return lines
+
+
+# --- SINGLE-FLIGHT : REQUÊTES IDENTIQUES SIMULTANÉES ---
+# Deux threads (brain, file de tâches, vision...) qui envoient au même moment
+# le même prompt avec les mêmes paramètres partagent une seule génération.
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+SINGLE_FLIGHT_STATS = {"leaders": 0, "shared": 0}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def flight_key(backend, prompt, **params):
+    """Empreinte backend + prompt + paramètres d'échantillonnage."""
+    ident = {
+        'backend': [backend.get('type'), backend.get('url'), backend.get('model_name')],
+        'prompt': prompt,
+        'params': params,
+    }
+    raw = json.dumps(ident, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def single_flight(key, fn):
+    """
+    Exécute fn() une seule fois pour toutes les demandes concurrentes de même clé.
+    Les suivants attendent le résultat (ou l'exception) du premier.
+    Une annulation ne se partage pas : si le premier a été annulé (portée d'une spéculation),
+    un suivant relance la requête à son tour ; un suivant reste lui-même annulable (STOP, portée).
+    Rien n'est mis en cache : une fois la requête terminée, la clé est libérée.
+    """
+    while True:
+        with _FLIGHTS_LOCK:
+            flight = _FLIGHTS.get(key)
+            leader = flight is None
+            if leader:
+                flight = _FLIGHTS[key] = _Flight()
+                SINGLE_FLIGHT_STATS["leaders"] += 1
+            else:
+                SINGLE_FLIGHT_STATS["shared"] += 1
+        if leader:
+            break
+
+        log.info("  [LLM] 🔗 Requête identique déjà en cours, résultat partagé.")
+        _wait_flight(flight)
+        if isinstance(flight.error, LLMCancelled):
+            log.info("  [LLM] 🔁 Requête partagée annulée par son initiateur, relance.")
+            continue
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = fn()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _FLIGHTS_LOCK:
+            _FLIGHTS.pop(key, None)
+        flight.done.set()
+
+
+def _wait_flight(flight, poll=0.05):
+    """Attente d'un suivant, inscrite au registre et aux portées comme une requête (LLMCancelled)."""
+    call = LLMCall(label="requête partagée")
+    _register(call)
+    for scope in _current_scopes():
+        scope.add(call)
+    try:
+        while not flight.done.wait(poll) and not call.cancelled:
+            pass
+        if call.cancelled:
+            raise LLMCancelled("Requête annulée")
+    finally:
+        _unregister(call)
+
+
+def generate(prompt, backend=None, n_predict=150, temperature=None, stop=None,
+             grammar=None, json_mode=False, timeout=DEFAULT_TIMEOUT, stop_on_json=False,
+             prefix_key=None):
+    """
+    Appel de génération unique sur un backend (actif par défaut).
+    Renvoie le texte généré, lève LLMError en cas d'échec (LLMCancelled si STOP).
+    Toujours en streaming : une requête annulée coupe sa connexion au lieu
+    d'attendre en silence la fin de la génération côté serveur.
+    stop_on_json : coupe la requête dès qu'un objet ou tableau JSON complet
+    a été émis (la fin de génération n'est pas attendue).
+    prefix_key : réutilisation du cache KV du préfixe statique (voir build_payload).
+    Les appels identiques simultanés sont fusionnés (voir single_flight).
+    """
+    if backend is None:
+        backend = active_backend()
+
+    key = flight_key(backend, prompt, n_predict=n_predict, temperature=temperature, stop=stop,
+                     grammar=grammar, json_mode=json_mode, stop_on_json=stop_on_json)
+    return single_flight(key, lambda: _generate(prompt, backend, n_predict, temperature, stop, grammar,
+                                                json_mode, timeout, stop_on_json, prefix_key))
+
+
+def _generate(prompt, backend, n_predict, temperature, stop, grammar, json_mode, timeout,
+              stop_on_json, prefix_key):
+    watcher = JsonCompletionWatcher() if stop_on_json else None
+    parts = []
+    started = time.time()
+    for piece in iter_tokens(prompt, backend=backend, n_predict=n_predict, temperature=temperature,
+                             stop=stop, grammar=grammar, json_mode=json_mode, timeout=timeout,
+                             prefix_key=prefix_key):
+        if not parts:
+            record_ttft(backend, prefix_key, time.time() - started, n_predict)
+        parts.append(piece)
+        if watcher is not None and watcher.feed(piece):
+            break
+    text = "".join(parts)
+    if watcher is not None and watcher.end is not None:
+        text = text[:watcher.end]
+    return text.strip()
+
+
+# --- SCORE D'ÉTIQUETTES (UN SEUL TOKEN ÉVALUÉ) ---
+
+def _token_probs(data):
+    """
+    Distribution du premier token généré, {texte du token: probabilité}.
+    Gère les deux formats de llama-server : 'probs'/'tok_str'/'prob' (ancien)
+    et 'top_logprobs'/'token'/'logprob' (récent).
+    """
+    entries = data.get('completion_probabilities') or []
+    if not entries:
+        return {}
+    first = entries[0]
+    probs = {}
+    if 'probs' in first:
+        for p in first['probs']:
+            probs[p.get('tok_str', '')] = float(p.get('prob', 0.0))
+    else:
+        for p in first.get('top_logprobs') or []:
+            probs[p.get('token', '')] = math.exp(float(p.get('logprob', -1e9)))
+    return probs
+
+
+def label_probabilities(prompt, codes, backend=None, timeout=DEFAULT_TIMEOUT, prefix_key=None):
+    """
+    Évalue UN token contraint à l'un des 'codes' (chaînes d'un caractère) et renvoie
+    la distribution renormalisée {code: probabilité} lue dans les n_probs du serveur.
+    Llama.cpp uniquement (Ollama n'expose pas les probabilités) : renvoie {} sinon.
+    Lève LLMError en cas d'échec réseau, LLMCancelled si la requête est annulée (STOP, portée).
+    """
+    if backend is None:
+        backend = active_backend()
+    if backend.get('type') == 'ollama' or not backend.get('url'):
+        return {}
+
+    grammar = "root ::= " + " | ".join(f'"{c}"' for c in codes)
+    payload = build_payload(backend, prompt, n_predict=1, temperature=0.0, grammar=grammar,
+                            stream=True, prefix_key=prefix_key)
+    # Assez de candidats pour retrouver tous les codes même si d'autres tokens dominent
+    payload["n_probs"] = len(codes) + 10
+    # Même chemin que iter_tokens : requête annulable par STOP (cancel_all) et par les portées
+    content, token_probs = [], {}
+    for piece, data in _stream(backend, payload, timeout):
+        content.append(piece)
+        token_probs = token_probs or _token_probs(data)
+
+    # Les variantes " A" / "A" d'un même code sont cumulées
+    scores = {c: 0.0 for c in codes}
+    for token, prob in token_probs.items():
+        token = token.strip()
+        if token in scores:
+            scores[token] += prob
+    total = sum(scores.values())
+    if total <= 0:
+        # Pas de probabilités exploitables : on se rabat sur le token choisi
+        chosen = "".join(content).strip()
+        return {chosen: 1.0} if chosen in scores else {}
+    return {c: p / total for c, p in scores.items()}
+
+
+# --- ROUTAGE MULTI-INSTANCES (SANTÉ + CIRCUIT BREAKER) ---
+SHORT_CALL_TOKENS = 16   # n_predict <= : appel court (lettre d'intention, mot de classement)
+
+
+def call_class(n_predict):
+    """Classe d'appel des latences : une réponse d'un token et un JSON de 300 ne se comparent pas."""
+    return "short" if n_predict is not None and n_predict <= SHORT_CALL_TOKENS else "long"
+
+
+class BackendHealth:
+    """État de santé d'une instance LLM (moyennes mobiles exponentielles + disjoncteur)."""
+    CLOSED = "closed"        # Normal
+    OPEN = "open"            # Écarté après des échecs répétés
+    HALF_OPEN = "half_open"  # La sonde a répondu : une requête réelle est autorisée pour confirmer
+
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.latency = {}          # Classe d'appel ('short'/'long') -> latence EWMA en secondes
+        self.error_ewma = 0.0      # Taux d'erreur lissé (0.0 -> 1.0)
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self.open_duration = 0.0
+        self.backend = None        # Dernier descripteur vu (pour les sondes)
+
+
+class LLMRouter:
+    """
+    Choisit l'ordre des backends à essayer pour chaque appel.
+    - Latence (par classe d'appel, voir call_class) et taux d'erreur suivis par EWMA pour chaque instance.
+    - Disjoncteur : après N échecs consécutifs l'instance est écartée,
+      puis sondée en tâche de fond (GET /health ou /) jusqu'à ce qu'elle réponde.
+    - La config active et les instances déjà mesurées sont triées par latence attendue ;
+      les instances jamais utilisées viennent après, dans l'ordre de la configuration.
+    L'état est purement en mémoire : memory.json n'est jamais réécrit lors d'une bascule.
+    """
+    ALPHA = 0.3                 # Poids de la dernière mesure dans les EWMA
+    FAILURE_THRESHOLD = 3       # Échecs consécutifs avant ouverture du circuit
+    OPEN_SECONDS = 30.0         # Première mise à l'écart
+    MAX_OPEN_SECONDS = 600.0    # Plafond du backoff exponentiel
+    PROBE_INTERVAL = 5.0        # Période de la boucle de sondes
+    PROBE_TIMEOUT = 2.0
+    CONNECT_TIMEOUT = 3.0       # Un serveur qui ne répond pas au connect est éliminé vite
+    MIN_READ_TIMEOUT = 30.0     # Plancher du timeout adaptatif
+    TIMEOUT_FACTOR = 4.0        # Timeout adaptatif = facteur x latence moyenne
+
+    def __init__(self):
+        self._health = {}
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self.last_backend = None   # Dernier backend ayant répondu (affichage UI)
+
+    @staticmethod
+    def backend_key(backend):
+        return backend.get('id') or f"{backend.get('url')}|{backend.get('model_name') or ''}"
+
+    def _get(self, backend):
+        key = self.backend_key(backend)
+        h = self._health.get(key)
+        if h is None:
+            label = backend.get('model_name') or backend.get('name') or backend.get('url')
+            h = BackendHealth(key, label)
+            self._health[key] = h
+        h.backend = backend
+        return h
+
+    def configured_backends(self):
+        """Config active (prioritaire) + instances activées, sans doublon."""
+        current = active_backend()
+        current['is_current'] = True
+        backends = [current]
+        for inst in igor_config.MEMORY.get('llm_instances', []):
+            if not inst.get('enabled', True):
+                continue
+            # On évite d'ajouter le doublon de la config actuelle
+            if inst.get('url') == current['url'] and inst.get('model_name') == current['model_name']:
+                continue
+            inst_copy = inst.copy()
+            inst_copy['is_current'] = False
+            backends.append(inst_copy)
+        return backends
+
+    @staticmethod
+    def latency_for(h, cls):
+        """Latence lissée de cette classe d'appel, à défaut celle de l'autre classe, sinon None."""
+        if cls in h.latency:
+            return h.latency[cls]
+        return next(iter(h.latency.values()), None)
+
+    def expected_latency(self, h, cls):
+        # Config active sans historique : elle passe en tête, c'est le choix de l'utilisateur
+        latency = self.latency_for(h, cls) or 0.0
+        # Un backend qui échoue souvent coûte un essai raté en plus : on pénalise
+        return latency / max(1.0 - h.error_ewma, 0.05)
+
+    def candidates(self, n_predict=None):
+        """
+        Liste ordonnée des backends à essayer pour un appel de n_predict tokens
+        (circuits ouverts exclus sauf en dernier recours, instances jamais utilisées après les autres).
+        """
+        now = time.time()
+        cls = call_class(n_predict)
+        backends = self.configured_backends()
+        with self._lock:
+            ranked, untried, blocked = [], [], []
+            for order, backend in enumerate(backends):
+                h = self._get(backend)
+                if h.state == BackendHealth.OPEN and now < h.open_until:
+                    blocked.append((h.open_until, order, backend))
+                elif not h.latency and not backend.get('is_current'):
+                    untried.append((order, backend))
+                else:
+                    ranked.append((self.expected_latency(h, cls), order, backend))
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        blocked.sort(key=lambda item: (item[0], item[1]))
+        # Si tout est ouvert, on tente quand même (le moins récemment écarté d'abord)
+        return [b for _, _, b in ranked] + [b for _, b in untried] + [b for _, _, b in blocked]
+
+    def timeout_for(self, backend, base_timeout, n_predict=None):
+        """Timeout (connect, read) adaptatif : borné par l'historique de latence de l'instance."""
+        with self._lock:
+            h = self._get(backend)
+            read_timeout = base_timeout
+            latency = self.latency_for(h, call_class(n_predict))
+            if latency is not None:
+                read_timeout = min(base_timeout, max(self.MIN_READ_TIMEOUT, latency * self.TIMEOUT_FACTOR))
+        return (self.CONNECT_TIMEOUT, read_timeout)
+
+    def record_success(self, backend, latency, n_predict=None):
+        cls = call_class(n_predict)
+        with self._lock:
+            h = self._get(backend)
+            previous = h.latency.get(cls)
+            h.latency[cls] = latency if previous is None else \
+                (1 - self.ALPHA) * previous + self.ALPHA * latency
+            h.error_ewma = (1 - self.ALPHA) * h.error_ewma
+            h.consecutive_failures = 0
+            if h.state != BackendHealth.CLOSED:
+                log.info("  [LLM-ROUTER] ✅ Circuit refermé : %s", h.label)
+            h.state = BackendHealth.CLOSED
+            h.open_duration = 0.0
+            self.last_backend = backend
+
+    def record_failure(self, backend):
+        with self._lock:
+            h = self._get(backend)
+            h.error_ewma = (1 - self.ALPHA) * h.error_ewma + self.ALPHA
+            h.consecutive_failures += 1
+            if h.state == BackendHealth.HALF_OPEN or h.consecutive_failures >= self.FAILURE_THRESHOLD:
+                self._open(h)
+        self._ensure_prober()
+
+    def _open(self, h):
+        h.open_duration = min(self.MAX_OPEN_SECONDS, h.open_duration * 2 or self.OPEN_SECONDS)
+        h.open_until = time.time() + h.open_duration
+        if h.state != BackendHealth.OPEN:
+            log.warning("  [LLM-ROUTER] ⛔ Circuit ouvert (%s échecs) : %s", h.consecutive_failures, h.label)
+        h.state = BackendHealth.OPEN
+
+    def _ensure_prober(self):
+        if self._probe_thread and self._probe_thread.is_alive():
+            return
+        self._probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        """Sonde les instances écartées ; s'arrête quand tous les circuits sont refermés."""
+        while True:
+            time.sleep(self.PROBE_INTERVAL)
+            with self._lock:
+                due = [h for h in self._health.values()
+                       if h.state == BackendHealth.OPEN and time.time() >= h.open_until]
+                pending = any(h.state != BackendHealth.CLOSED for h in self._health.values())
+            if not pending:
+                return
+            for h in due:
+                ok = probe_backend(h.backend)
+                with self._lock:
+                    if h.state != BackendHealth.OPEN:
+                        continue
+                    if ok:
+                        h.state = BackendHealth.HALF_OPEN
+                        log.info("  [LLM-ROUTER] 🩺 Sonde OK, essai autorisé : %s", h.label)
+                    else:
+                        self._open(h)
+
+    def snapshot(self):
+        """État lisible des instances (debug / statistiques)."""
+        with self._lock:
+            return [{
+                "backend": h.label,
+                "state": h.state,
+                "latency_ewma": {cls: round(value, 2) for cls, value in h.latency.items()},
+                "error_ewma": round(h.error_ewma, 2),
+                "failures": h.consecutive_failures
+            } for h in self._health.values()]
+
+
+def probe_backend(backend, timeout=LLMRouter.PROBE_TIMEOUT):
+    """Sonde légère : /health pour Llama.cpp (200 une fois le modèle chargé), / pour Ollama."""
+    if not backend or not backend.get('url'):
+        return False
+    base = _pool_key(backend['url'])
+    path = "/" if backend.get('type') == 'ollama' else "/health"
+    try:
+        res = get_session(backend['url']).get(base + path, timeout=timeout)
+        return res.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+ROUTER = LLMRouter()
+
+
+def status_lines():
+    """Synthèse pour l'outil STATUS : santé des instances, TTFT froid/chaud, requêtes fusionnées."""
+    lines = []
+    for h in ROUTER.snapshot():
+        latency = ", ".join(f"{cls} {value:.2f}s" for cls, value in sorted(h['latency_ewma'].items())) or "-"
+        lines.append(f"Backend {h['backend']} : {h['state']} | latence {latency} | erreurs {h['error_ewma']}")
+    lines.extend(ttft_report())
+    lines.append(f"Requêtes fusionnées : {SINGLE_FLIGHT_STATS['shared']} "
+                 f"(pour {SINGLE_FLIGHT_STATS['leaders']} générations)")
+    return lines
+
+
+# --- REQUÊTES COUVERTES (HEDGING) ---
+
+HEDGE_PERCENTILE = 0.9       # Délai = p90 du TTFT observé sur le backend principal
+HEDGE_DEFAULT_DELAY = 1.0    # Tant que ce backend n'a pas assez de mesures de TTFT
+HEDGE_MIN_DELAY = 0.1        # Un p90 minuscule doublerait presque chaque requête
+
+
+def hedging_enabled():
+    """Mode opt-in ('llm_hedging' dans memory.json)."""
+    return bool(igor_config.MEMORY.get('llm_hedging', False))
+
+
+def hedge_delay_for(backend, n_predict=10):
+    """
+    Secondes sans premier token avant de solliciter un 2e backend.
+    'llm_hedge_delay' (memory.json) force une valeur fixe ; sinon p90 du TTFT
+    de ce backend pour cette classe d'appel : seule la queue lente est couverte.
+    """
+    configured = igor_config.MEMORY.get('llm_hedge_delay')
+    if configured is not None:
+        return float(configured)
+    p90 = ttft_percentile(backend, HEDGE_PERCENTILE, n_predict=n_predict)
+    if p90 is None:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, p90)
+
+
+def generate_hedged(prompt, backends=None, hedge_delay=None, n_predict=10, temperature=0.0,
+                    stop=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Requête couverte pour les prompts très courts (classification 1 mot, OUI/NON).
+    Envoie au meilleur backend ; si aucun premier token n'arrive sous 'hedge_delay'
+    (par défaut hedge_delay_for), envoie la même requête au second. La première réponse complète gagne, l'autre est annulée.
+    Renvoie le texte, lève LLMError si tous les backends échouent.
+    """
+    if backends is None:
+        backends = ROUTER.candidates(n_predict)
+    backends = [b for b in backends if b.get('url')][:2]
+    if not backends:
+        raise LLMError("Aucun backend configuré")
+    if hedge_delay is None:
+        hedge_delay = hedge_delay_for(backends[0], n_predict)
+
+    key = flight_key({'type': 'hedge', 'url': [b.get('url') for b in backends]}, prompt,
+                     n_predict=n_predict, temperature=temperature, stop=stop)
+    return single_flight(key, lambda: _generate_hedged(prompt, backends, hedge_delay, n_predict,
+                                                       temperature, stop, timeout))
+
+
+def _generate_hedged(prompt, backends, hedge_delay, n_predict, temperature, stop, timeout):
+
+    results = queue.Queue()
+    calls = []
+
+    def _worker(backend, call, first_token):
+        started = time.time()
+        try:
+            parts = []
+            for piece in iter_tokens(prompt, backend=backend, n_predict=n_predict, temperature=temperature,
+                                     stop=stop, timeout=ROUTER.timeout_for(backend, timeout, n_predict), call=call):
+                if not parts:
+                    first_token.set()
+                    record_ttft(backend, None, time.time() - started, n_predict)
+                parts.append(piece)
+            results.put((backend, "".join(parts).strip(), None, time.time() - started))
+        except Exception as e:
+            first_token.set()
+            results.put((backend, None, e, time.time() - started))
+
+    def _launch(backend):
+        call = LLMCall(label=backend.get('model_name') or backend.get('url'))
+        first_token = threading.Event()
+        calls.append(call)
+        # Les workers tournent dans leurs propres threads : on rattache l'appel aux portées de l'appelant
+        for scope in _current_scopes():
+            scope.add(call)
+        threading.Thread(target=_worker, args=(backend, call, first_token), daemon=True).start()
+        return first_token
+
+    first_token = _launch(backends[0])
+    launched = 1
+    # Le second backend n'est sollicité que si le premier tarde à produire son premier token
+    if len(backends) > 1 and not first_token.wait(hedge_delay):
+        log.info("  [LLM-HEDGE] ⏱️ Pas de token après %.2fs, requête couverte sur : %s",
+                 hedge_delay, backends[1].get('model_name') or backends[1].get('url'))
+        _launch(backends[1])
+        launched = 2
+
+    last_error = None
+    for received in range(launched + 1):
+        try:
+            backend, text, error, latency = results.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if error is None:
+            for call in calls:
+                call.cancel()
+            ROUTER.record_success(backend, latency, n_predict)
+            return text
+        if not isinstance(error, LLMCancelled):
+            ROUTER.record_failure(backend)
+        last_error = error
+        # Le premier a échoué avant le délai : on tente le second sans attendre
+        if launched == 1 and len(backends) > 1:
+            _launch(backends[1])
+            launched = 2
+        elif received + 1 >= launched:
+            break
+
+    for call in calls:
+        call.cancel()
+    # Avant une victoire, seul cancel_all() (STOP) peut annuler nos requêtes
+    if isinstance(last_error, LLMCancelled):
+        raise LLMCancelled("Requête couverte annulée")
+    raise LLMError(f"Requête couverte en échec : {last_error}")
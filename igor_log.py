@@ -0,0 +1,153 @@
+# igor_log.py
+"""
+Journalisation partagée par les modules igor_*.
+- Un logger par sous-système ("brain", "llm", "vision", ...) avec son propre niveau
+  (clé 'log_levels' de memory.json, ex: {"brain": "DEBUG"}).
+- Formatage paresseux : log.debug("... %s", x) ne formate rien si le niveau est coupé.
+- Écriture console dans un thread dédié (QueueHandler -> QueueListener) :
+  les chemins critiques ne bloquent plus sur le terminal ou le pipe.
+- Tampon circulaire des derniers messages, vidable après coup (dump_recent).
+Aucune dépendance vers les autres modules igor_* (importable partout, même wake_detector).
+"""
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from collections import deque
+
+ROOT_NAME = "igor"
+DEFAULT_LEVEL = logging.INFO
+RING_SIZE = 2000
+CRASH_DUMP_FILE = "/tmp/igor_crash.log"
+
+_SETUP_LOCK = threading.Lock()
+_LISTENER = None
+_RING = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Garde les N derniers messages formatés en mémoire (post-mortem)."""
+    def __init__(self, capacity=RING_SIZE):
+        super().__init__()
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def _setup():
+    """Installe la file, le thread d'écriture et le tampon (une seule fois)."""
+    global _LISTENER, _RING
+    with _SETUP_LOCK:
+        if _LISTENER is not None:
+            return
+        root = logging.getLogger(ROOT_NAME)
+        root.setLevel(DEFAULT_LEVEL)
+        root.propagate = False
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        # Même rendu que les anciens print() : le message seul, préfixe "[SOUS-SYSTÈME]" compris
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter("%(message)s"))
+
+        _RING = RingBufferHandler()
+        _RING.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s | %(message)s"))
+
+        _LISTENER = logging.handlers.QueueListener(log_queue, console, _RING, respect_handler_level=True)
+        _LISTENER.start()
+        atexit.register(shutdown)
+
+
+def get_logger(subsystem):
+    """Logger d'un sous-système (ex: get_logger("brain") -> 'igor.brain')."""
+    _setup()
+    return logging.getLogger(f"{ROOT_NAME}.{subsystem}")
+
+
+def set_level(subsystem, level):
+    """Change le niveau d'un sous-système ("DEBUG", "INFO", logging.WARNING...)."""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            return
+    name = ROOT_NAME if subsystem in (None, "", "*") else f"{ROOT_NAME}.{subsystem}"
+    logging.getLogger(name).setLevel(level)
+
+
+def configure(levels):
+    """Applique un dict {sous-système: niveau} ('*' = niveau par défaut de tous)."""
+    _setup()
+    for subsystem, level in (levels or {}).items():
+        set_level(subsystem, level)
+
+
+def recent(n=None):
+    """Derniers messages du tampon circulaire (les plus anciens d'abord)."""
+    if _RING is None:
+        return []
+    lines = list(_RING.buffer)
+    return lines[-n:] if n else lines
+
+
+def dump_recent(path=CRASH_DUMP_FILE, n=None):
+    """Écrit le tampon circulaire dans un fichier. Renvoie le chemin, ou None en cas d'échec."""
+    flush()
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(recent(n)) + "\n")
+        return path
+    except OSError:
+        return None
+
+
+def flush():
+    """Attend que le thread d'écriture ait vidé la file (avant un dump ou à l'arrêt)."""
+    with _SETUP_LOCK:
+        listener = _LISTENER
+        if listener is None:
+            return
+        listener.stop()
+        listener.start()
+
+
+def shutdown():
+    global _LISTENER
+    with _SETUP_LOCK:
+        if _LISTENER is not None:
+            _LISTENER.stop()
+            _LISTENER = None
+
+
+def _record_crash(message, exc_info):
+    """Trace l'exception dans le tampon seulement : le hook précédent l'affiche déjà sur la console."""
+    flush()
+    if _RING is not None:
+        logger = get_logger("crash")
+        _RING.handle(logger.makeRecord(logger.name, logging.CRITICAL, __file__, 0, message, (), exc_info))
+
+
+def install_crash_dump(path=CRASH_DUMP_FILE):
+    """Vide le tampon circulaire dans 'path' sur toute exception non rattrapée (thread principal ou non)."""
+    previous_hook = sys.excepthook
+    previous_thread_hook = threading.excepthook
+
+    def _hook(exc_type, exc, tb):
+        _record_crash("Exception non rattrapée", (exc_type, exc, tb))
+        dump_recent(path)
+        previous_hook(exc_type, exc, tb)
+
+    def _thread_hook(args):
+        _record_crash(f"Exception non rattrapée (thread {args.thread.name if args.thread else '?'})",
+                      (args.exc_type, args.exc_value, args.exc_traceback))
+        dump_recent(path)
+        previous_thread_hook(args)
+
+    sys.excepthook = _hook
+    threading.excepthook = _thread_hook
@@ -0,0 +1,157 @@
+# igor_phonetic.py
+"""
+Rapprochement phonétique et approché des transcriptions vocales avec les vocabulaires.
+La reconnaissance vocale écorche les noms d'applis et les verbes ("fire fox",
+"calcul a trice") : les intersections exactes ratent et la requête part au LLM.
+- phonetic_key : clé phonétique française (variante Soundex/Métaphone simplifiée),
+  insensible aux accents, lettres muettes, doubles lettres et espaces.
+- bounded_levenshtein : distance d'édition avec abandon dès que la borne est dépassée.
+- PhoneticIndex : clé -> mots du vocabulaire, recherche exacte par clé puis approchée
+  (distance <= 1) via les variantes à une lettre supprimée (pas de parcours du vocabulaire),
+  sur des groupes de 1 à 3 mots accolés.
+- Garde-fous : une clé courte ("lent" et "lance" -> "l@") ne rapproche rien, et l'orthographe
+  transcrite doit rester proche du mot du vocabulaire ; sinon seule l'orthographe identique
+  (aux espaces près : "fire fox") est acceptée.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+MAX_JOIN = 3          # "calcul a trice" : jusqu'à 3 mots recollés
+MIN_FUZZY_LEN = 5     # En dessous, une distance de 1 confond trop de mots courts
+MIN_KEY_LEN = 4       # Clé plus courte : trop de mots sonnent pareil (lent/lance, monde/monte)
+SPELLING_RATIO = 3    # Écart d'orthographe toléré : 1 lettre sur 3 du mot du vocabulaire
+
+# Règles appliquées dans l'ordre (texte sans accents, minuscules, sans espaces)
+_RULES = [
+    (r"ph", "f"), (r"qu", "k"), (r"q", "k"), (r"ck", "k"),
+    (r"c(?=[eiy])", "s"), (r"c", "k"),
+    (r"gu(?=[eiy])", "g"), (r"g(?=[eiy])", "j"), (r"ge(?=[ao])", "j"),
+    (r"sch", "ch"), (r"sh", "ch"),
+    (r"(?<![cs])h", ""),
+    (r"w", "v"), (r"y", "i"), (r"x", "ks"), (r"z", "s"),
+    (r"eaux?", "o"), (r"au", "o"),
+    (r"ai|ei|et$|er$|ez$", "e"),
+    (r"[ae][nm](?![aeiou])", "@"),
+    (r"o[nm](?![aeiou])", "O"),
+    (r"[aeiou]n(?![aeiou])", "1"),
+    (r"ou", "u"),
+    (r"(?<=[aeiou])s(?=[aeiou])", "z"),
+]
+_COMPILED = [(re.compile(p), r) for p, r in _RULES]
+_MUTE_FINAL = re.compile(r"(?<=.)[estdxp]+$")
+
+
+def _strip(text):
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]", "", text)
+
+
+@lru_cache(maxsize=4096)
+def phonetic_key(text):
+    """Clé phonétique d'un mot ou d'un groupe de mots ("Fire Fox" == "firefox")."""
+    key = _strip(text)
+    if not key:
+        return ""
+    for pattern, repl in _COMPILED:
+        key = pattern.sub(repl, key)
+    # Lettres finales muettes, puis doubles lettres
+    key = _MUTE_FINAL.sub("", key) or key
+    return re.sub(r"(.)\1+", r"\1", key)
+
+
+def bounded_levenshtein(a, b, max_dist):
+    """Distance d'édition de a à b, ou max_dist + 1 dès qu'elle dépasse la borne."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if a == b:
+        return 0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > max_dist:
+            return max_dist + 1
+        previous = current
+    return previous[-1] if previous[-1] <= max_dist else max_dist + 1
+
+
+def spelling_close(spelled, word):
+    """L'orthographe transcrite (sans accents ni espaces) reste proche de celle du mot."""
+    target = _strip(word)
+    limit = max(1, len(target) // SPELLING_RATIO)
+    return bounded_levenshtein(spelled, target, limit) <= limit
+
+
+def _deletions(key):
+    """La clé et ses variantes privées d'une lettre (voisinage de distance 1)."""
+    return {key} | {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+class PhoneticIndex:
+    """Mots d'un vocabulaire indexés par clé phonétique (et par variantes de clé)."""
+
+    def __init__(self, words):
+        self.by_key = {}
+        for word in words:
+            key = phonetic_key(word)
+            if key:
+                self.by_key.setdefault(key, set()).add(word)
+        # Deux clés à distance 1 partagent au moins une variante à une lettre supprimée
+        self.by_deletion = {}
+        for key in self.by_key:
+            if len(key) >= MIN_FUZZY_LEN - 1:
+                for variant in _deletions(key):
+                    self.by_deletion.setdefault(variant, set()).add(key)
+
+    def lookup(self, text, max_dist=1):
+        """
+        Mots du vocabulaire qui sonnent comme text (clé identique, sinon à distance <= max_dist)
+        et s'écrivent presque pareil. Clé trop courte : orthographe identique seulement.
+        """
+        key = phonetic_key(text)
+        if not key:
+            return set()
+        spelled = _strip(text)
+        exact = self.by_key.get(key, set())
+        if len(key) < MIN_KEY_LEN:
+            return {word for word in exact if _strip(word) == spelled}
+        found = {word for word in exact if spelling_close(spelled, word)}
+        if found or len(key) < MIN_FUZZY_LEN or max_dist <= 0:
+            return found
+        candidates = set()
+        for variant in _deletions(key):
+            candidates |= self.by_deletion.get(variant, set())
+        for candidate in candidates:
+            if bounded_levenshtein(key, candidate, max_dist) <= max_dist:
+                found |= {word for word in self.by_key[candidate] if spelling_close(spelled, word)}
+        return found
+
+    def best(self, text, max_dist=1):
+        """Le mot le plus proche (distance puis ordre alphabétique), ou None."""
+        key = phonetic_key(text)
+        matches = self.lookup(text, max_dist)
+        if not matches:
+            return None
+        return min(matches, key=lambda w: (bounded_levenshtein(key, phonetic_key(w), max_dist), w))
+
+    def match_tokens(self, tokens, skip=(), max_dist=1):
+        """
+        Mots du vocabulaire reconnus dans une suite de mots transcrits, en essayant
+        les groupes de 1 à MAX_JOIN mots accolés ("fire fox" -> firefox).
+        skip : mots à ne jamais corriger seuls (mots vides, mots déjà connus, mots courants).
+        """
+        found = set()
+        for size in range(1, MAX_JOIN + 1):
+            for i in range(len(tokens) - size + 1):
+                group = tokens[i:i + size]
+                # Un groupe ne vaut la peine que s'il contient un mot inconnu
+                if all(t in skip for t in group) or (size == 1 and len(group[0]) < 4):
+                    continue
+                found |= self.lookup("".join(group), max_dist)
+        return found
@@ -1,6 +1,13 @@
 # igor_skills.py
 import re
 import os
+import igor_cache
+import igor_config
+import igor_llm
+import igor_log
+from igor_intent_cache import normalize_utterance
+
+log = igor_log.get_logger("skills")
 
 # --- 1. IMPORT DE LA CONFIGURATION ET DE L'ETAT GLOBAL ---
 from igor_config import (
@@ -67,6 +74,7 @@ from igor_vision import (
 # --- 4. IMPORT DU SAVOIR (Web, Wiki, Notes, Alarmes, Audio) ---
 from igor_knowledge import (
     tool_search_web, 
+    log_cached_search,
     tool_weather, 
     tool_time, 
     tool_learn, 
@@ -158,6 +166,17 @@ def tool_check_context(arg):
     if current_project:
         system_lines.append(f"📂 **Projet actif** : {current_project}")
     
+    # === 6. CACHES (hits / misses / évictions) ===
+    cache_lines = []
+    for c in igor_cache.all_stats():
+        size = f"{c['entries']}/{c['maxsize']}" if c['maxsize'] else f"{c['entries']}"
+        cache_lines.append(f"⚡ **{c['name'].capitalize()}** : {size} entrées, "
+                           f"{c['hits']} hits, {c['misses']} misses ({c['hit_rate']*100:.0f}%), "
+                           f"{c['evictions']} évictions, {c['expirations']} expirées")
+
+    # === 7. LLM (instances, temps au premier token, requêtes fusionnées) ===
+    llm_lines = [f"🤖 {line}" for line in igor_llm.status_lines()]
+
     # === ASSEMBLAGE FINAL ===
     sections = [
         "📊 **Statut Agent**",
@@ -174,6 +193,10 @@ def tool_check_context(arg):
         "**🔧 Système**",
         *system_lines
     ]
+    if cache_lines:
+        sections += ["", "**⚡ Caches**", *cache_lines]
+    if llm_lines:
+        sections += ["", "**🤖 LLM**", *llm_lines]
     
     return "\n".join(sections)
 
@@ -379,4 +402,52 @@ TOOLS = {
     "VOLUME": tool_set_volume,
     "MEDIA": tool_media_control,
     "MUSIC_CHECK": tool_music_checkup
-}
\ No newline at end of file
+}
+# --- 7. CACHE DES OUTILS EN LECTURE SEULE ---
+# Outil -> (durée de vie en secondes, version). Durée None : pas d'expiration,
+# l'entrée tient tant que la version (ex. date des fichiers lus) ne change pas.
+TOOL_CACHE_FILE = "tool_cache.json"
+
+def knowledge_version():
+    """Nombre et date la plus récente des fichiers de KNOWLEDGE_DIR."""
+    try:
+        mtimes = [e.stat().st_mtime for e in os.scandir(KNOWLEDGE_DIR) if e.name.endswith(".txt")]
+    except OSError:
+        return "absent"
+    return f"{len(mtimes)}:{max(mtimes, default=0):.0f}"
+
+CACHEABLE_TOOLS = {
+    "WEATHER": (15 * 60, None),
+    "SEARCH": (3600, None),
+    "SYSTEM_STATS": (60, None),
+    "LOCALKNOWLEDGE": (None, knowledge_version),
+}
+TOOL_CACHE = igor_cache.TTLCache("outils", maxsize=200, path=TOOL_CACHE_FILE)
+
+# Réponses d'échec ou d'attente de précision : jamais resservies
+_NOT_CACHEABLE = re.compile(r"^(Erreur|Recherche impossible|Rien trouvé|Je n'ai rien trouvé|Ambiguïté)")
+
+def tool_cache_key(tool_name, args, version=None):
+    key = f"{tool_name}|{normalize_utterance(str(args), ())}"
+    return f"{key}|{version()}" if version else key
+
+def run_tool(tool_name, args):
+    """Exécute un outil de TOOLS ; un outil de CACHEABLE_TOOLS ressert un résultat encore valide."""
+    spec = CACHEABLE_TOOLS.get(tool_name)
+    if spec is None:
+        return TOOLS[tool_name](args)
+    ttl, version = spec
+    res = TOOL_CACHE.get(tool_cache_key(tool_name, args, version))
+    if res is not None:
+        log.info("  [CACHE] ⚡ %s servi depuis le cache.", tool_name)
+        if tool_name == "SEARCH":
+            log_cached_search(args, res)
+        return res
+    igor_config.SUMMARY_STATE.degraded = False
+    res = TOOLS[tool_name](args)
+    # Résumé de secours (IA indisponible) : l'outil sera rappelé la prochaine fois
+    degraded = igor_config.SUMMARY_STATE.degraded
+    if isinstance(res, str) and not _NOT_CACHEABLE.match(res) and not degraded and not igor_config.ABORT_FLAG:
+        # Clé recalculée : l'outil a pu modifier ce qu'il lit (LOCALKNOWLEDGE -> LEARN automatique)
+        TOOL_CACHE.put(tool_cache_key(tool_name, args, version), res, ttl)
+    return res
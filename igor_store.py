@@ -0,0 +1,387 @@
+# igor_store.py
+"""
+Stockage SQLite (mode WAL) des collections de la mémoire : faits, carnet, alarmes,
+instances LLM et raccourcis.
+- Les listes de MEMORY deviennent des TableList : append, insert, notes[i] = ..., pop, del,
+  MEMORY['alarms'] = [...] fonctionnent comme avant, sous verrou, et chaque mutation note
+  elle-même les lignes qu'elle touche. Store.flush (thread d'écriture de la mémoire)
+  les écrit en une transaction : aucune comparaison de listes, aucune E/S dans le thread GTK.
+- Un élément modifié sur place (alarm['active'] = False puis save_memory) ne passe par
+  aucune mutation de la liste : à chaque flush, les éléments dict/list sont resérialisés
+  et comparés à leur dernière écriture (les chaînes, immuables, ne sont pas relues).
+- memory.json ne garde que les réglages ; les raccourcis quittent shortcuts.json.
+- Rien ne se passe à l'import : open_store() (igor_config, au démarrage de l'appli) attache
+  la base et migre memory.json / shortcuts.json au premier lancement (copies .bak conservées).
+- Base illisible : les listes restent dans memory.json et les raccourcis dans shortcuts.json.
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+
+import igor_log
+
+log = igor_log.get_logger("store")
+
+STORE_DB = "igor_store.db"
+MIN_GAP = 1e-6   # Sous cet écart entre deux positions, la liste est renumérotée
+
+# Clé de MEMORY -> table
+LIST_TABLES = {
+    "facts": "facts",
+    "notebook": "notes",
+    "alarms": "alarms",
+    "llm_instances": "llm_instances",
+}
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+class TableList(list):
+    """Liste de MEMORY tenue en base : chaque mutation enregistre ses lignes à écrire."""
+
+    def __init__(self, store, table, rows):
+        super().__init__(json.loads(value) for _, _, value in rows)
+        self._store = store
+        self._table = table
+        self._ids = [row[0] for row in rows]
+        self._pos = [row[1] for row in rows]
+        self._dumped = [row[2] for row in rows]   # Dernier JSON noté de chaque ligne
+
+    def _note(self, i):
+        self._dumped[i] = _dump(list.__getitem__(self, i))
+        self._store._note(self._table, self._ids[i], (self._pos[i], self._dumped[i]))
+
+    def _note_changed(self):
+        """Lignes des éléments modifiés sur place depuis leur dernière écriture notée."""
+        for i, value in enumerate(list.__iter__(self)):
+            if isinstance(value, (dict, list)) and _dump(value) != self._dumped[i]:
+                self._note(i)
+
+    def _index(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("list index out of range")
+        return i
+
+    def _renumber(self):
+        for i in range(len(self)):
+            self._pos[i] = float(i)
+            self._note(i)
+
+    def _reset(self, values):
+        """Remplacement complet (tranches, tri, réassignation) : anciennes lignes supprimées."""
+        for row_id in self._ids:
+            self._store._note(self._table, row_id, None)
+        list.clear(self)
+        self._ids, self._pos, self._dumped = [], [], []
+        for value in values:
+            self._append(value)
+
+    def _append(self, value):
+        list.append(self, value)
+        self._ids.append(self._store._new_id(self._table))
+        self._pos.append(self._pos[-1] + 1 if self._pos else 0.0)
+        self._dumped.append(None)
+        self._note(len(self) - 1)
+
+    def append(self, value):
+        with self._store._lock:
+            self._append(value)
+
+    def extend(self, values):
+        values = list(values)
+        with self._store._lock:
+            for value in values:
+                self._append(value)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, n):
+        with self._store._lock:
+            self._reset(list(self) * n)
+        return self
+
+    def insert(self, i, value):
+        with self._store._lock:
+            n = len(self)
+            i = max(0, min(n, i + n if i < 0 else i))
+            if i == n:
+                self._append(value)
+                return
+            hi = self._pos[i]
+            lo = self._pos[i - 1] if i > 0 else hi - 2
+            if hi - lo < MIN_GAP:
+                self._renumber()
+                hi = self._pos[i]
+                lo = self._pos[i - 1] if i > 0 else hi - 2
+            list.insert(self, i, value)
+            self._ids.insert(i, self._store._new_id(self._table))
+            self._pos.insert(i, (lo + hi) / 2)
+            self._dumped.insert(i, None)
+            self._note(i)
+
+    def __setitem__(self, i, value):
+        with self._store._lock:
+            if isinstance(i, slice):
+                values = list(self)
+                values[i] = value
+                self._reset(values)
+                return
+            i = self._index(i)
+            list.__setitem__(self, i, value)
+            self._note(i)
+
+    def __delitem__(self, i):
+        with self._store._lock:
+            if isinstance(i, slice):
+                values = list(self)
+                del values[i]
+                self._reset(values)
+                return
+            i = self._index(i)
+            self._store._note(self._table, self._ids[i], None)
+            list.__delitem__(self, i)
+            del self._ids[i]
+            del self._pos[i]
+            del self._dumped[i]
+
+    def pop(self, i=-1):
+        with self._store._lock:
+            value = self[i]
+            del self[i]
+            return value
+
+    def remove(self, value):
+        with self._store._lock:
+            del self[self.index(value)]
+
+    def clear(self):
+        with self._store._lock:
+            self._reset([])
+
+    def sort(self, *, key=None, reverse=False):
+        with self._store._lock:
+            self._reset(sorted(self, key=key, reverse=reverse))
+
+    def reverse(self):
+        with self._store._lock:
+            self._reset(list(reversed(self)))
+
+
+class MemoryDict(dict):
+    """MEMORY : réassigner une liste tenue en base (MEMORY['alarms'] = kept) la remplace sur place."""
+
+    def __setitem__(self, key, value):
+        current = self.get(key)
+        if isinstance(current, TableList) and current is not value:
+            current[:] = value
+        else:
+            dict.__setitem__(self, key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class Store:
+    def __init__(self, path=STORE_DB, shortcuts_file=None, durable=True):
+        self.path = path
+        self.shortcuts_file = shortcuts_file
+        self.durable = durable        # True : synchronous=FULL (voir 'memory_fsync')
+        self.attached = False         # True après open_store : listes et raccourcis en base
+        self._local = threading.local()
+        self._lock = threading.RLock()       # Mutations des TableList et file des lignes à écrire
+        self._io_lock = threading.Lock()     # Une transaction d'écriture à la fois
+        self._pending = {}                   # (table, id) -> (pos, json) ou None (suppression)
+        self._lists = {}                     # table -> TableList attachée
+        self._next_id = {}
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.durable else 'NORMAL'}")
+            with conn:
+                for table in LIST_TABLES.values():
+                    conn.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY, pos REAL NOT NULL, value TEXT NOT NULL)""")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_pos ON {table} (pos)")
+                conn.execute("""CREATE TABLE IF NOT EXISTS shortcuts (
+                    name TEXT PRIMARY KEY, pos INTEGER NOT NULL, value TEXT NOT NULL)""")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, db, key):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, db, key, value):
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- MÉMOIRE (listes) ---
+
+    def attach(self, mem, memory_file=None):
+        """
+        Remplace les listes de mem (MemoryDict) par des TableList lues en base.
+        Premier lancement : les listes lues dans memory.json sont importées dans les tables.
+        Renvoie False si la base est inutilisable (les listes restent alors dans memory.json).
+        """
+        try:
+            with self._lock:
+                self._attach(mem, memory_file)
+            self.attached = True
+            return True
+        except (sqlite3.Error, OSError) as e:
+            self.attached = False
+            log.warning("  [STORE] ⚠️ Base %s inutilisable, listes gardées dans memory.json : %s", self.path, e)
+            return False
+
+    def _attach(self, mem, memory_file):
+        db = self._db()
+        if self._meta(db, "memory_migrated") is None:
+            if memory_file and os.path.exists(memory_file):
+                shutil.copy2(memory_file, f"{memory_file}.bak")
+            counts = []
+            with db:
+                for key, table in LIST_TABLES.items():
+                    items = list(mem.get(key) or [])
+                    db.executemany(f"INSERT INTO {table} (pos, value) VALUES (?, ?)",
+                                   [(float(i), _dump(v)) for i, v in enumerate(items)])
+                    counts.append(f"{len(items)} {key}")
+                self._set_meta(db, "memory_migrated", str(time.time()))
+            log.info("  [STORE] Mémoire migrée vers %s : %s.", self.path, ", ".join(counts))
+        for key, table in LIST_TABLES.items():
+            rows = db.execute(f"SELECT id, pos, value FROM {table} ORDER BY pos, id").fetchall()
+            self._next_id[table] = max([self._next_id.get(table, 0)] + [r[0] for r in rows])
+            if rows or key in mem:
+                self._lists[table] = TableList(self, table, rows)
+                dict.__setitem__(mem, key, self._lists[table])
+
+    def _new_id(self, table):
+        self._next_id[table] = self._next_id.get(table, 0) + 1
+        return self._next_id[table]
+
+    def _note(self, table, row_id, row):
+        self._pending[(table, row_id)] = row
+
+    def settings(self, mem):
+        """Ce qui va dans memory.json : tout, sauf les listes si elles sont tenues en base."""
+        if not self.attached:
+            return mem
+        return {k: v for k, v in mem.items() if k not in LIST_TABLES}
+
+    def flush(self):
+        """Écrit les lignes notées par les TableList depuis le dernier appel ; renvoie leur nombre."""
+        if not self.attached:
+            return 0
+        with self._io_lock:
+            with self._lock:
+                for table_list in self._lists.values():
+                    table_list._note_changed()
+                ops, self._pending = self._pending, {}
+            if not ops:
+                return 0
+            try:
+                with self._db() as db:
+                    for (table, row_id), row in ops.items():
+                        if row is None:
+                            db.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+                        else:
+                            db.execute(f"INSERT OR REPLACE INTO {table} (id, pos, value) VALUES (?, ?, ?)",
+                                       (row_id, row[0], row[1]))
+            except sqlite3.Error:
+                # Transaction annulée : les lignes seront retentées (les notes plus récentes priment)
+                with self._lock:
+                    for k, row in ops.items():
+                        self._pending.setdefault(k, row)
+                raise
+            return len(ops)
+
+    # --- RACCOURCIS ---
+
+    def migrate_shortcuts(self):
+        """Importe shortcuts.json une seule fois, puis le renomme en .bak (base attachée seulement)."""
+        if not self.attached or not self.shortcuts_file:
+            return
+        path = self.shortcuts_file
+        try:
+            with self._lock:
+                db = self._db()
+                if self._meta(db, "shortcuts_migrated") is not None:
+                    return
+                data = self._read_file()
+                with db:
+                    db.executemany("INSERT OR REPLACE INTO shortcuts (name, pos, value) VALUES (?, ?, ?)",
+                                   [(name, i, _dump(v)) for i, (name, v) in enumerate(data.items())])
+                    self._set_meta(db, "shortcuts_migrated", str(time.time()))
+            if data:
+                os.replace(path, f"{path}.bak")
+                log.info("  [STORE] %d raccourcis migrés vers %s.", len(data), self.path)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            log.warning("  [STORE] ⚠️ Raccourcis non migrés, %s reste utilisé : %s", path, e)
+
+    def _shortcuts_in_db(self):
+        if not self.attached:
+            return False
+        try:
+            return self._meta(self._db(), "shortcuts_migrated") is not None
+        except sqlite3.Error:
+            return False
+
+    def _read_file(self):
+        if not self.shortcuts_file or not os.path.exists(self.shortcuts_file):
+            return {}
+        with open(self.shortcuts_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def shortcuts(self):
+        if self._shortcuts_in_db():
+            try:
+                rows = self._db().execute("SELECT name, value FROM shortcuts ORDER BY pos").fetchall()
+                return {name: json.loads(value) for name, value in rows}
+            except sqlite3.Error as e:
+                log.warning("  [STORE] ⚠️ Lecture des raccourcis impossible : %s", e)
+        try:
+            return self._read_file()
+        except (OSError, ValueError):
+            return {}
+
+    def save_shortcuts(self, data):
+        """En base : seulement les raccourcis ajoutés, modifiés ou supprimés ; sinon shortcuts.json."""
+        if self._shortcuts_in_db():
+            try:
+                self._save_shortcuts_db(data)
+                return
+            except sqlite3.Error as e:
+                log.warning("  [STORE] ⚠️ Écriture des raccourcis en base impossible : %s", e)
+        if self.shortcuts_file:
+            with open(self.shortcuts_file, "w") as f:
+                json.dump(data, f, indent=4)
+
+    def _save_shortcuts_db(self, data):
+        with self._lock:
+            db = self._db()
+            current = dict(db.execute("SELECT name, value FROM shortcuts").fetchall())
+            next_pos = (db.execute("SELECT MAX(pos) FROM shortcuts").fetchone()[0] or 0) + 1
+            with db:
+                for name in current.keys() - data.keys():
+                    db.execute("DELETE FROM shortcuts WHERE name = ?", (name,))
+                for name, value in data.items():
+                    dumped = _dump(value)
+                    if name not in current:
+                        db.execute("INSERT INTO shortcuts (name, pos, value) VALUES (?, ?, ?)",
+                                   (name, next_pos, dumped))
+                        next_pos += 1
+                    elif current[name] != dumped:
+                        db.execute("UPDATE shortcuts SET value = ? WHERE name = ?", (dumped, name))
@@ -15,6 +15,8 @@ import threading
 from gi.repository import GLib
 from difflib import SequenceMatcher
 from collections import Counter
+import igor_log
+import igor_phonetic
 
 # Import des configurations et variables partagées
 import igor_config
@@ -27,12 +29,27 @@ from igor_config import (
     TASK_QUEUE
 )
 
+log = igor_log.get_logger("system")
+
 # --- GESTION DES APPLICATIONS (SCAN SYSTEME) ---
 INSTALLED_APPS = {} 
 
 # Dictionnaire inverse : Commande → Métadonnées
 APP_METADATA = {}  # Format: {cmd: {"names": [...], "categories": [...], "class": "..."}}
 
+# Index phonétique des noms d'applis (transcriptions écorchées : "fire fox")
+_APP_PHONETIC = None
+_APP_PHONETIC_KEY = None
+
+def app_phonetic_index():
+    """Index phonétique de INSTALLED_APPS, reconstruit après un nouveau scan."""
+    global _APP_PHONETIC, _APP_PHONETIC_KEY
+    key = (id(INSTALLED_APPS), len(INSTALLED_APPS))
+    if _APP_PHONETIC is None or key != _APP_PHONETIC_KEY:
+        _APP_PHONETIC = igor_phonetic.PhoneticIndex(INSTALLED_APPS.keys())
+        _APP_PHONETIC_KEY = key
+    return _APP_PHONETIC
+
 def scan_system_apps():
     """
     Scanne les fichiers .desktop avec classification XDG complète.
@@ -667,7 +684,7 @@ def tool_launch(arg):
     raw_arg = str(arg).strip()
     
     if raw_arg.startswith("xdg-open "):
-        print(f"  [LAUNCH] Exécution directe shell : {raw_arg}", flush=True)
+        log.info("  [LAUNCH] Exécution directe shell : %s", raw_arg)
         try:
             # --- FIX CRITIQUE : NETTOYAGE ENVIRONNEMENT ---
             # On retire les variables Python/GTK/Qt qui font crasher les lecteurs vidéo externes
@@ -723,6 +740,14 @@ def tool_launch(arg):
                 name_display = app_name
                 break
 
+    # B bis. Recherche PHONÉTIQUE (reconnaissance vocale approximative : "fire fox", "calcul a trice")
+    if not cmd_to_run:
+        app_name = app_phonetic_index().best(search)
+        if app_name:
+            log.info("  [LAUNCH] Rapprochement phonétique : '%s' -> %s", search, app_name)
+            cmd_to_run = INSTALLED_APPS[app_name]
+            name_display = app_name
+
     # C. AUTO YOUTUBE
     if not cmd_to_run and any(k in arg_str for k in ["youtube", "vidéo", "video", "clip"]):
         query = None  # ✅ Initialisation de query AVANT le if/else
@@ -737,7 +762,7 @@ def tool_launch(arg):
             query = re.sub(r'(regarde|met|mets|lance|ouvre|la|le|une|video|vidéo|clip|sur|youtube)', '', clean_query, flags=re.IGNORECASE).strip()
         
         if query and len(query) > 1:
-            print(f"  [LAUNCH] Recherche Auto Youtube : {query}", flush=True)
+            log.info("  [LAUNCH] Recherche Auto Youtube : %s", query)
             try:
                 search_url = f"https://www.youtube.com/results?search_query={urllib.parse.quote(query)}"
                 headers = {
@@ -762,7 +787,7 @@ def tool_launch(arg):
                     search = search_url
                     name_display = f"Recherche Youtube: {query}"
             except Exception as e:
-                print(f"  [ERR] Youtube Search: {e}")
+                log.error("  [ERR] Youtube Search: %s", e)
 
     # D. URLS / WEB
     if not cmd_to_run:
@@ -795,7 +820,7 @@ def tool_launch(arg):
             # FIX ANTI-ROOT
             sudo_user = os.environ.get('SUDO_USER')
             if sudo_user and os.geteuid() == 0:
-                print(f"  [SEC] Drop privileges vers {sudo_user}", flush=True)
+                log.info("  [SEC] Drop privileges vers %s", sudo_user)
                 cmd_to_run = f"runuser -u {sudo_user} -- {cmd_to_run}"
 
             argv = shlex.split(cmd_to_run)
@@ -804,7 +829,7 @@ def tool_launch(arg):
             
             def _safe_spawn():
                 try: GLib.spawn_async(argv, flags=flags)
-                except Exception as e: print(f"  [ERR] Launch: {e}")
+                except Exception as e: log.error("  [ERR] Launch: %s", e)
                 return False
             
             GLib.idle_add(_safe_spawn)
@@ -1969,6 +1994,7 @@ def tool_exit(arg):
         import time
         time.sleep(3) # Laisse 3 secondes pour dire la phrase de fin
         print("  [SYSTEM] Arrêt demandé via commande vocale.", flush=True)
+        igor_config.flush_memory() # os._exit saute les handlers atexit
         os._exit(0) # Force brute l'arrêt
         
     threading.Thread(target=_shutdown_sequence, daemon=True).start()
@@ -0,0 +1,176 @@
+# igor_train.py
+"""
+Réglage hors ligne à partir du journal des tours (turn_log.jsonl, voir igor_turnlog).
+- Rejoue le barème des mots-clés de chaque tour réussi classé par le LLM avec d'autres poids
+  (action, objet, interrogatif, état) et garde ceux qui tranchent juste le plus souvent
+  sans LLM -> keyword_weights.json (lu par igor_intent_index).
+- Exporte les phrases classées par le LLM et exécutées avec succès comme exemples
+  du classifieur local -> intent_examples.jsonl (lu par igor_intent_model).
+  Une phrase à plusieurs commandes compte pour chacun de ses segments, jamais en entier.
+- Affiche, run après run (un run = un lancement d'Igor), la part des commandes
+  classées sans appel LLM.
+
+Usage : python igor_train.py [--log turn_log.jsonl] [--dry-run] [--penalty 2]
+"""
+import sys
+import json
+import argparse
+import itertools
+from collections import OrderedDict
+
+import igor_intent_index
+import igor_intent_model
+import igor_turnlog
+
+THRESHOLD = 7          # Même seuil que classify_query_intent
+WRONG_PENALTY = 2.0    # Une mauvaise décision sans LLM coûte plus qu'un appel LLM évité
+NO_LLM_SOURCES = {"cache", "query_cache", "keywords", "local"}
+# Intention choisie par le LLM : étiquette indépendante du barème (un tour tranché par les
+# mots-clés ne ferait que confirmer les poids qui l'ont produit)
+LLM_SOURCES = ("llm", "llm_phase0", "single_pass")
+GRID = {
+    "action": [3, 4, 5, 6, 7, 8],
+    "object": [1, 1.5, 2, 2.5, 3, 3.5, 4],
+    "inquiry": [0, 0.5, 1, 1.5, 2, 3],
+    "state": [0, 0.5, 1, 1.5, 2, 3],
+}
+
+RULE_CATEGORY = {rule[0]: rule[1] for rule in igor_intent_index.KEYWORD_RULES}
+CATEGORIES = list(dict.fromkeys([rule[1] for rule in igor_intent_index.KEYWORD_RULES] + ["PROJECT"]))
+
+
+def session_report(turns):
+    """[(session, tours, part classée sans LLM, part sans aucun appel LLM)] dans l'ordre des runs."""
+    sessions = OrderedDict()
+    for t in turns:
+        sessions.setdefault(t.get("session"), []).append(t)
+    report = []
+    for session, items in sessions.items():
+        n = len(items)
+        no_llm_classify = sum(1 for t in items if t.get("source") in NO_LLM_SOURCES)
+        no_llm_at_all = sum(1 for t in items if not t.get("llm_calls"))
+        report.append((session, n, no_llm_classify / n, no_llm_at_all / n))
+    return report
+
+
+def split_segments(turns):
+    """Tours à une commande ; une phrase à plusieurs commandes donne un tour par segment (succès du tour)."""
+    split = []
+    for t in turns:
+        if t.get("segments"):
+            split.extend(dict(seg, session=t.get("session"), success=t.get("success")) for seg in t["segments"])
+        else:
+            split.append(t)
+    return split
+
+
+def training_turns(turns):
+    """Tours réussis, classés par le LLM, dont le barème est rejouable (comptes par règle journalisés)."""
+    return [t for t in turns
+            if t.get("success") and t.get("intent") and t.get("source") in LLM_SOURCES
+            and t.get("rule_hits") is not None]
+
+
+def replay(turn, weights):
+    """Catégorie retenue par les mots-clés avec ces poids, ou None (passage au LLM)."""
+    ranking = {cat: 0 for cat in CATEGORIES}
+    for label, counts in turn["rule_hits"].items():
+        category = RULE_CATEGORY.get(label)
+        if category:
+            ranking[category] = max(ranking[category], igor_intent_index.points_for(counts, weights))
+    for category in turn.get("boosted", ()):
+        ranking[category] = max(ranking.get(category, 0), THRESHOLD)
+    best = max(ranking, key=ranking.get)   # Premier en cas d'égalité, comme le tri stable du classement
+    return best if ranking[best] >= THRESHOLD else None
+
+
+def evaluate(turns, weights):
+    """(décisions justes, décisions fausses) prises sans LLM."""
+    right = wrong = 0
+    for t in turns:
+        decided = replay(t, weights)
+        if decided is None:
+            continue
+        if decided == t["intent"]:
+            right += 1
+        else:
+            wrong += 1
+    return right, wrong
+
+
+def fit_weights(turns, penalty=WRONG_PENALTY):
+    """Recherche en grille ; à score égal, les poids les plus proches des défauts."""
+    defaults = igor_intent_index.DEFAULT_WEIGHTS
+    best, best_key = None, None
+    for values in itertools.product(*GRID.values()):
+        weights = dict(zip(GRID, values))
+        right, wrong = evaluate(turns, weights)
+        distance = sum(abs(weights[k] - defaults[k]) for k in defaults)
+        key = (right - penalty * wrong, -distance)
+        if best_key is None or key > best_key:
+            best, best_key = weights, key
+    return best
+
+
+def export_examples(turns, path=igor_intent_model.LOGGED_EXAMPLES_FILE):
+    """Ajoute les phrases classées par le LLM et réussies aux exemples du classifieur local."""
+    known = {igor_intent_model.normalize(text) for text, _ in igor_intent_model.logged_examples(path)}
+    added = 0
+    with open(path, "a", encoding="utf-8") as f:
+        for t in turns:
+            if not t.get("success") or t.get("source") not in LLM_SOURCES:
+                continue
+            text = t.get("utterance") or ""
+            key = igor_intent_model.normalize(text)
+            if not key or key in known:
+                continue
+            known.add(key)
+            f.write(json.dumps({"text": text, "intent": t["intent"]}, ensure_ascii=False) + "\n")
+            added += 1
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Réajuste les poids des mots-clés depuis le journal des tours.")
+    parser.add_argument("--log", default=igor_turnlog.TURN_LOG_FILE, help="Journal des tours à lire")
+    parser.add_argument("--penalty", type=float, default=WRONG_PENALTY, help="Coût d'une décision fausse sans LLM")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche le résultat sans rien écrire")
+    args = parser.parse_args(argv)
+
+    turns = igor_turnlog.read_turns(args.log)
+    if not turns:
+        print(f"Aucun tour dans {args.log}.")
+        return 1
+
+    print("\n=== RUNS (classement sans LLM) ===")
+    for session, n, share, share_all in session_report(turns):
+        print(f"{session}  {n:4d} tours | classés sans LLM {share*100:5.1f}% | sans aucun appel LLM {share_all*100:5.1f}%")
+
+    commands = split_segments(turns)
+    data = training_turns(commands)
+    print(f"\nTours rejouables : {len(data)}")
+    current = igor_intent_index.load_weights()
+    right, wrong = evaluate(data, current)
+    print(f"Poids actuels {current} : {right} justes, {wrong} faux sans LLM")
+
+    fitted = fit_weights(data, args.penalty)
+    f_right, f_wrong = evaluate(data, fitted)
+    print(f"Poids ajustés {fitted} : {f_right} justes, {f_wrong} faux sans LLM")
+
+    improved = (f_right - args.penalty * f_wrong) > (right - args.penalty * wrong)
+    if args.dry_run:
+        return 0
+    if improved:
+        with open(igor_intent_index.KEYWORD_WEIGHTS_FILE, "w", encoding="utf-8") as f:
+            json.dump(fitted, f, indent=4)
+        print(f"-> {igor_intent_index.KEYWORD_WEIGHTS_FILE} mis à jour.")
+    else:
+        print("-> Pas de gain, poids inchangés.")
+
+    added = export_examples(commands)
+    print(f"-> {added} exemples ajoutés à {igor_intent_model.LOGGED_EXAMPLES_FILE}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
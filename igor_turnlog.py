@@ -0,0 +1,200 @@
+# igor_turnlog.py
+"""
+Journal des tours de conversation (turn_log.jsonl), une ligne JSON compacte par commande :
+phrase normalisée, classement des mots-clés, intention retenue et sa source, sortie brute
+du LLM, outil(s) exécuté(s), succès, latence par étape. Une phrase à plusieurs commandes
+garde ces champs par segment, dans 'segments'.
+Un tour commence dans le thread du cerveau (begin) et se termine quand la dernière tâche
+qu'il a mise en file a été exécutée par le worker (task_done) ; d'où l'identifiant 'turn'
+transporté dans les tâches de TASK_QUEUE.
+Sert de jeu de données à igor_train.py (réglage des poids des mots-clés, exemples du
+classifieur local).
+"""
+import os
+import json
+import time
+import uuid
+import itertools
+import threading
+from contextlib import contextmanager
+
+import igor_log
+
+log = igor_log.get_logger("turnlog")
+
+TURN_LOG_FILE = "turn_log.jsonl"
+TURN_LOG_MAX_BYTES = 20 * 1024 * 1024   # Au-delà : rotation en turn_log.jsonl.1
+RAW_MAX_CHARS = 400
+
+SESSION_ID = uuid.uuid4().hex[:8]   # Un "run" = un lancement d'Igor (comparaison run après run)
+RECORDING = True                     # False : tours suivis en mémoire mais jamais écrits (banc de mesure)
+
+_LOCAL = threading.local()
+_OPEN = {}            # id -> Turn en attente de ses tâches
+_LOCK = threading.Lock()
+_WRITE_LOCK = threading.Lock()
+_IDS = itertools.count(1)
+
+
+class Turn:
+    """Un tour en cours : champs libres + latences cumulées par étape."""
+
+    def __init__(self, utterance, parent=None):
+        self.parent = parent
+        self.started = time.time()
+        self.pending = 0
+        self._lock = threading.Lock()
+        if parent is None:
+            self.id = f"{SESSION_ID}-{next(_IDS)}"
+            self.record = {
+                "session": SESSION_ID, "ts": round(self.started, 3), "utterance": utterance,
+                "intent": None, "source": None, "ranking": None, "raw": None,
+                "tools": [], "success": None, "llm_calls": 0, "latency": {},
+            }
+        else:
+            # Segment d'une phrase à plusieurs commandes : ni tâches ni écriture propres
+            self.id = parent.id
+            self.record = {
+                "utterance": utterance, "intent": None, "source": None, "ranking": None,
+                "raw": None, "llm_calls": 0, "latency": {},
+            }
+
+    def segment(self, utterance):
+        """Sous-tour d'un segment : ses champs sont journalisés à part, dans 'segments'."""
+        child = Turn(utterance, parent=self)
+        with self._lock:
+            self.record.setdefault("segments", []).append(child.record)
+        return child
+
+    def set(self, **fields):
+        with self._lock:
+            self.record.update(fields)
+
+    def add_latency(self, stage, seconds):
+        with self._lock:
+            latency = self.record["latency"]
+            latency[stage] = round(latency.get(stage, 0.0) + seconds, 4)
+        if self.parent is not None:
+            self.parent.add_latency(stage, seconds)
+
+    def count_llm_call(self, seconds):
+        with self._lock:
+            self.record["llm_calls"] += 1
+        if self.parent is not None:
+            with self.parent._lock:
+                self.parent.record["llm_calls"] += 1
+        self.add_latency("llm", seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.time()
+        try:
+            yield self
+        finally:
+            self.add_latency(name, time.time() - started)
+
+
+def begin(utterance):
+    """Ouvre un tour pour le thread courant et le renvoie."""
+    turn = Turn(utterance)
+    _LOCAL.turn = turn
+    with _LOCK:
+        _OPEN[turn.id] = turn
+    return turn
+
+
+def current():
+    """Tour du thread courant (None hors d'un tour)."""
+    return getattr(_LOCAL, "turn", None)
+
+
+def bind(fn, turn=None):
+    """Enveloppe fn pour qu'elle voie le tour courant (ou turn, ex: un segment) depuis un autre thread."""
+    turn = turn or current()
+
+    def run(*args, **kwargs):
+        _LOCAL.turn = turn
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _LOCAL.turn = None
+    return run
+
+
+def expect_task(turn):
+    """Une tâche de plus sera exécutée pour ce tour ; renvoie l'identifiant à joindre à la tâche."""
+    if turn is None:
+        return None
+    with turn._lock:
+        turn.pending += 1
+    return turn.id
+
+
+def task_done(turn_id, tool, success, seconds):
+    """Le worker a exécuté une tâche du tour ; le tour est écrit après sa dernière tâche."""
+    with _LOCK:
+        turn = _OPEN.get(turn_id)
+    if turn is None:
+        return
+    with turn._lock:
+        turn.record["tools"].append(tool)
+        turn.record["success"] = bool(success) and turn.record["success"] is not False
+        turn.pending -= 1
+        remaining = turn.pending
+    turn.add_latency("tool", seconds)
+    if remaining <= 0:
+        _close(turn)
+
+
+def end(turn):
+    """Fin du travail du cerveau : sans tâche en file, le tour est écrit tout de suite."""
+    if getattr(_LOCAL, "turn", None) is turn:
+        _LOCAL.turn = None
+    if turn is None:
+        return
+    turn.add_latency("brain", time.time() - turn.started)
+    if turn.pending <= 0:
+        _close(turn)
+
+
+def _close(turn):
+    with _LOCK:
+        if _OPEN.pop(turn.id, None) is None:
+            return
+    if not RECORDING:
+        return
+    record = dict(turn.record)
+    record["latency"] = dict(record["latency"], total=round(time.time() - turn.started, 4))
+    if record["raw"]:
+        record["raw"] = record["raw"][:RAW_MAX_CHARS]
+    if "segments" in record:
+        record["segments"] = [dict(seg, raw=seg["raw"][:RAW_MAX_CHARS] if seg["raw"] else seg["raw"])
+                              for seg in record["segments"]]
+    _append(record)
+
+
+def _append(record, path=TURN_LOG_FILE):
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    with _WRITE_LOCK:
+        try:
+            if os.path.exists(path) and os.path.getsize(path) > TURN_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            log.warning("  [TURNLOG] ⚠️ Écriture impossible : %s", e)
+
+
+def read_turns(path=TURN_LOG_FILE):
+    """Tours journalisés (lignes illisibles ignorées), anciens puis récents."""
+    turns = []
+    for p in (path + ".1", path):
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    turns.append(json.loads(line))
+                except ValueError:
+                    continue
+    return turns
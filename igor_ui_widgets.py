@@ -12,6 +12,7 @@ import igor_skills as skills
 import igor_config
 import igor_globals
 import igor_system
+import igor_llm
 from igor_audio import stop_speaking
 
 # --- WIDGET VISAGE ---
@@ -190,6 +191,12 @@ class FaceWidget(Gtk.DrawingArea):
         """Affiche un petit indicateur du modèle actif (Ollama/Llama) en haut à gauche."""
         backend = skills.MEMORY.get('llm_backend', 'llamacpp')
         model = skills.MEMORY.get('llm_model_name', '')
+
+        # Si le routeur a basculé sur une instance de secours, on affiche celle qui répond réellement
+        last = igor_llm.ROUTER.last_backend
+        if last:
+            backend = last.get('type') or backend
+            model = last.get('model_name') or ''
         
         # Configuration visuelle
         if 'ollama' in backend.lower():
@@ -204,6 +211,12 @@ class FaceWidget(Gtk.DrawingArea):
         if model:
             short_model = model.split(':')[0].split('-')[0].title()[:8]
 
+        # Serveur local pas encore prêt : on l'indique à la place du nom du modèle
+        server_state = igor_globals.LLM_SERVER_STATE
+        if 'ollama' not in backend.lower() and server_state in ("loading", "warming"):
+            short_model = "Charge..." if server_state == "loading" else "Préchauffe"
+            color = (0.6, 0.6, 0.6) if server_state == "loading" else (1.0, 0.9, 0.3)
+
         cr.save()
         # Position statique (Top Left)
         cr.translate(10, 10)
@@ -1223,7 +1236,11 @@ class ConfigDialog(Gtk.Dialog):
                 # (Simple check visuel, pour le switch process)
                 url = refs['url'].get_text()
                 if "8080" in url:
-                    if llama_ok:
+                    server_state = igor_globals.LLM_SERVER_STATE
+                    if server_state in ("loading", "warming") and igor_globals.LLM_SERVER_PROCESS:
+                        label = " CHARGEMENT " if server_state == "loading" else " PRÉCHAUFFE "
+                        refs['status_lbl'].set_markup(f"<span background='#cc8800' foreground='white' weight='bold'>{label}</span>")
+                    elif llama_ok:
                         refs['status_lbl'].set_markup("<span background='#00aa00' foreground='white' weight='bold'> ONLINE </span>")
                         # if 'sw_process' in refs: refs['sw_process'].set_state(True) # Désactivé pour éviter boucle
                     else:
@@ -66,6 +66,9 @@ from igor_config import (
 
 # Import de l'utilitaire système pour trouver les fenêtres
 from igor_system import get_window_geometry
+import igor_log
+
+log = igor_log.get_logger("vision")
 
 # --- DIAGNOSTIC ET IMPORT DES LIBRAIRIES LOURDES ---
 print("\n--- DIAGNOSTIC VISION DÉMARRAGE ---")
@@ -181,7 +184,7 @@ def _yolo_analysis_loop():
     """
     global fast_model, hands_detector
     
-    print("  [WATCH-AI] Thread d'analyse démarré.", flush=True)
+    log.info("  [WATCH-AI] Thread d'analyse démarré.")
 
     # --- 1. INIT YOLO ---
     if YOLO_AVAILABLE:
@@ -257,7 +260,7 @@ def _yolo_analysis_loop():
                     if gesture:
                         # Cas Spécial : OPEN_HAND (Juste un log visuel, pas d'action système)
                         if gesture == "OPEN_HAND":
-                            print(f"  [GESTURE] 🖐️ Je te vois (En attente...)", flush=True)
+                            log.info("  [GESTURE] 🖐️ Je te vois (En attente...)")
                             if igor_config.ON_GESTURE_CALLBACK:
                                 igor_config.ON_GESTURE_CALLBACK("OPEN_HAND")
                             # On ne met pas de cooldown ici pour permettre d'enchainer
@@ -268,7 +271,7 @@ def _yolo_analysis_loop():
                         # Cas Commandes Actives
                         if gesture in GESTURE_ACTIONS:
                             action = GESTURE_ACTIONS[gesture]
-                            print(f"  [GESTURE] 👉 Détecté : {gesture} -> Commande : {action['tool']}", flush=True)
+                            log.info("  [GESTURE] 👉 Détecté : %s -> Commande : %s", gesture, action['tool'])
                             
                             # 1. Envoi de la commande
                             igor_config.TASK_QUEUE.put(action)
@@ -298,7 +301,7 @@ def _yolo_analysis_loop():
                 # Mise à jour mémoire visuelle
                 new_items = current_labels - igor_config.LAST_SEEN_LABELS
                 if new_items:
-                    print(f"  [WATCH] Vu : {', '.join(list(new_items))}", flush=True)
+                    log.info("  [WATCH] Vu : %s", ', '.join(new_items))
                 
                 igor_config.LAST_SEEN_LABELS = current_labels
             except Exception: pass
@@ -307,7 +310,7 @@ def _yolo_analysis_loop():
 
     if hands_detector:
         hands_detector.close()
-    print("  [WATCH-AI] Arrêt du moteur d'analyse.", flush=True)
+    log.info("  [WATCH-AI] Arrêt du moteur d'analyse.")
 
 # --- WORKER PRINCIPAL (WEBCAM) ---
 
@@ -13,9 +13,11 @@ from gi.repository import Gtk, Gdk, GLib, Pango
 import igor_skills as skills
 import igor_config
 from igor_audio import stop_speaking, listen_hybrid_logic, speak_logic, play_actual_alarm_sound
-from igor_brain import get_cached_or_query
+from igor_brain import resolve_utterance
+from igor_intent_cache import normalize_utterance, WAKE_WORDS
 from igor_ui_widgets import FaceWidget, ConfigDialog
 import igor_globals
+import igor_turnlog
 
 IS_PROCESSING_QUEUE = False
 
@@ -30,6 +32,8 @@ def task_queue_worker(window_instance):
             
             tool_name = task.get('tool')
             args = task.get('args')
+            task_started = time.time()
+            task_ok = False
             print(f"  [QUEUE] Exécution : {tool_name} -> {args}", flush=True)
             
             GLib.idle_add(window_instance.add_chat_message, "System", f"Traitement : {tool_name}...")
@@ -72,7 +76,7 @@ def task_queue_worker(window_instance):
                                 sub_args = ""
                                 
                             # APPEL DE LA FONCTION
-                            res = skills.TOOLS[sub_tool](sub_args)
+                            res = skills.run_tool(sub_tool, sub_args)
                             
                             # Mise à jour UI si surveillance (Commande vocale/Chat)
                             if sub_tool == "WATCH":
@@ -108,24 +112,28 @@ def task_queue_worker(window_instance):
                 
                 # Message final avec statistiques
                 response_text = f"✓ Batch terminé : {successful} réussies, {failed} échecs."  
+                task_ok = failed == 0 and not igor_config.ABORT_FLAG
             
             # === CAS NORMAL (Action unique) ===
             elif tool_name in skills.TOOLS:
                 try:
                     if args is None: 
                         args = ""
-                    res = skills.TOOLS[tool_name](args)
+                    res = skills.run_tool(tool_name, args)
                     
                     # Mise à jour UI si surveillance (Commande vocale/Chat)
                     if tool_name == "WATCH":
                         GLib.idle_add(window_instance.update_cam_btn_state)
                         
                     response_text = str(res)
+                    task_ok = True
                 except Exception as e: 
                     response_text = f"Erreur tùche : {e}"
             else: 
                 response_text = f"Outil inconnu : {tool_name}"
 
+            igor_turnlog.task_done(task.get('turn'), tool_name, task_ok, time.time() - task_started)
+
             # Affichage de la réponse finale
             clean_resp = response_text.replace(f"{skills.MEMORY['agent_name']}:", "").strip()
             GLib.idle_add(window_instance.add_chat_message, skills.MEMORY['agent_name'], clean_resp)
@@ -146,19 +154,10 @@ def task_queue_worker(window_instance):
 
             skills.TASK_QUEUE.task_done()
 
-            # Si la queue technique est vide, on vérifie s'il reste des prompts textuels à traiter
+            # Queue technique vide : cycle terminé, on réactive l'écoute
             if skills.TASK_QUEUE.empty():
-                if window_instance.pending_chain:
-                    # On récupère le prochain prompt textuel
-                    next_prompt = window_instance.pending_chain.pop(0)
-                    print(f"  [CHAIN] ⏩ Lancement séquence suivante : '{next_prompt}'", flush=True)
-                    
-                    # On relance le processus via l'interface principale (Thread-safe)
-                    GLib.idle_add(window_instance.process_input, next_prompt, True)
-                else:
-                    # Vraiment fini, on réactive l'écoute
-                    igor_globals.WAIT_FOR_WAKE_WORD = True
-                    print("  [SYSTEM] Cycle terminé. En attente du mot clé...", flush=True)
+                igor_globals.WAIT_FOR_WAKE_WORD = True
+                print("  [SYSTEM] Cycle terminé. En attente du mot clé...", flush=True)
 
         except Exception as e: 
             print(f"Queue Error: {e}", flush=True)
@@ -371,7 +370,6 @@ class AgentWindow(Gtk.Window):
         self.connect("map-event", self.on_window_map)
         
         # 7. Démarrage des Threads et Services
-        self.pending_chain = [] # File d'attente pour les prompts séquentiels
         self.add_chat_message("System", f"Prêt.")
 
         # --- CONNECTER LE CALLBACK VIDEO ---
@@ -886,23 +884,9 @@ class AgentWindow(Gtk.Window):
             GLib.timeout_add(300, self._restore_focused_window)
             self.check_auto_hide()
 
-    def process_input(self, text, is_chained=False):
-        # Découpage sur les mots de liaison (et, puis, ensuite...)
-        # On ne redécoupe pas si on est déjà dans une chaîne (pour éviter les boucles infinies)
-        if not is_chained and any(sep in text for sep in [" et ", " puis ", " ensuite ", " après "]):
-            parts = re.split(r'\s+(?:et|puis|ensuite|après)\s+', text.strip(), flags=re.IGNORECASE)
-            parts = [p.strip() for p in parts if p.strip()]
-            
-            if parts:
-                # On prend le premier prompt pour tout de suite
-                current_prompt = parts.pop(0)
-                # On ajoute le reste à la file d'attente
-                self.pending_chain.extend(parts)
-                print(f"  [CHAIN] Prompt actif: '{current_prompt}' | En attente: {self.pending_chain}", flush=True)
-                
-                # On remplace le texte à traiter par le premier segment
-                text = current_prompt
-
+    def process_input(self, text):
+        # Les commandes multiples (et, puis, ensuite...) sont découpées d'un coup par le cerveau
+        # (resolve_utterance) : segments résolus en parallèle, un seul BATCH pour l'exécuteur
         igor_globals.CHAT_HISTORY.append(f"User: {text}")
         self.face.set_state("THINKING")
         t = threading.Thread(target=self._brain_worker, args=(text,)); t.daemon = True; t.start()
@@ -929,26 +913,25 @@ class AgentWindow(Gtk.Window):
                 # On quitte la fonction ici, on ne demande PAS à l'IA (brain_query)
                 return 
 
-        tool, args = get_cached_or_query(text)
+        # Journal des tours : refermé par le worker après la dernière tâche de ce tour
+        turn = igor_turnlog.begin(normalize_utterance(text, WAKE_WORDS + (skills.MEMORY.get('agent_name', ''),)))
+        tool, args = resolve_utterance(text)
         
         has_task = False
 
         if tool == "BATCH" and isinstance(args, list):
             self.add_chat_message("System", f"Batch {len(args)}.")
-            for i in args: 
-                # AJOUT DE SÉCURITÉ : On vérifie que 'i' est bien un dictionnaire
-                if isinstance(i, dict):
-                    skills.TASK_QUEUE.put({"tool": i.get("tool","CHAT"), "args": i.get("args","")})
-                else:
-                    print(f"  [ERR] Batch item invalid (not dict): {i}", flush=True)
+            # Plan complet en une seule tâche : le worker l'exécute dans l'ordre (BATCH)
+            skills.TASK_QUEUE.put({"tool": "BATCH", "args": args, "turn": igor_turnlog.expect_task(turn)})
             has_task = True
         else:
             # Si l'IA renvoie CHAT vide, on ne met rien en file d'attente
             if tool == "CHAT" and not args:
                  pass
             else:
-                 skills.TASK_QUEUE.put({"tool": tool, "args": args})
+                 skills.TASK_QUEUE.put({"tool": tool, "args": args, "turn": igor_turnlog.expect_task(turn)})
                  has_task = True
+        igor_turnlog.end(turn)
         
         # CORRECTIF : Si aucune tâche n'a été ajoutée (ex: bug IA ou réponse vide),
         # le task_queue_worker ne se lancera pas. Il faut donc réactiver l'écoute ICI.
@@ -1017,6 +1000,7 @@ class AgentWindow(Gtk.Window):
         # Redémarrage subprocess (le script lira memory.json)
         def _restart():
             time.sleep(0.5)  # Temps que le vieux processus meure
+            igor_config.flush_memory()  # Le nouveau détecteur relit wake_lang sur disque
             GLib.idle_add(self.start_wake_detector_subprocess)
         
         threading.Thread(target=_restart, daemon=True).start()
@@ -8,9 +8,11 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib
 
 # Import des nouveaux modules
+import igor_config
 from igor_window import AgentWindow
 
 if __name__ == "__main__":
+    igor_config.open_store()
     win = AgentWindow()
     PID_FILE = "/tmp/igor_agent.pid"
     
@@ -0,0 +1,18 @@
+# Test de fumée du banc corpus : face au serveur scripté (modèle parfait),
+# le pipeline doit retrouver l'outil et les arguments attendus.
+import pytest
+
+pytest.importorskip("gi")
+igor_bench = pytest.importorskip("igor_bench")
+
+
+def test_scripted_llm_finds_the_real_utterance():
+    server = igor_bench.ScriptedLLM(igor_bench.BENCH_CORPUS)
+    prompt = ('User: "Quelle heure ?" → {"tool": "TIME", "args": ""}\n'
+              'User: "Ferme Firefox" → {"tool": "CLOSE_WINDOW", "args": "Firefox"}\n\n'
+              'User: "note acheter du pain"\nJSON:')
+    assert server.answer(prompt, {}) == '{"tool": "NOTE", "args": "acheter du pain"}'
+
+
+def test_corpus_accuracy_with_scripted_llm():
+    assert igor_bench.main(["--corpus", "--min-accuracy", "0.95"]) == 0
@@ -0,0 +1,79 @@
+# Quasi-doublons du carnet (igor_dedup) : même résultat que la comparaison exhaustive
+import random
+
+import igor_dedup
+
+WORDS = ("acheter pain lait oeufs appeler maman demain dentiste mardi payer facture garage "
+         "voiture pneus reunion projet rapport envoyer mail anniversaire cadeau livre reserver "
+         "restaurant samedi arroser plantes poubelles jeudi code porte prendre medicaments "
+         "croquettes chat nettoyer cuisine le la les un une des pour avec chez dans sur et").split()
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12)))
+
+
+def _mutate(rng, text):
+    words = text.split()
+    for _ in range(rng.randint(0, max(1, len(words) // 3))):
+        i = rng.randrange(len(words))
+        op = rng.random()
+        if op < 0.33 and len(words) > 1:
+            words.pop(i)
+        elif op < 0.66:
+            words.insert(i, rng.choice(WORDS))
+        else:
+            words[i] = rng.choice(WORDS)
+    text = " ".join(words)
+    return text.upper() if rng.random() < 0.2 else text
+
+
+def _exhaustive(notes, text):
+    """L'ancienne boucle : première note au-delà du seuil."""
+    for i, note in enumerate(notes):
+        if igor_dedup.similarity(note, text) > igor_dedup.THRESHOLD:
+            return i, note
+    return None
+
+
+def _corpus(rng, size):
+    notes = []
+    for _ in range(size):
+        notes.append(_mutate(rng, rng.choice(notes)) if notes and rng.random() < 0.3 else _sentence(rng))
+    return notes
+
+
+def test_matches_exhaustive_check():
+    rng = random.Random(0)
+    notes = _corpus(rng, 120)
+    index = igor_dedup.ShingleIndex().sync(notes)
+    for _ in range(150):
+        query = _mutate(rng, rng.choice(notes)) if rng.random() < 0.7 else _sentence(rng)
+        assert index.find_similar(query) == _exhaustive(notes, query), query
+
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(1)
+    notes = _corpus(rng, 60)
+    index = igor_dedup.ShingleIndex().sync(notes)
+    for _ in range(60):
+        op = rng.random()
+        if op < 0.4:
+            notes.append(_sentence(rng))
+            index.add(notes[-1])
+        elif op < 0.7:
+            i = rng.randrange(len(notes))
+            notes[i] = _mutate(rng, notes[i])
+            index.replace(i, notes[i])
+        else:
+            i = rng.randrange(len(notes))
+            notes.pop(i)
+            index.remove(i)
+        query = _mutate(rng, rng.choice(notes))
+        assert index.sync(notes).find_similar(query) == _exhaustive(notes, query)
+
+
+def test_replaced_list_is_reindexed():
+    index = igor_dedup.ShingleIndex().sync(["acheter du pain"])
+    assert index.find_similar("acheter du pain demain")
+    assert index.sync(["appeler le garage"]).find_similar("acheter du pain demain") is None
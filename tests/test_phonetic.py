@@ -0,0 +1,49 @@
+# Rapprochement phonétique des transcriptions (igor_phonetic, KeywordIndex.fuzzy_words)
+import pytest
+
+import igor_phonetic
+
+VOCABULARY = ["lance", "monte", "passe", "coupe", "firefox", "calculatrice", "terminal"]
+
+
+@pytest.mark.parametrize("heard", ["lent", "monde", "pates", "cout"])
+def test_short_keys_are_not_rewritten(heard):
+    assert igor_phonetic.PhoneticIndex(VOCABULARY).lookup(heard) == set()
+
+
+@pytest.mark.parametrize("heard, expected", [
+    ("fire fox", "firefox"),
+    ("calcul a trice", "calculatrice"),
+    ("fire foks", "firefox"),
+    ("terminale", "terminal"),
+])
+def test_transcription_errors_still_match(heard, expected):
+    assert igor_phonetic.PhoneticIndex(VOCABULARY).lookup(heard) == {expected}
+
+
+def test_distant_spelling_is_rejected():
+    # Même clé phonétique, mais orthographe trop éloignée du mot du vocabulaire
+    assert igor_phonetic.PhoneticIndex(["kalkulatrice"]).lookup("calcul") == set()
+
+
+@pytest.fixture
+def index(monkeypatch):
+    pytest.importorskip("gi")
+    import igor_intent_index
+    import igor_system
+    monkeypatch.setattr(igor_system, "INSTALLED_APPS", {"firefox": "firefox"})
+    return igor_intent_index.get_index()
+
+
+@pytest.mark.parametrize("sentence", ["firefox est lent", "le monde de firefox", "des pates", "le cout de firefox"])
+def test_no_action_from_false_positives(index, sentence):
+    tokens = sentence.split()
+    fuzzy = index.fuzzy_words(tokens, {"le", "de", "des", "est"})
+    assert index.score(set(tokens) | fuzzy, fuzzy)["LAUNCH"] < 5
+
+
+def test_guessed_verb_only_counts_as_object(index):
+    # "lanse" sonne comme "lance" mais un verbe deviné ne déclenche pas d'action
+    fuzzy = {"lance"}
+    assert index.score({"lance"}, fuzzy)["LAUNCH"] == 0
+    assert index.score({"lance"})["LAUNCH"] == 5
@@ -0,0 +1,34 @@
+# Découpage des phrases à plusieurs commandes (igor_brain.segment_utterance)
+import pytest
+
+pytest.importorskip("gi")
+igor_brain = pytest.importorskip("igor_brain")
+import igor_system
+
+
+@pytest.fixture(autouse=True)
+def installed_apps(monkeypatch):
+    monkeypatch.setattr(igor_system, "INSTALLED_APPS", {"firefox": "firefox", "calculatrice": "gnome-calculator"})
+
+
+@pytest.mark.parametrize("text", [
+    "recherche Roméo et Juliette",
+    "lance la vidéo de Tom et Jerry",
+    "écris bonjour, comment ça va",
+    "la différence entre le chat et le chien",
+])
+def test_argument_is_not_split(text):
+    assert igor_brain.segment_utterance(text) == [text]
+
+
+def test_segment_with_its_own_verb():
+    assert igor_brain.segment_utterance("écris bonjour et ouvre firefox") == ["écris bonjour", "ouvre firefox"]
+
+
+def test_known_object_inherits_the_verb():
+    assert igor_brain.segment_utterance("ferme firefox et la calculatrice") == ["ferme firefox", "ferme la calculatrice"]
+
+
+def test_argument_kept_before_a_new_command():
+    assert igor_brain.segment_utterance("recherche Roméo et Juliette puis ferme firefox") == \
+        ["recherche Roméo et Juliette", "ferme firefox"]
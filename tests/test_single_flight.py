@@ -0,0 +1,57 @@
+# Requêtes identiques simultanées (igor_llm.single_flight) : une annulation ne se partage pas
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+import igor_llm
+
+
+def _follow(key, fn, results):
+    try:
+        results.append(igor_llm.single_flight(key, fn))
+    except igor_llm.LLMError as e:
+        results.append(e)
+
+
+def test_follower_retries_when_leader_is_cancelled():
+    started = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            time.sleep(0.2)
+            raise igor_llm.LLMCancelled("Requête annulée")   # Spéculation du premier annulée
+        return "ok"
+
+    leader = threading.Thread(target=_follow, args=("k1", fn, []))
+    leader.start()
+    started.wait()
+    results = []
+    _follow("k1", fn, results)
+    leader.join()
+    assert results == ["ok"] and len(calls) == 2
+
+
+def test_stop_cancels_waiting_follower():
+    release = threading.Event()
+
+    def fn():
+        release.wait(2)
+        return "ok"
+
+    leader = threading.Thread(target=_follow, args=("k2", fn, []))
+    leader.start()
+    time.sleep(0.05)
+    results = []
+    follower = threading.Thread(target=_follow, args=("k2", fn, results))
+    follower.start()
+    time.sleep(0.1)
+    igor_llm.cancel_all()
+    follower.join(1)
+    release.set()
+    leader.join()
+    assert len(results) == 1 and isinstance(results[0], igor_llm.LLMCancelled)
@@ -0,0 +1,38 @@
+# Listes de MEMORY tenues en base (igor_store) : ce qui est écrit se relit à l'identique
+import igor_store
+
+
+def _attach(path, mem):
+    store = igor_store.Store(str(path))
+    memory = igor_store.MemoryDict(mem)
+    assert store.attach(memory)
+    return store, memory
+
+
+def test_in_place_edit_survives_reload(tmp_path):
+    db = tmp_path / "store.db"
+    store, memory = _attach(db, {"alarms": [{"time": "07:00", "active": True}], "notebook": ["pain"]})
+    store.flush()
+
+    # Modification sur place d'un élément, sans mutation de la liste
+    memory["alarms"][0]["active"] = False
+    memory["alarms"][0]["label"] = "travail"
+    assert store.flush() == 1
+    assert store.flush() == 0   # Rien de nouveau : aucune ligne réécrite
+
+    _, reloaded = _attach(db, {})
+    assert reloaded["alarms"] == [{"time": "07:00", "active": False, "label": "travail"}]
+    assert reloaded["notebook"] == ["pain"]
+
+
+def test_list_mutations_survive_reload(tmp_path):
+    db = tmp_path / "store.db"
+    store, memory = _attach(db, {"notebook": ["a", "b", "c"]})
+    memory["notebook"].insert(0, "z")
+    del memory["notebook"][2]
+    memory["notebook"][1] = "A"
+    memory["notebook"].append("d")
+    store.flush()
+
+    _, reloaded = _attach(db, {})
+    assert reloaded["notebook"] == ["z", "A", "c", "d"]
@@ -0,0 +1,28 @@
+# Journal des tours : une phrase à plusieurs commandes garde une entrée par segment
+import pytest
+
+pytest.importorskip("gi")
+import igor_train
+import igor_turnlog
+
+
+def test_segments_are_logged_and_exported_separately(monkeypatch):
+    monkeypatch.setattr(igor_turnlog, "RECORDING", True)
+    written = []
+    monkeypatch.setattr(igor_turnlog, "_append", written.append)
+
+    turn = igor_turnlog.begin("ouvre firefox et ferme le terminal")
+    for text, intent in (("ouvre firefox", "LAUNCH"), ("ferme le terminal", "CONTROL")):
+        igor_turnlog.bind(lambda: igor_turnlog.current().set(intent=intent, source="llm"),
+                          turn.segment(text))()
+    turn_id = igor_turnlog.expect_task(turn)
+    igor_turnlog.end(turn)
+    igor_turnlog.task_done(turn_id, "BATCH", True, 0.2)
+
+    (record,) = written
+    assert record["intent"] is None
+    assert [(s["utterance"], s["intent"]) for s in record["segments"]] == \
+        [("ouvre firefox", "LAUNCH"), ("ferme le terminal", "CONTROL")]
+    commands = igor_train.split_segments([record])
+    assert [(c["utterance"], c["intent"], c["success"]) for c in commands] == \
+        [("ouvre firefox", "LAUNCH", True), ("ferme le terminal", "CONTROL", True)]
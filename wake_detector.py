@@ -20,6 +20,10 @@ import re
 import fcntl
 import glob       # AJOUT: Pour scanner les modèles
 import webrtcvad  # AJOUT: Pour l'optimisation VAD
+import igor_log
+
+# Les lignes [WAKE]/[INIT] restent des print() : igor_window les lit sur stdout.
+log = igor_log.get_logger("wake")
 
 # ==========================================
 # 1. FILTRES DSP (TRAITEMENT SIGNAL)
@@ -135,8 +139,9 @@ class FrenchDetector:
 
         if text:
             clean_text = text.lower().strip()
-            # Si on veut debugger ce qu'il entend :
-            # if len(clean_text) > 2: print(f"  [DEBUG-FR] Entendu: {clean_text}", flush=True)
+            # Ce qu'il entend ('log_levels': {"wake": "DEBUG"} pour l'afficher)
+            if len(clean_text) > 2:
+                log.debug("  [DEBUG-FR] Entendu: %s", clean_text)
 
             for kw in self.wake_words:
                 if kw in clean_text:
@@ -236,6 +241,7 @@ def main():
             mem = json.load(f)
             audio_conf = mem.get('audio_config', {})
             lang = mem.get('wake_lang', 'FR')
+            igor_log.configure(mem.get('log_levels', {}))
     except:
         audio_conf = {}; lang = 'FR'
 